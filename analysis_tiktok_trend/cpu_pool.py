@@ -0,0 +1,62 @@
+import os
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+import anyio
+
+from observability.metrics import register_pool
+
+T = TypeVar("T")
+
+# ===== Constants =====
+# Số process tính toán (pandas / numpy) dùng chung cho một worker uvicorn; 0 = chạy trong thread như cũ
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "0"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    ProcessPoolExecutor (spawn) cho các bước phân tích nặng CPU, tạo khi dùng lần đầu.
+    None nếu CPU_POOL_WORKERS=0.
+    """
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: không fork process đang có event loop / thread của uvicorn
+            _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            register_pool("cpu_pool", lambda: (_in_flight, CPU_POOL_WORKERS))
+        return _pool
+
+
+async def run_cpu_bound(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Chạy fn(*args) trong process pool (fn và tham số phải pickle được);
+    không có pool thì chạy trong threadpool của anyio.
+    """
+    global _in_flight
+    pool = get_cpu_pool()
+    if pool is None:
+        return await anyio.to_thread.run_sync(fn, *args)
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+    finally:
+        _in_flight -= 1
+
+
+def shutdown_cpu_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
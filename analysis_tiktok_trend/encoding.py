@@ -0,0 +1,123 @@
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Hệ số rolling hash (FNV prime, lẻ -> nhân mod 2^64 là song ánh)
+_BASE = np.uint64(0x100000001B3)
+
+
+def token_hash(tok: str) -> int:
+    """Hash 64-bit ổn định giữa các process (NgramIndex lưu giá trị này xuống đĩa)."""
+    return int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class Vocabulary:
+    """Intern token -> id (uint32), kèm hash 64-bit của từng token."""
+
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self._hashes = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def intern(self, tok: str) -> int:
+        code = self._index.get(tok)
+        if code is None:
+            code = len(self.tokens)
+            self._index[tok] = code
+            self.tokens.append(tok)
+            self._hashes.append(token_hash(tok))
+        return code
+
+    def encode(self, tokens: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.intern(t) for t in tokens), dtype=np.uint32)
+
+    def decode(self, codes: Iterable[int]) -> List[str]:
+        return [self.tokens[c] for c in codes]
+
+    def token_hashes(self) -> np.ndarray:
+        return np.frombuffer(self._hashes, dtype=np.uint64) if len(self._hashes) else np.zeros(0, np.uint64)
+
+
+class EncodedCorpus:
+    """
+    Toàn bộ transcript dưới dạng một mảng uint32 liền nhau + offsets,
+    thay cho list[str] token của từng văn bản. Chuỗi n-gram chỉ được dựng
+    lại khi cần trả kết quả (gram_text).
+    """
+
+    def __init__(self, ids: Sequence[Any], codes: np.ndarray, offsets: np.ndarray,
+                 vocab: Vocabulary) -> None:
+        self.ids = list(ids)
+        self.codes = codes
+        self.offsets = offsets
+        self.vocab = vocab
+
+    @classmethod
+    def from_texts(cls, ids: Iterable[Any], texts: Iterable[str],
+                   vocab: Optional[Vocabulary] = None) -> "EncodedCorpus":
+        vocab = vocab or Vocabulary()
+        chunks: List[np.ndarray] = []
+        for text in texts:
+            chunks.append(vocab.encode(text.split()))
+        lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        codes = np.concatenate(chunks) if chunks else np.zeros(0, np.uint32)
+        return cls(ids, codes, offsets, vocab)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def doc_codes(self, doc: int) -> np.ndarray:
+        return self.codes[self.offsets[doc]:self.offsets[doc + 1]]
+
+    def gram_text(self, doc: int, pos: int, n: int) -> str:
+        start = self.offsets[doc] + pos
+        return " ".join(self.vocab.decode(self.codes[start:start + n]))
+
+    def ngram_table(self, nmin: int, nmax: int, distinct: bool = True) -> pd.DataFrame:
+        """
+        Bảng (doc, n, h, pos): mỗi n-gram distinct của mỗi văn bản một dòng,
+        h là rolling hash 64-bit (int64), pos là vị trí xuất hiện đầu tiên.
+        Tính vector hoá trên cả corpus, bỏ các cửa sổ vắt qua ranh giới văn bản.
+        distinct=False giữ mọi cửa sổ (bỏ bước khử trùng).
+        """
+        cols = ['doc', 'n', 'h', 'pos']
+        if len(self.codes) == 0 or nmax < nmin:
+            return pd.DataFrame({c: np.zeros(0, np.int64) for c in cols})
+
+        th = self.vocab.token_hashes()[self.codes]
+        lengths = np.diff(self.offsets)
+        doc_of = np.repeat(np.arange(len(self.ids), dtype=np.int64), lengths)
+        end_of = self.offsets[1:][doc_of]
+        longest = int(lengths.max())
+
+        frames: List[pd.DataFrame] = []
+        cur = th
+        for n in range(1, min(nmax, longest) + 1):
+            if n > 1:
+                # h_n[i] = h_{n-1}[i] * BASE + tok[i + n - 1]  (tràn uint64 = mod 2^64)
+                cur = cur[:-1] * _BASE + th[n - 1:]
+            if n < nmin:
+                continue
+            starts = np.flatnonzero(np.arange(len(cur)) + n <= end_of[:len(cur)])
+            if starts.size == 0:
+                continue
+            docs = doc_of[starts]
+            frame = pd.DataFrame({
+                'doc': docs,
+                'n': n,
+                'h': cur[starts].view(np.int64),
+                'pos': starts - self.offsets[docs],
+            })
+            frames.append(frame.drop_duplicates(subset=['doc', 'h'], keep='first') if distinct else frame)
+
+        if not frames:
+            return pd.DataFrame({c: np.zeros(0, np.int64) for c in cols})
+        return pd.concat(frames, ignore_index=True)[cols]
@@ -1,71 +1,136 @@
-from typing import Iterable, List, Tuple, Any
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-import anyio
+
+from observability.profiling import profiled
+
+from .cpu_pool import run_cpu_bound
+from .encoding import EncodedCorpus
+from .text_normalize import TextNormalizer, normalize_text
 
 # ---------- Cleaning ----------
-def _clean_text_series(texts: pd.Series) -> pd.Series:
-    s = texts.fillna('').astype(str).str.strip().str.lower()
-    s = (s
-         .str.replace(r'https?://\S+|www\.\S+', ' ', regex=True)
-         .str.replace(r'[^\w\s]', ' ', regex=True)
-         .str.replace(r'_', ' ', regex=True)
-         .str.replace(r'\s+', ' ', regex=True)
-         .str.strip())
-    return s
+def _clean_text_series(texts: pd.Series, normalizer: TextNormalizer = normalize_text) -> pd.Series:
+    return pd.Series(normalizer.normalize_many(texts), index=texts.index, dtype=object)
 
 # ---------- Helpers ----------
-def unique_preserve_order(iterable: Iterable[str]) -> List[str]:
-    seen = set()
-    out: List[str] = []
-    for x in iterable:
-        if x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
-
-def build_ngrams_df(df_text: pd.DataFrame, nmin: int, nmax: int,
-                    distinct: bool = True, drop_empty: bool = True) -> pd.DataFrame:
-    if 'text' not in df_text.columns:
-        raise ValueError("df_text phải có cột 'text'.")
+def merge_texts_by_id(ids: Iterable[Any], texts: Iterable[str]) -> Dict[Any, List[str]]:
+    """Gom các đoạn text theo id (giữ thứ tự), bỏ id rỗng như groupby của pandas."""
+    merged: Dict[Any, List[str]] = {}
+    for id_, text in zip(ids, texts):
+        if id_ is None or (isinstance(id_, float) and math.isnan(id_)):
+            continue
+        parts = merged.setdefault(id_, [])
+        if isinstance(text, str):
+            parts.append(text)
+    return merged
 
-    rows: List[Tuple[Any, int, List[str]]] = []
-    text_series = df_text['text'].fillna('').astype(str)
+def id_sort_key(id_: Any) -> Tuple[int, Any]:
+    """Khoá sắp xếp id chịu được kiểu lẫn lộn (số trước, rồi chuỗi, rồi kiểu khác theo repr)."""
+    if isinstance(id_, (int, float, np.integer, np.floating)):
+        return (0, id_)
+    if isinstance(id_, str):
+        return (1, id_)
+    return (2, f"{type(id_).__name__}:{id_!r}")
 
-    for id_, text in text_series.items():
-        toks = text.split()
-        L = len(toks)
-        for n in range(nmin, nmax + 1):
-            if L < n:
-                grams_list: List[str] = []
-            else:
-                grams_iter = (" ".join(toks[i:i + n]) for i in range(L - n + 1))
-                grams_list = unique_preserve_order(grams_iter) if distinct else list(grams_iter)
-            rows.append((id_, n, grams_list))
 
-    out = pd.DataFrame(rows, columns=['id', 'n', 'list_n_gram'])
-    if drop_empty:
-        out = out[out['list_n_gram'].map(bool)].reset_index(drop=True)
-    return out
+GROUP_COLUMNS = ['n', 'ids', 'id_count', 'ngram_count', 'ngrams']
+_N_MIX = np.uint64(0x9E3779B97F4A7C15)
 
 
+@profiled("compute_groups_sync")
 def compute_groups_sync(df_text: pd.DataFrame,
-                        nmin: int, nmax: int, min_id_count: int) -> pd.DataFrame:
-    ngrams_df = build_ngrams_df(df_text, nmin=nmin, nmax=nmax, distinct=True, drop_empty=True)
+                        nmin: int, nmax: int, min_id_count: int,
+                        top_k: Optional[int] = None) -> pd.DataFrame:
+    if 'text' not in df_text.columns:
+        raise ValueError("df_text phải có cột 'text'.")
+
+    # Token -> id nguyên, n-gram -> hash 64-bit; chuỗi chỉ dựng lại cho nhóm được giữ
+    corpus = EncodedCorpus.from_texts(df_text.index, df_text['text'].fillna('').astype(str))
+    table = corpus.ngram_table(nmin, nmax)
+    return groups_from_table(corpus, table, min_id_count, top_k=top_k)
+
 
-    exploded = (
-        ngrams_df
-        .explode('list_n_gram', ignore_index=False)
-        .rename(columns={'list_n_gram': 'ngram'})
+def top_k_groups(group_with_min_df: Callable[[int], pd.DataFrame],
+                 gram_dfs: np.ndarray, top_k: int, min_id_count: int) -> pd.DataFrame:
+    """
+    Chế độ top-k: chỉ nhóm các gram có số id (df) >= ngưỡng t, với t là df
+    của gram xếp hạng top_k (chọn bằng np.partition, không sắp cả bảng).
+    Nhiều gram thường gộp về cùng một nhóm nên nếu chưa đủ top_k nhóm thì
+    nới hạng gấp đôi rồi chạy lại; dừng sớm ngay khi đủ.
+    Lưu ý: gram dưới ngưỡng không tham gia cắt tỉa, nên đây là kết quả xấp xỉ
+    của compute_groups_sync(...).head(top_k): một nhóm bị cắt tỉa đầy đủ loại vì
+    chồng id với nhóm dài hơn (từ gram hiếm hơn t) vẫn có thể xuất hiện ở đây.
+    API (top_k của /utils/get_prunned_groups, pipeline) ghi rõ điều này.
+    """
+    floor = max(2, min_id_count)
+    dfs = gram_dfs[gram_dfs >= floor]
+    if top_k <= 0 or dfs.size == 0:
+        return pd.DataFrame(columns=GROUP_COLUMNS)
+
+    rank = top_k
+    while True:
+        k = min(rank, dfs.size)
+        t = int(np.partition(dfs, dfs.size - k)[dfs.size - k])
+        result = group_with_min_df(t)
+        if len(result) >= top_k or t <= floor or k == dfs.size:
+            return result.head(top_k).reset_index(drop=True)
+        rank *= 2
+
+
+def groups_from_table(corpus: EncodedCorpus, table: pd.DataFrame,
+                      min_id_count: int, top_k: Optional[int] = None) -> pd.DataFrame:
+    """Nhóm + cắt tỉa từ bảng (doc, n, h, pos) của EncodedCorpus.ngram_table."""
+    # df của từng gram: factorize một khoá int64 gộp (n, h) thay vì groupby 2 cột
+    n_mix = table['n'].to_numpy().astype(np.uint64) * _N_MIX
+    codes, _ = pd.factorize(table['h'].to_numpy() ^ n_mix.view(np.int64))
+    gram_dfs = np.bincount(codes)
+    df = gram_dfs[codes]
+    if top_k is None:
+        return _groups_from_shared(corpus, table[df >= 2], min_id_count)
+
+    return top_k_groups(
+        lambda t: _groups_from_shared(corpus, table[df >= t], min_id_count),
+        gram_dfs, top_k, min_id_count
     )
-    exploded = exploded[exploded['ngram'].notna() & (exploded['ngram'] != '')]
-    exploded = exploded.drop_duplicates(subset=['id', 'n', 'ngram'])
+
+
+def _groups_from_shared(corpus: EncodedCorpus, shared: pd.DataFrame,
+                        min_id_count: int) -> pd.DataFrame:
+    if shared.empty:
+        return pd.DataFrame(columns=GROUP_COLUMNS)
 
     dups = (
-        exploded.groupby(['n', 'ngram'])['id']
-        .agg(lambda s: sorted(set(s)))
+        shared
+        .groupby(['n', 'h'], sort=False)
+        .agg(docs=('doc', list), doc0=('doc', 'first'), pos0=('pos', 'first'))
         .reset_index()
-        .rename(columns={'id': 'ids'})
     )
+    ids = corpus.ids
+    dups['ids'] = [sorted((ids[d] for d in docs), key=id_sort_key) for docs in dups['docs']]
+    where = dict(zip(zip(dups['n'].tolist(), dups['h'].tolist()),
+                     zip(dups['doc0'].tolist(), dups['pos0'].tolist())))
+
+    pruned = prune_groups(dups.rename(columns={'h': 'ngram'})[['n', 'ngram', 'ids']], min_id_count)
+    if pruned.empty:
+        return pd.DataFrame(columns=GROUP_COLUMNS)
+
+    def render(n: int, h: int) -> str:
+        doc, pos = where[(n, h)]
+        return corpus.gram_text(doc, pos, n)
+
+    pruned['ngrams'] = [sorted(render(int(n), int(h)) for h in hs)
+                        for n, hs in zip(pruned['n'], pruned['ngrams'])]
+    return pruned
+
+
+def prune_groups(dups: pd.DataFrame, min_id_count: int) -> pd.DataFrame:
+    """
+    Gom + cắt tỉa nhóm từ bảng (n, ngram, ids): mỗi tập ids chỉ giữ n lớn nhất,
+    rồi loại các nhóm chồng id với nhóm dài hơn / phổ biến hơn.
+    Dùng chung cho compute_groups_sync và NgramIndex.
+    """
+    dups = dups.copy()
     dups['id_count'] = dups['ids'].str.len()
 
     dups = dups[dups['id_count'] >= 2].sort_values(
@@ -73,7 +138,7 @@ def compute_groups_sync(df_text: pd.DataFrame,
     ).reset_index(drop=True)
 
     dups = dups.copy()
-    dups['ids'] = dups['ids'].map(lambda L: sorted(set(L)))
+    dups['ids'] = dups['ids'].map(lambda L: sorted(set(L), key=id_sort_key))
     dups['ids_key'] = dups['ids'].map(tuple)
     dups['n_max'] = dups.groupby('ids_key')['n'].transform('max')
     dups_keep = dups[dups['n'] == dups['n_max']].drop(columns=['n_max']).copy()
@@ -91,7 +156,7 @@ def compute_groups_sync(df_text: pd.DataFrame,
     groups = groups[['n', 'ids', 'id_count', 'ngram_count', 'ngrams']]
 
     g = groups.copy()
-    g['ids'] = g['ids'].map(lambda L: sorted(set(L)))
+    g['ids'] = g['ids'].map(lambda L: sorted(set(L), key=id_sort_key))
     g['ids_set'] = g['ids'].map(frozenset)
     g_sorted = g.sort_values(['n', 'id_count', 'ngram_count'],
                              ascending=[False, False, False]).reset_index(drop=True)
@@ -124,29 +189,34 @@ async def group_ngrams_from_lists(ids: List[Any],
                                   transcripts: List[str],
                                   nmin: int = 2,
                                   nmax: int = 5,
-                                  min_id_count: int = 2) -> List[dict]:
+                                  min_id_count: int = 2,
+                                  nfc: bool = False,
+                                  strip_diacritics: bool = False,
+                                  top_k: Optional[int] = None) -> List[dict]:
     """
     Nhận list ids và list transcripts, làm sạch text, dựng DataFrame,
-    rồi tính nhóm n-gram (chạy trong thread để không block event loop).
+    rồi tính nhóm n-gram (chạy trong CPU pool / thread để không block event loop).
+    top_k: chỉ lấy top_k nhóm phổ biến nhất (xem top_k_groups).
     Trả về list[dict] để dùng trực tiếp trong API FastAPI.
     """
     if len(ids) != len(transcripts):
         raise ValueError("ids và transcripts phải có cùng độ dài.")
 
     # Gộp transcript trùng id (nếu có)
-    df_raw = pd.DataFrame({'id': ids, 'raw_text': transcripts})
-    df_agg = (df_raw
-              .groupby('id', as_index=True)['raw_text']
-              .agg(lambda s: " ".join([x for x in s if isinstance(x, str)]))
-              .to_frame())
+    merged = merge_texts_by_id(ids, transcripts)
+    keys = sorted(merged, key=id_sort_key)
 
     # Làm sạch + chuẩn hóa vào cột 'text'
-    df_agg['text'] = _clean_text_series(df_agg['raw_text'])
-    df_text = df_agg[['text']].copy()
+    normalizer = (normalize_text if not (nfc or strip_diacritics)
+                  else TextNormalizer(nfc=nfc, strip_diacritics=strip_diacritics))
+    df_text = pd.DataFrame(
+        {'text': normalizer.normalize_many(" ".join(merged[k]) for k in keys)},
+        index=pd.Index(keys, name='id')
+    )
 
-    # Chạy tính toán trong threadpool
-    df_result = await anyio.to_thread.run_sync(
-        compute_groups_sync, df_text, nmin, nmax, min_id_count
+    # Chạy tính toán trong process pool (CPU_POOL_WORKERS) hoặc threadpool
+    df_result = await run_cpu_bound(
+        compute_groups_sync, df_text, nmin, nmax, min_id_count, top_k
     )
 
     # ✅ Trả về dạng list[dict] (để FastAPI trả JSON luôn)
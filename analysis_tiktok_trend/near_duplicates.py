@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .cpu_pool import run_cpu_bound
+from .encoding import EncodedCorpus
+from .groups_pruned import id_sort_key, merge_texts_by_id
+from .text_normalize import TextNormalizer, normalize_text
+
+# Hoán vị kiểu multiply-shift: ((a * x + b) mod 2^64) >> 32, x là hash 32-bit
+_SHIFT32 = np.uint64(32)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_EMPTY = np.uint32(0xFFFFFFFF)
+_CHUNK_ROWS = 1 << 15
+
+
+# ---------- Params ----------
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Chọn (bands, rows) với bands * rows = num_perm sao cho điểm uốn
+    (1/bands)^(1/rows) của đường cong LSH gần threshold nhất.
+    """
+    best, best_err = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+# ---------- MinHash ----------
+def _shingle_hashes(corpus: EncodedCorpus, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (doc, hash32) của các shingle k từ; văn bản ngắn hơn k token dùng chính
+    nó làm một shingle. Không cần khử trùng vì MinHash chỉ lấy min.
+    Trả về đã sắp theo doc.
+    """
+    lengths = np.diff(corpus.offsets)
+    table = corpus.ngram_table(1, k, distinct=False)
+    want = np.minimum(lengths, k)[table['doc'].to_numpy()]
+    table = table[table['n'].to_numpy() == want]
+    docs = table['doc'].to_numpy()
+    h = table['h'].to_numpy().view(np.uint64)
+    h32 = (h ^ (h >> _SHIFT32)) & _MASK32
+    order = np.argsort(docs, kind='stable')
+    return docs[order], h32[order]
+
+
+def minhash_signatures(corpus: EncodedCorpus, k: int = 3, num_perm: int = 128,
+                       seed: int = 1) -> np.ndarray:
+    """Ma trận chữ ký uint32 (số văn bản x num_perm)."""
+    rnd = np.random.default_rng(seed)
+    a = rnd.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rnd.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+    sig = np.full((len(corpus), num_perm), _EMPTY, dtype=np.uint32)
+    docs, h32 = _shingle_hashes(corpus, k)
+    for lo in range(0, len(docs), _CHUNK_ROWS):
+        d = docs[lo:lo + _CHUNK_ROWS]
+        x = h32[lo:lo + _CHUNK_ROWS]
+        phv = ((x[:, None] * a[None, :] + b[None, :]) >> _SHIFT32).astype(np.uint32)
+        # min theo từng đoạn doc liên tiếp trong chunk
+        starts = np.flatnonzero(np.r_[True, d[1:] != d[:-1]])
+        seg = np.minimum.reduceat(phv, starts, axis=0)
+        uniq = d[starts]
+        sig[uniq] = np.minimum(sig[uniq], seg)
+    return sig
+
+
+# ---------- LSH ----------
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x: int, y: int) -> None:
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def lsh_clusters(sig: np.ndarray, empty: np.ndarray, threshold: float = 0.8) -> List[List[int]]:
+    """
+    Gom văn bản theo LSH banding. Mỗi bucket chỉ so từng thành viên với
+    đại diện của bucket (không so mọi cặp) nên chi phí ~ O(số văn bản * bands).
+    empty: mask các văn bản rỗng (bỏ qua).
+    """
+    n_docs, num_perm = sig.shape
+    bands, rows = optimal_bands(num_perm, threshold)
+    uf = _UnionFind(n_docs)
+
+    for band in range(bands):
+        block = np.ascontiguousarray(sig[:, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        bucket_of = inverse.ravel()[order]
+        starts = np.flatnonzero(np.r_[True, bucket_of[1:] != bucket_of[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        multi = ends - starts >= 2
+        for s, e in zip(starts[multi].tolist(), ends[multi].tolist()):
+            rep = int(order[s])
+            if empty[rep]:
+                continue
+            for other in order[s + 1:e]:
+                other = int(other)
+                if uf.find(other) == uf.find(rep):
+                    continue
+                if np.count_nonzero(sig[rep] == sig[other]) >= threshold * num_perm:
+                    uf.union(rep, other)
+
+    members: Dict[int, List[int]] = {}
+    for i in range(n_docs):
+        if not empty[i]:
+            members.setdefault(uf.find(i), []).append(i)
+    return [m for m in members.values() if len(m) >= 2]
+
+
+def min_pairwise_similarity(sig: np.ndarray, members: List[int]) -> float:
+    """
+    Độ tương đồng MinHash nhỏ nhất trên mọi cặp thành viên của cụm (cụm nối bắc cầu
+    qua LSH nên hai đầu chuỗi có thể khác nhau hơn threshold). O(m^2 * num_perm).
+    """
+    block = sig[members]
+    lowest = block.shape[1]
+    for i in range(len(members) - 1):
+        lowest = min(lowest, int(np.count_nonzero(block[i + 1:] == block[i], axis=1).min()))
+    return lowest / block.shape[1]
+
+
+def cluster_near_duplicates_sync(ids: List[Any], texts: List[str],
+                                 threshold: float = 0.8, shingle_size: int = 3,
+                                 num_perm: int = 128) -> List[dict]:
+    corpus = EncodedCorpus.from_texts(ids, texts)
+    sig = minhash_signatures(corpus, k=shingle_size, num_perm=num_perm)
+    empty = np.diff(corpus.offsets) == 0
+    out = []
+    for members in lsh_clusters(sig, empty, threshold):
+        out.append({
+            'ids': sorted((corpus.ids[m] for m in members), key=id_sort_key),
+            'id_count': len(members),
+            'min_similarity': round(min_pairwise_similarity(sig, members), 4),
+        })
+    out.sort(key=lambda g: g['id_count'], reverse=True)
+    return out
+
+
+# ---------- ASYNC ENTRYPOINT ----------
+async def cluster_near_duplicates(ids: List[Any],
+                                  texts: List[str],
+                                  threshold: float = 0.8,
+                                  shingle_size: int = 3,
+                                  num_perm: int = 128,
+                                  nfc: bool = False,
+                                  strip_diacritics: bool = False) -> List[dict]:
+    """
+    Gom transcript/comment gần trùng nhau (Jaccard ước lượng bằng MinHash
+    trên shingle k từ >= threshold). Id trùng được nối text như group_ngrams_from_lists.
+    """
+    if len(ids) != len(texts):
+        raise ValueError("ids và texts phải có cùng độ dài.")
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold phải nằm trong (0, 1].")
+    if shingle_size < 1 or num_perm < 1:
+        raise ValueError("shingle_size và num_perm phải >= 1.")
+
+    merged = merge_texts_by_id(ids, texts)
+    keys = list(merged)
+
+    normalizer = (normalize_text if not (nfc or strip_diacritics)
+                  else TextNormalizer(nfc=nfc, strip_diacritics=strip_diacritics))
+    cleaned = normalizer.normalize_many(" ".join(merged[k]) for k in keys)
+
+    return await run_cpu_bound(
+        cluster_near_duplicates_sync, keys, cleaned, threshold, shingle_size, num_perm
+    )
@@ -0,0 +1,306 @@
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import anyio
+
+from .encoding import EncodedCorpus
+from .groups_pruned import GROUP_COLUMNS, id_sort_key, prune_groups, top_k_groups
+from .text_normalize import normalize_text
+
+# ===== Constants =====
+DEFAULT_INDEX_PATH = os.getenv("NGRAM_INDEX_PATH", "storage/ngram_index.sqlite3")
+DEFAULT_MMAP_MB = int(os.getenv("NGRAM_INDEX_MMAP_MB", "256"))
+DEFAULT_NMIN = int(os.getenv("NGRAM_INDEX_NMIN", "2"))
+DEFAULT_NMAX = int(os.getenv("NGRAM_INDEX_NMAX", "10"))
+# Số tham số '?' mỗi câu IN (...): dưới SQLITE_MAX_VARIABLE_NUMBER (999 trước SQLite 3.32)
+_IN_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    id_key TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grams (
+    n INTEGER NOT NULL,
+    h INTEGER NOT NULL,
+    df INTEGER NOT NULL,
+    PRIMARY KEY (n, h)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS grams_shared ON grams (n, h) WHERE df >= 2;
+CREATE TABLE IF NOT EXISTS postings (
+    n INTEGER NOT NULL,
+    h INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (n, h, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+
+# ---------- Helpers ----------
+def _id_key(id_: Any) -> str:
+    return json.dumps(id_, ensure_ascii=False, sort_keys=True)
+
+
+# ---------- Index ----------
+class NgramIndex:
+    """
+    Chỉ mục n-gram bền vững trên đĩa (SQLite, đọc qua mmap).
+    Thêm/xoá transcript theo id mà không phải dựng lại toàn bộ bảng n-gram;
+    truy vấn nhóm dùng lại prune_groups nên kết quả trùng với compute_groups_sync.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH,
+                 nmin: Optional[int] = None, nmax: Optional[int] = None,
+                 mmap_mb: int = DEFAULT_MMAP_MB) -> None:
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_mb) * 1024 * 1024}")
+        self._conn.executescript(_SCHEMA)
+        self.nmin, self.nmax = self._load_config(nmin, nmax)
+
+    def _load_config(self, nmin: Optional[int], nmax: Optional[int]) -> Tuple[int, int]:
+        meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        if meta:
+            stored = (int(meta["nmin"]), int(meta["nmax"]))
+            if (nmin is not None and nmin != stored[0]) or (nmax is not None and nmax != stored[1]):
+                raise ValueError(
+                    f"Index {self.path} đã tạo với nmin={stored[0]}, nmax={stored[1]}."
+                )
+            return stored
+        nmin = DEFAULT_NMIN if nmin is None else nmin
+        nmax = DEFAULT_NMAX if nmax is None else nmax
+        if nmin < 1 or nmax < nmin:
+            raise ValueError("Cần 1 <= nmin <= nmax.")
+        self._conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                               [("nmin", str(nmin)), ("nmax", str(nmax))])
+        return nmin, nmax
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ----- write -----
+    def _remove_doc(self, doc_id: int) -> None:
+        cur = self._conn
+        cur.execute(
+            "UPDATE grams SET df = df - 1 WHERE (n, h) IN "
+            "(SELECT n, h FROM postings WHERE doc_id = ?)", (doc_id,)
+        )
+        cur.execute("DELETE FROM grams WHERE df <= 0")
+        cur.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        cur.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    def add(self, ids: List[Any], transcripts: List[str]) -> int:
+        """
+        Thêm (hoặc thay thế) transcript theo id. Transcript trùng id trong cùng
+        lần gọi được nối lại như group_ngrams_from_lists. Trả về số id đã ghi.
+        """
+        if len(ids) != len(transcripts):
+            raise ValueError("ids và transcripts phải có cùng độ dài.")
+
+        merged: Dict[str, List[str]] = {}
+        for id_, text in zip(ids, transcripts):
+            parts = merged.setdefault(_id_key(id_), [])
+            if isinstance(text, str):
+                parts.append(text)
+        keys = list(merged)
+        cleaned = normalize_text.normalize_many(" ".join(merged[k]) for k in keys)
+
+        # Hash n-gram vector hoá cho cả lô (cùng hàm hash với compute_groups_sync)
+        corpus = EncodedCorpus.from_texts(keys, cleaned)
+        table = corpus.ngram_table(self.nmin, self.nmax).sort_values('doc', kind='stable')
+        bounds = table['doc'].searchsorted(range(len(keys) + 1))
+        n_col, h_col, pos_col = (table[c].tolist() for c in ('n', 'h', 'pos'))
+
+        with self._lock:
+            cur = self._conn
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for doc, (key, text) in enumerate(zip(keys, cleaned)):
+                    row = cur.execute("SELECT doc_id FROM docs WHERE id_key = ?", (key,)).fetchone()
+                    if row:
+                        self._remove_doc(row[0])
+                    doc_id = cur.execute("INSERT INTO docs (id_key, text) VALUES (?, ?)",
+                                         (key, text)).lastrowid
+                    lo, hi = bounds[doc], bounds[doc + 1]
+                    grams = list(zip(n_col[lo:hi], h_col[lo:hi]))
+                    cur.executemany(
+                        "INSERT INTO postings (n, h, doc_id, pos) VALUES (?, ?, ?, ?)",
+                        ((n, h, doc_id, pos) for (n, h), pos in zip(grams, pos_col[lo:hi]))
+                    )
+                    cur.executemany(
+                        "INSERT INTO grams (n, h, df) VALUES (?, ?, 1) "
+                        "ON CONFLICT (n, h) DO UPDATE SET df = df + 1",
+                        grams
+                    )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return len(keys)
+
+    def remove(self, ids: Iterable[Any]) -> int:
+        """Xoá transcript theo id. Trả về số id thực sự có trong index."""
+        removed = 0
+        with self._lock:
+            cur = self._conn
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for id_ in ids:
+                    row = cur.execute("SELECT doc_id FROM docs WHERE id_key = ?",
+                                      (_id_key(id_),)).fetchone()
+                    if row:
+                        self._remove_doc(row[0])
+                        removed += 1
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return removed
+
+    # ----- read -----
+    def groups(self, nmin: Optional[int] = None, nmax: Optional[int] = None,
+               min_id_count: int = 2, top_k: Optional[int] = None) -> pd.DataFrame:
+        """
+        Nhóm n-gram dùng chung (cùng định dạng với compute_groups_sync),
+        chỉ đọc các gram có df >= 2 qua partial index.
+        top_k: chỉ đọc các gram đủ phổ biến để vào top_k nhóm (xem top_k_groups).
+        """
+        nmin = self.nmin if nmin is None else nmin
+        nmax = self.nmax if nmax is None else nmax
+        if nmin < self.nmin or nmax > self.nmax or nmin > nmax:
+            raise ValueError(
+                f"Khoảng n phải nằm trong [{self.nmin}, {self.nmax}] của index."
+            )
+        if top_k is None:
+            return self._groups_min_df(nmin, nmax, min_id_count, 2)
+
+        with self._lock:
+            dfs = np.fromiter(
+                (r[0] for r in self._conn.execute(
+                    "SELECT df FROM grams WHERE df >= ? AND n BETWEEN ? AND ?",
+                    (max(2, min_id_count), nmin, nmax))),
+                dtype=np.int64
+            )
+        return top_k_groups(
+            lambda t: self._groups_min_df(nmin, nmax, min_id_count, t),
+            dfs, top_k, min_id_count
+        )
+
+    def _groups_min_df(self, nmin: int, nmax: int, min_id_count: int,
+                       min_df: int) -> pd.DataFrame:
+        # Postings, id và text của doc đọc trong cùng một read transaction (một snapshot):
+        # add/remove chen giữa các lần đọc sẽ đổi doc_id và làm render() lỗi KeyError
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                return self._groups_in_snapshot(nmin, nmax, min_id_count, min_df)
+            finally:
+                self._conn.execute("COMMIT")
+
+    def _groups_in_snapshot(self, nmin: int, nmax: int, min_id_count: int,
+                            min_df: int) -> pd.DataFrame:
+        rows = self._conn.execute(
+            "SELECT p.n, p.h, p.doc_id, p.pos FROM grams g "
+            "JOIN postings p ON p.n = g.n AND p.h = g.h "
+            "WHERE g.df >= ? AND g.n BETWEEN ? AND ?", (min_df, nmin, nmax)
+        ).fetchall()
+        empty = pd.DataFrame(columns=GROUP_COLUMNS)
+        if not rows:
+            return empty
+
+        # (n, h) -> danh sách doc + một vị trí đại diện để dựng lại chuỗi
+        members: Dict[Tuple[int, int], List[int]] = {}
+        where: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for n, h, doc_id, pos in rows:
+            members.setdefault((n, h), []).append(doc_id)
+            where.setdefault((n, h), (doc_id, pos))
+
+        id_of = {doc_id: json.loads(k)
+                 for doc_id, k in self._conn.execute("SELECT doc_id, id_key FROM docs")}
+        dups = pd.DataFrame({
+            'n': [n for n, _ in members],
+            'ngram': [h for _, h in members],
+            'ids': [sorted((id_of[d] for d in docs), key=id_sort_key) for docs in members.values()],
+        })
+        pruned = prune_groups(dups, min_id_count)
+        if pruned.empty:
+            return empty
+
+        needed = sorted({where[(int(n), h)][0] for n, hs in zip(pruned['n'], pruned['ngrams']) for h in hs})
+        texts: Dict[int, str] = {}
+        for i in range(0, len(needed), _IN_CHUNK):
+            chunk = needed[i:i + _IN_CHUNK]
+            texts.update(self._conn.execute(
+                f"SELECT doc_id, text FROM docs WHERE doc_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall())
+        tokens = {doc_id: t.split() for doc_id, t in texts.items()}
+
+        def render(n: int, h: int) -> str:
+            doc_id, pos = where[(n, h)]
+            return " ".join(tokens[doc_id][pos:pos + n])
+
+        pruned = pruned.copy()
+        pruned['ngrams'] = [sorted(render(int(n), h) for h in hs)
+                            for n, hs in zip(pruned['n'], pruned['ngrams'])]
+        return pruned
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            docs = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            grams = self._conn.execute("SELECT COUNT(*) FROM grams").fetchone()[0]
+            shared = self._conn.execute("SELECT COUNT(*) FROM grams WHERE df >= 2").fetchone()[0]
+        return {"docs": docs, "grams": grams, "shared_grams": shared,
+                "nmin": self.nmin, "nmax": self.nmax}
+
+
+_index: Optional[NgramIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ngram_index() -> NgramIndex:
+    """Index dùng chung trong process (mở lười ở lần gọi đầu)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NgramIndex(DEFAULT_INDEX_PATH)
+        return _index
+
+
+# ---------- ASYNC ENTRYPOINTS ----------
+async def add_transcripts(ids: List[Any], transcripts: List[str]) -> int:
+    return await anyio.to_thread.run_sync(get_ngram_index().add, ids, transcripts)
+
+
+async def remove_transcripts(ids: List[Any]) -> int:
+    return await anyio.to_thread.run_sync(get_ngram_index().remove, ids)
+
+
+async def group_ngrams_from_index(nmin: Optional[int] = None,
+                                  nmax: Optional[int] = None,
+                                  min_id_count: int = 2,
+                                  top_k: Optional[int] = None) -> List[dict]:
+    df_result = await anyio.to_thread.run_sync(
+        get_ngram_index().groups, nmin, nmax, min_id_count, top_k
+    )
+    return df_result.to_dict(orient="records")
@@ -0,0 +1,69 @@
+import re
+import math
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# URL | ký tự không phải chữ/số/khoảng trắng | '_' -> ' ' (một lượt regex duy nhất)
+_CLEAN_RE = re.compile(r'https?://\S+|www\.\S+|[^\w\s]|_')
+
+# Dải ký tự Latin có dấu (gồm toàn bộ chữ tiếng Việt dựng sẵn)
+_LATIN_RANGES = ((0x00C0, 0x024F), (0x1E00, 0x1EFF))
+_COMBINING_RANGE = (0x0300, 0x036F)
+
+
+def _build_strip_table() -> Dict[int, Optional[str]]:
+    """Bảng str.translate bỏ dấu: 'ộ' -> 'o', 'đ' -> 'd', dấu tổ hợp (NFD) -> xoá."""
+    table: Dict[int, Optional[str]] = {}
+    for lo, hi in _LATIN_RANGES:
+        for cp in range(lo, hi + 1):
+            ch = chr(cp)
+            base = "".join(c for c in unicodedata.normalize("NFD", ch)
+                           if not unicodedata.combining(c))
+            if base != ch and len(base) == 1:
+                table[cp] = base
+    table[ord("đ")] = "d"
+    table[ord("Đ")] = "D"
+    for cp in range(_COMBINING_RANGE[0], _COMBINING_RANGE[1] + 1):
+        table[cp] = None
+    return table
+
+
+class TextNormalizer:
+    """
+    Chuẩn hoá transcript trong một lượt: lower, bỏ URL/ký tự đặc biệt/'_',
+    gộp khoảng trắng. Cho kết quả giống _clean_text_series (pandas) khi để mặc định.
+
+    nfc: chuẩn hoá Unicode NFC trước (transcript dạng NFD sẽ không bị tách chữ).
+    strip_diacritics: bỏ dấu tiếng Việt ("việt nam" -> "viet nam").
+    """
+
+    _strip_table: Optional[Dict[int, Optional[str]]] = None
+
+    def __init__(self, nfc: bool = False, strip_diacritics: bool = False) -> None:
+        self.nfc = nfc
+        self.strip_diacritics = strip_diacritics
+        if strip_diacritics and TextNormalizer._strip_table is None:
+            TextNormalizer._strip_table = _build_strip_table()
+
+    def __call__(self, text: Any) -> str:
+        if text is None or (isinstance(text, float) and math.isnan(text)):
+            return ""
+        if not isinstance(text, str):
+            text = str(text)
+        if self.nfc:
+            text = unicodedata.normalize("NFC", text)
+        text = text.lower()
+        if self.strip_diacritics:
+            text = text.translate(self._strip_table)
+        return " ".join(_CLEAN_RE.sub(" ", text).split())
+
+    def normalize_many(self, texts: Iterable[Any]) -> List[str]:
+        return [self(t) for t in texts]
+
+    def iter_normalize(self, texts: Iterable[Any]) -> Iterator[str]:
+        """Dạng stream: chuẩn hoá từng dòng, không giữ cả danh sách trong bộ nhớ."""
+        for t in texts:
+            yield self(t)
+
+
+normalize_text = TextNormalizer()
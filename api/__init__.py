@@ -0,0 +1,2 @@
+from .responses import FastJSONResponse, dumps, json_with_raw
+from .warmup import STARTUP_WARMUP, WARMUP_MODULES, warm_up
@@ -0,0 +1,85 @@
+import json
+import logging
+import dataclasses
+from contextlib import aclosing
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # fallback: json chuẩn, vẫn không escape tiếng Việt
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def _default(obj: Any) -> Any:
+    """Kiểu orjson / json chuẩn không tự xử lý (pydantic, numpy, set, dataclass khi dùng json chuẩn...)."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "model_dump"):   # pydantic v2
+        return obj.model_dump()
+    if hasattr(obj, "tolist"):       # numpy array / scalar
+        return obj.tolist()
+    raise TypeError(f"Không serialize được kiểu {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    JSON UTF-8 dạng gọn: orjson nếu có (dataclass / numpy / datetime encode
+    thẳng bằng C), ngược lại json chuẩn với ensure_ascii=False.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                      default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Response class mặc định của app. Endpoint trả thẳng FastJSONResponse(...)
+    (thay vì list/dict) thì bỏ qua cả jsonable_encoder của FastAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_with_raw(obj: dict, key: str, raw: Optional[str]) -> bytes:
+    """JSON của obj kèm thêm trường key là một đoạn JSON đã serialize sẵn (không parse lại)."""
+    head = dumps(obj)
+    sep = b"," if len(head) > 2 else b""
+    value = raw.encode("utf-8") if raw is not None else b"null"
+    return head[:-1] + sep + dumps(key) + b":" + value + b"}"
+
+
+async def ndjson_batches(batches: AsyncIterator[List[Any]],
+                         on_done: Optional[Callable[[List[Any]], Awaitable[Any]]] = None) -> AsyncIterator[bytes]:
+    """
+    Body cho StreamingResponse (NDJSON): mỗi lô của async generator thành một chunk,
+    mỗi item một dòng. Header 200 đã gửi nên lỗi giữa chừng thành dòng {"error": ...} cuối.
+    Client ngắt kết nối thì Starlette huỷ stream và generator nguồn được aclose ngay.
+    on_done(items): chạy khi nguồn hết bình thường (vd. lưu snapshot đầy đủ).
+    """
+    items: List[Any] = []
+    try:
+        async with aclosing(batches):
+            async for batch in batches:
+                if on_done is not None:
+                    items.extend(batch)
+                yield b"".join(dumps(item) + b"\n" for item in batch)
+        if on_done is not None:
+            await on_done(items)
+    except Exception as e:
+        logger.exception("NDJSON stream failed")
+        yield dumps({"error": str(e)}) + b"\n"
@@ -0,0 +1,44 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+# ===== Constants =====
+# STARTUP_WARMUP=0: không nạp trước, module nặng chỉ được import ở request đầu tiên dùng tới
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+# Module của các endpoint (Playwright, pandas/numpy, psycopg2, scraper comment...)
+WARMUP_MODULES = (
+    "tiktok_trend.playwright_tiktok_ads",
+    "tiktok_trend.playwright_tiktok_audio",
+    "tiktok.tiktok_comment_scrapper",
+    "tiktok.user_page",
+    "utils.get_transcripts",
+    "persistence",
+    "analysis_tiktok_trend.groups_pruned",
+    "analysis_tiktok_trend.near_duplicates",
+    "analysis_tiktok_trend.ngram_index",
+)
+
+
+async def warm_up(modules: Iterable[str] = WARMUP_MODULES) -> Dict[str, float]:
+    """
+    Import lần lượt các module nặng trong thread nền sau khi server đã nhận
+    request, để request đầu tiên của endpoint không phải chờ import.
+    Trả về {module: giây}; module thiếu dependency chỉ được ghi log.
+    """
+    timings: Dict[str, float] = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            logger.warning("Warm-up: không import được %s: %s", name, e)
+            continue
+        timings[name] = round(time.perf_counter() - start, 4)
+    logger.info("Warm-up xong: %s", timings)
+    return timings
@@ -1,14 +1,32 @@
 # start.py
-import sys, asyncio
+import os, sys, shutil, asyncio, tempfile
 import uvicorn
 
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+# Số process uvicorn; >1 thì các worker dùng chung cache / single-flight (SHARED_CACHE_PATH),
+# job queue (JOBS_DB_PATH) và gộp metrics Prometheus qua PROMETHEUS_MULTIPROC_DIR
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def _prepare_multiprocess_metrics() -> None:
+    # Thư mục phải có trước khi worker import prometheus_client và rỗng lúc khởi động
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
 if __name__ == "__main__":
+    if WORKERS > 1:
+        _prepare_multiprocess_metrics()
     uvicorn.run(
         "main:app",  # đổi thành module:path tới FastAPI app của bạn
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("PORT", "8000")),
+        workers=WORKERS,
         reload=False,   # tránh reload trên Windows
     )
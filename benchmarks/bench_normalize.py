@@ -0,0 +1,74 @@
+"""
+So sánh TextNormalizer (một lượt regex) với đường pandas cũ (5 lượt str.replace).
+
+    python -m benchmarks.bench_normalize [số transcript] [số lần lặp]
+"""
+import sys
+import time
+import random
+
+import pandas as pd
+
+from analysis_tiktok_trend.text_normalize import normalize_text
+
+WORDS = ("hôm nay mình review sản phẩm giảm giá sốc chị em ơi mua ngay "
+         "link ở bio nhé video trend đẹp quá xinh xỉu Việt Nam").split()
+NOISE = ["https://vt.tiktok.com/ZS8abc/", "www.shopee.vn", "#xuhuong", "@user_01",
+         "!!!", "😍😍", "…", "(sale)", "100%"]
+
+
+def pandas_clean(texts: pd.Series) -> pd.Series:
+    # Đường xử lý cũ của _clean_text_series, giữ làm mốc so sánh
+    s = texts.fillna('').astype(str).str.strip().str.lower()
+    s = (s
+         .str.replace(r'https?://\S+|www\.\S+', ' ', regex=True)
+         .str.replace(r'[^\w\s]', ' ', regex=True)
+         .str.replace(r'_', ' ', regex=True)
+         .str.replace(r'\s+', ' ', regex=True)
+         .str.strip())
+    return s
+
+
+def make_corpus(n_docs: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    docs = []
+    for _ in range(n_docs):
+        toks = [rnd.choice(WORDS) for _ in range(rnd.randint(20, 400))]
+        for _ in range(rnd.randint(0, 6)):
+            toks.insert(rnd.randrange(len(toks) + 1), rnd.choice(NOISE))
+        docs.append(" ".join(toks))
+    return docs
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(n_docs: int = 5000, repeat: int = 5) -> dict:
+    docs = make_corpus(n_docs)
+    series = pd.Series(docs)
+
+    expected = pandas_clean(series).tolist()
+    got = normalize_text.normalize_many(docs)
+    if got != expected:
+        raise AssertionError("TextNormalizer cho kết quả khác đường pandas cũ.")
+
+    t_pandas = best_of(lambda: pandas_clean(series), repeat)
+    t_fast = best_of(lambda: normalize_text.normalize_many(docs), repeat)
+    return {
+        "docs": n_docs,
+        "pandas_s": round(t_pandas, 4),
+        "normalizer_s": round(t_fast, 4),
+        "speedup": round(t_pandas / t_fast, 2) if t_fast else None,
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    r = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(run(n, r))
@@ -0,0 +1,74 @@
+"""
+Đo cold start của API: thời gian 'import main' trong process Python mới,
+các module nặng bị import sớm (phải được import lười) và top import theo -X importtime.
+
+    python -m benchmarks.bench_startup [số lần] [ngân sách giây]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "1.5"))
+# Không được có trong sys.modules ngay sau 'import main'
+LAZY_MODULES = ("playwright", "crawlee", "pandas", "numpy", "jmespath", "loguru", "psycopg2", "yt_dlp")
+
+_PROBE = """
+import sys, json, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "eager": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def import_once(module: str = "main") -> Tuple[float, List[str]]:
+    """(giây import module, các LAZY_MODULES đã bị import) trong một process mới."""
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "STARTUP_WARMUP": "0"},
+    ).stdout
+    data = json.loads(out.strip().splitlines()[-1])
+    return data["seconds"], data["eager"]
+
+
+def top_imports(module: str = "main", n: int = 10) -> List[Tuple[str, float]]:
+    """n module tốn nhiều thời gian nhất (cumulative, giây) khi import module."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() != module:
+            rows.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:n]
+
+
+def run(repeat: int = 5, budget: float = STARTUP_BUDGET_S) -> dict:
+    runs = [import_once() for _ in range(repeat)]
+    median = statistics.median(s for s, _ in runs)
+    eager = sorted({m for _, mods in runs for m in mods})
+    return {
+        "import_main_s": round(median, 4),
+        "budget_s": budget,
+        "eager_heavy_modules": eager,
+        "top_imports": [(name, round(s, 4)) for name, s in top_imports()],
+        "ok": median <= budget and not eager,
+    }
+
+
+if __name__ == "__main__":
+    r = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    b = float(sys.argv[2]) if len(sys.argv) > 2 else STARTUP_BUDGET_S
+    result = run(r, b)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    sys.exit(0 if result["ok"] else 1)
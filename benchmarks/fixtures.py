@@ -0,0 +1,397 @@
+"""
+Dữ liệu giả lập (sinh bằng code, tất định theo seed) cho bộ benchmark offline:
+trang API comment / reply, trang Creative Center (HTML + XHR "View More"),
+trang cá nhân + API item_list và file VTT.
+
+Cấu trúc HTML được dựng từ chính các selector mà crawler dùng (materialize),
+nên khi selector trong crawler đổi thì chỉ cần cập nhật các hằng ở đây.
+"""
+import re
+import json
+import random
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+
+WORDS = ("hôm nay mình review sản phẩm giảm giá sốc chị em ơi mua ngay "
+         "link ở bio nhé video trend đẹp quá xinh xỉu Việt Nam").split()
+
+# ===== Selector của crawler Creative Center (phải khớp tiktok_trend/*.py) =====
+BANNER = "#ccModuleBannerWrap div div div div"
+LANGUAGE_CURRENT = "#ccModuleBannerWrap div div div div span span span span div span:nth-child(1)"
+LANGUAGE_INPUT_PLACEHOLDER = "Nhập/chọn từ danh sách"
+LANGUAGE_OPTION = 'div.byted-select-popover-panel-inner span.byted-high-light:has-text("Việt Nam")'
+PERIOD_OPTION = "div.creative-component-single-line"
+VIDEOS_SORT_DROPDOWN = (
+    '#ccContentContainer > div.BannerLayout_listWrapper__2FJA_ > div > '
+    'div.PopularList_listSearcher__Bko2l.index-mobile_listSearcher__rKZAb > '
+    'div.ListFilter_container__DwDsk.index-mobile_container__3wl4i.PopularList_sorter__N_G9_.index-mobile_filters__LxraM > '
+    'div:nth-child(1) > div.ListFilter_RightSearchWrap__UyaKk > div > '
+    'span.byted-select.byted-select-size-md.byted-select-single.byted-can-input-grouped.'
+    'CcRimlessSelect_ccRimSelector__m4xdd.index-mobile_ccRimSelector__S2lLr.index-mobile_sortWrapSelect__2Yw1N > '
+    'span > span > span > div'
+)
+VIDEOS_PERIOD_SELECT = "#tiktokPeriodSelect > span > div > div"
+VIDEOS_VIEW_MORE = 'div[data-testid="cc_contentArea_viewmore_btn"]'
+AUDIO_PERIOD_SELECT = "#soundPeriodSelect > span > div > div"
+AUDIO_VIEW_MORE = (
+    '#ccContentContainer > div.BannerLayout_listWrapper__2FJA_ > div > div:nth-child(2) > '
+    'div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div'
+)
+HASHTAG_VIEW_MORE = (
+    '#ccContentContainer > div.HashtagList_listContainer__BvfHH.index-mobile_listContainer__ttJOQ > div > '
+    'div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div'
+)
+PERIODS = ("7", "30", "120")
+
+
+def _text(rnd: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(lo, hi)))
+
+
+# ---------- Comment API ----------
+class CommentFixture:
+    """
+    Một video giả với n_comments comment gốc; khoảng reply_ratio comment có
+    reply (mỗi comment tối đa max_replies). Trả trang theo cursor/count như
+    /api/comment/list/ và /api/comment/list/reply/.
+    """
+
+    def __init__(self, aweme_id: str = "7516102298347506952", n_comments: int = 500,
+                 reply_ratio: float = 0.1, max_replies: int = 60, seed: int = 0) -> None:
+        rnd = random.Random(seed)
+        self.aweme_id = aweme_id
+        self.comments: List[Dict[str, Any]] = []
+        self.replies: Dict[str, List[Dict[str, Any]]] = {}
+        for i in range(n_comments):
+            cid = f"{aweme_id}{i:06d}"
+            n_replies = rnd.randint(1, max_replies) if rnd.random() < reply_ratio else 0
+            self.comments.append(self._comment(rnd, cid, n_replies))
+            if n_replies:
+                self.replies[cid] = [self._comment(rnd, f"{cid}r{j:04d}", 0) for j in range(n_replies)]
+
+    def _comment(self, rnd: random.Random, cid: str, n_replies: int) -> Dict[str, Any]:
+        user = f"user_{rnd.randrange(10 ** 6):06d}"
+        return {
+            "cid": cid,
+            "text": _text(rnd, 3, 40),
+            "create_time": 1_700_000_000 + rnd.randrange(10 ** 7),
+            "digg_count": rnd.randrange(10 ** 5),
+            "reply_comment_total": n_replies,
+            "user": {
+                "unique_id": user,
+                "nickname": user.replace("_", " ").title(),
+                "avatar_thumb": {"url_list": [f"https://p16-sign.tiktokcdn.com/{user}.jpeg"]},
+            },
+            "share_info": {
+                "title": "Video review giảm giá #xuhuong",
+                "url": f"https://www.tiktok.com/@_/video/{self.aweme_id}",
+            },
+        }
+
+    @property
+    def total(self) -> int:
+        return len(self.comments) + sum(len(r) for r in self.replies.values())
+
+    @staticmethod
+    def _page(items: List[Dict[str, Any]], cursor: int, count: int) -> Dict[str, Any]:
+        chunk = items[cursor:cursor + count]
+        return {
+            "comments": chunk or None,  # TikTok trả null khi hết trang
+            "cursor": cursor + len(chunk),
+            "has_more": int(cursor + count < len(items)),
+            "total": len(items),
+            "status_code": 0,
+        }
+
+    def comment_page(self, cursor: int, count: int) -> Dict[str, Any]:
+        return self._page(self.comments, cursor, count)
+
+    def reply_page(self, comment_id: str, cursor: int, count: int) -> Dict[str, Any]:
+        return self._page(self.replies.get(comment_id, []), cursor, count)
+
+
+# ---------- Dựng HTML từ selector ----------
+_COMPOUND = re.compile(
+    r"^(?P<tag>[a-zA-Z][\w-]*)|#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)"
+    r"|\[(?P<attr>[\w-]+)(?:=\"(?P<val>[^\"]*)\")?\]"
+    r"|:nth-child\((?P<nth>\d+)\)|:has-text\((?P<q>['\"])(?P<text>.*?)(?P=q)\)"
+)
+
+
+def _split_selector(selector: str) -> List[str]:
+    """Tách selector thành các compound (bỏ '>' / khoảng trắng, tôn trọng ngoặc và dấu nháy)."""
+    parts, buf, depth, quote = [], "", 0, None
+    for ch in selector:
+        if quote:
+            buf += ch
+            if ch == quote:
+                quote = None
+            continue
+        if ch in "'\"":
+            quote = ch
+        elif ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif depth == 0 and (ch.isspace() or ch == ">"):
+            if buf:
+                parts.append(buf)
+            buf = ""
+            continue
+        buf += ch
+    if buf:
+        parts.append(buf)
+    return parts
+
+
+class _Node:
+    def __init__(self, tag: str = "div") -> None:
+        self.tag = tag
+        self.attrs: Dict[str, str] = {}
+        self.classes: List[str] = []
+        self.text = ""
+        self.raw = ""  # HTML chèn nguyên văn vào cuối node
+        self.children: List["_Node"] = []
+
+    def html(self) -> str:
+        attrs = dict(self.attrs)
+        if self.classes:
+            attrs["class"] = " ".join(self.classes)
+        attr_s = "".join(f' {k}="{escape(v)}"' for k, v in attrs.items())
+        if self.tag == "input":
+            return f"<input{attr_s}>"
+        inner = escape(self.text) + "".join(c.html() for c in self.children) + self.raw
+        return f"<{self.tag}{attr_s}>{inner}</{self.tag}>"
+
+
+class PageBuilder:
+    """Gộp nhiều selector thành một cây DOM tối thiểu thoả mãn tất cả."""
+
+    def __init__(self) -> None:
+        self.root = _Node("body")
+
+    def add(self, selector: str, text: Optional[str] = None, **attrs: str) -> _Node:
+        node = self.root
+        for compound in _split_selector(selector):
+            spec = self._parse(compound)
+            node = self._child(node, spec)
+        if text is not None:
+            node.text = text
+        node.attrs.update(attrs)
+        return node
+
+    @staticmethod
+    def _parse(compound: str) -> Dict[str, Any]:
+        spec: Dict[str, Any] = {"tag": "div", "id": None, "classes": [], "attrs": {}, "nth": None, "text": None}
+        for m in _COMPOUND.finditer(compound):
+            if m.group("tag"):
+                spec["tag"] = m.group("tag")
+            elif m.group("id"):
+                spec["id"] = m.group("id")
+            elif m.group("cls"):
+                spec["classes"].append(m.group("cls"))
+            elif m.group("attr"):
+                spec["attrs"][m.group("attr")] = m.group("val") or ""
+            elif m.group("nth"):
+                spec["nth"] = int(m.group("nth"))
+            elif m.group("text") is not None:
+                spec["text"] = m.group("text")
+        return spec
+
+    @staticmethod
+    def _matches(node: _Node, spec: Dict[str, Any]) -> bool:
+        return (node.tag == spec["tag"]
+                and (spec["id"] is None or node.attrs.get("id") == spec["id"])
+                and all(c in node.classes for c in spec["classes"])
+                and all(node.attrs.get(k) == v for k, v in spec["attrs"].items())
+                and (spec["text"] is None or node.text == spec["text"]))
+
+    def _child(self, parent: _Node, spec: Dict[str, Any]) -> _Node:
+        if spec["nth"] is not None:
+            while len(parent.children) < spec["nth"]:
+                parent.children.append(_Node(spec["tag"]))
+            node = parent.children[spec["nth"] - 1]
+            node.tag = spec["tag"]
+        else:
+            node = next((c for c in parent.children if self._matches(c, spec)), None)
+            if node is None:
+                node = _Node(spec["tag"])
+                parent.children.append(node)
+        if spec["id"]:
+            node.attrs["id"] = spec["id"]
+        node.classes.extend(c for c in spec["classes"] if c not in node.classes)
+        node.attrs.update(spec["attrs"])
+        if spec["text"] is not None:
+            node.text = spec["text"]
+        return node
+
+    def render(self, title: str, script: str = "") -> str:
+        return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+                f"<title>{escape(title)}</title></head>"
+                f"{self.root.html()[:-len('</body>')]}<script>{script}</script></body></html>")
+
+
+# ---------- Creative Center ----------
+# kind -> (cách render một item bằng JS, selector nút View More, selector chọn period)
+_CC_KINDS: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "videos": (
+        "it => `<blockquote class=\"tiktok-embed\" data-video-id=\"${it.id}\">${it.title}</blockquote>`",
+        VIDEOS_VIEW_MORE, VIDEOS_PERIOD_SELECT,
+    ),
+    "audio": (
+        "it => `<div><a class=\"index-mobile_goToDetailBtnWrapper__puubr\" "
+        "href=\"/business/creativecenter/song/${it.slug}-${it.id}?countryCode=VN\">${it.title}</a></div>`",
+        AUDIO_VIEW_MORE, AUDIO_PERIOD_SELECT,
+    ),
+    "hashtag": (
+        "it => `<div><span class=\"CardPc_titleText__RYOWo\"># ${it.title}</span></div>`",
+        HASHTAG_VIEW_MORE, None,
+    ),
+}
+
+
+class CreativeCenterFixture:
+    """Bảng xếp hạng giả (videos / audio / hashtag) chia trang cho XHR 'View More'."""
+
+    def __init__(self, kind: str, n_items: int = 500, page_size: int = 20, seed: int = 0) -> None:
+        if kind not in _CC_KINDS:
+            raise ValueError(f"kind phải là một trong {sorted(_CC_KINDS)}")
+        rnd = random.Random(seed)
+        self.kind = kind
+        self.page_size = page_size
+        self.items = []
+        for i in range(n_items):
+            title = _text(rnd, 1, 4)
+            self.items.append({
+                "id": str(7_000_000_000_000_000_000 + i * 7919 + rnd.randrange(7919)),
+                "title": title,
+                "slug": "-".join(title.split()),
+            })
+
+    def page(self, page: int) -> Dict[str, Any]:
+        start = page * self.page_size
+        chunk = self.items[start:start + self.page_size]
+        return {"list": chunk, "page": page, "has_more": start + self.page_size < len(self.items)}
+
+    def html(self, api_path: str) -> str:
+        render, view_more, period_select = _CC_KINDS[self.kind]
+        b = PageBuilder()
+        b.add(BANNER)
+        b.add(LANGUAGE_CURRENT, "Việt Nam")
+        b.add(f'input[placeholder="{LANGUAGE_INPUT_PLACEHOLDER}"]')
+        b.add(LANGUAGE_OPTION)
+        if self.kind == "videos":
+            b.add(VIDEOS_SORT_DROPDOWN, "Phổ biến")
+        if period_select:
+            b.add(period_select, "7 ngày qua")
+            for p in PERIODS:
+                b.add(f"{PERIOD_OPTION}:has-text('{p} ngày qua')")
+        b.add(view_more, "Xem thêm", id="benchViewMore")
+        b.add("#benchList").raw = "".join(
+            _render_static(self.kind, it) for it in self.page(0)["list"]
+        )
+        script = f"""
+const render = {render};
+let page = 0;
+document.getElementById('benchViewMore').addEventListener('click', async () => {{
+  page += 1;
+  const res = await fetch('{api_path}?page=' + page);
+  const data = await res.json();
+  document.getElementById('benchList').insertAdjacentHTML('beforeend', data.list.map(render).join(''));
+  if (!data.has_more) document.getElementById('benchViewMore').remove();
+}});
+"""
+        return b.render(f"Creative Center {self.kind}", script)
+
+
+def _render_static(kind: str, it: Dict[str, Any]) -> str:
+    # Trang đầu render sẵn phía server (khớp với hàm render JS của _CC_KINDS)
+    title = escape(it["title"])
+    if kind == "videos":
+        return f'<blockquote class="tiktok-embed" data-video-id="{it["id"]}">{title}</blockquote>'
+    if kind == "audio":
+        return (f'<div><a class="index-mobile_goToDetailBtnWrapper__puubr" '
+                f'href="/business/creativecenter/song/{escape(it["slug"])}-{it["id"]}?countryCode=VN">{title}</a></div>')
+    return f'<div><span class="CardPc_titleText__RYOWo"># {title}</span></div>'
+
+
+# ---------- Trang cá nhân + item_list ----------
+class ProfileFixture:
+    """Trang cá nhân giả: lô đầu render sẵn, scroll tới cuối thì fetch /api/post/item_list/."""
+
+    def __init__(self, username: str = "bench_user", n_posts: int = 120,
+                 page_size: int = 30, seed: int = 0) -> None:
+        rnd = random.Random(seed)
+        self.username = username
+        self.page_size = page_size
+        self.posts = [{
+            "id": str(7_400_000_000_000_000_000 + i * 104729 + rnd.randrange(104729)),
+            "desc": _text(rnd, 3, 15),
+            "stats": {"playCount": rnd.choice([rnd.randrange(1000), rnd.randrange(10 ** 6), rnd.randrange(10 ** 8)])},
+        } for i in range(n_posts)]
+
+    def item_list(self, cursor: int) -> Dict[str, Any]:
+        chunk = self.posts[cursor:cursor + self.page_size]
+        return {
+            "itemList": chunk,
+            "cursor": str(cursor + len(chunk)),
+            "hasMore": cursor + self.page_size < len(self.posts),
+            "statusCode": 0,
+        }
+
+    def _item_html(self, post: Dict[str, Any]) -> str:
+        return (f'<div data-e2e="user-post-item" style="height:320px">'
+                f'<a href="https://www.tiktok.com/@{self.username}/video/{post["id"]}">{escape(post["desc"])}</a>'
+                f'<strong data-e2e="video-views">{format_views(post["stats"]["playCount"])}</strong></div>')
+
+    def html(self, api_path: str) -> str:
+        first = self.item_list(0)
+        script = f"""
+const user = {json.dumps(self.username)};
+const fmt = n => n >= 1e6 ? (n / 1e6).toFixed(1) + 'M' : n >= 1e3 ? (n / 1e3).toFixed(1) + 'K' : String(n);
+let cursor = {json.dumps(first["cursor"])}, hasMore = {json.dumps(first["hasMore"])}, loading = false;
+window.addEventListener('scroll', async () => {{
+  if (loading || !hasMore) return;
+  if (window.scrollY + window.innerHeight < document.body.scrollHeight - 400) return;
+  loading = true;
+  const res = await fetch('{api_path}?count={self.page_size}&cursor=' + cursor);
+  const data = await res.json();
+  document.getElementById('posts').insertAdjacentHTML('beforeend', data.itemList.map(p =>
+    `<div data-e2e="user-post-item" style="height:320px"><a href="https://www.tiktok.com/@${{user}}/video/${{p.id}}">${{p.desc}}</a>` +
+    `<strong data-e2e="video-views">${{fmt(p.stats.playCount)}}</strong></div>`).join(''));
+  cursor = data.cursor; hasMore = data.hasMore; loading = false;
+}});
+"""
+        items = "".join(self._item_html(p) for p in first["itemList"])
+        return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+                f"<title>@{escape(self.username)} | TikTok</title></head>"
+                f'<body><div id="posts">{items}</div><script>{script}</script></body></html>')
+
+
+def format_views(n: int) -> str:
+    """Định dạng lượt xem như TikTok ('1.2M', '15.3K', '732'); normalize_views đọc ngược lại."""
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M"
+    if n >= 1_000:
+        return f"{n / 1_000:.1f}K"
+    return str(n)
+
+
+# ---------- VTT ----------
+def make_vtt(n_cues: int = 2000, seed: int = 0) -> str:
+    """Phụ đề WEBVTT giả: n_cues cue, mỗi cue 1-2 dòng text."""
+    rnd = random.Random(seed)
+    out = ["WEBVTT", "Kind: captions", "Language: vi", ""]
+    t = 0.0
+    for _ in range(n_cues):
+        start, t = t, t + rnd.uniform(0.8, 4.0)
+        out.append(f"{_ts(start)} --> {_ts(t)}")
+        out.extend(_text(rnd, 3, 12) for _ in range(rnd.randint(1, 2)))
+        out.append("")
+    return "\n".join(out)
+
+
+def _ts(seconds: float) -> str:
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
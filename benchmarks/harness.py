@@ -0,0 +1,193 @@
+"""
+Đo một benchmark (thời gian, throughput, bộ nhớ đỉnh) và so với ngưỡng hồi quy.
+
+Thời gian lấy từ các lần chạy không bật tracemalloc; bộ nhớ đỉnh (heap Python)
+đo ở một lần chạy riêng có tracemalloc để không làm sai lệch thời gian.
+Báo cáo cấp phát (allocations > 0): chạy thêm vài lần dưới tracemalloc, đo phần bộ nhớ
+còn giữ lại sau mỗi lần (growth_kb, ~0 = trạng thái ổn định, không tích rác theo vòng)
+và liệt kê các dòng code giữ lại nhiều nhất.
+"""
+import gc
+import os
+import time
+import statistics
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Hàm benchmark trả về số item xử lý được
+BenchFn = Callable[[], int]
+
+# Số lần chạy để đo phần bộ nhớ giữ lại, và số frame traceback tracemalloc lưu cho mỗi cấp phát
+STEADY_RUNS = 3
+TRACE_FRAMES = 1
+# Bỏ cấp phát của chính tracemalloc / cơ chế import / stand-in server khỏi báo cáo
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+    # Stand-in server chạy bằng thread trong cùng process
+    tracemalloc.Filter(False, "*/http/server.py"),
+    tracemalloc.Filter(False, "*/socketserver.py"),
+    tracemalloc.Filter(False, "*/benchmarks/server.py"),
+)
+
+
+@dataclass
+class BenchResult:
+    name: str
+    runs: int = 0
+    items: int = 0
+    median_s: float = 0.0
+    best_s: float = 0.0
+    items_per_s: float = 0.0
+    latency_ms: float = 0.0  # thời gian trung bình cho một item
+    peak_mb: float = 0.0
+    growth_kb: Optional[float] = None  # bộ nhớ giữ lại thêm sau mỗi lần chạy (đã warmup)
+    top_allocations: List[str] = field(default_factory=list)
+    skipped: Optional[str] = None
+    failures: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class Threshold:
+    """Ngưỡng tuyệt đối; None = không kiểm tra."""
+    max_median_s: Optional[float] = None
+    min_items_per_s: Optional[float] = None
+    max_peak_mb: Optional[float] = None
+    min_items: Optional[int] = None
+    max_growth_kb: Optional[float] = None  # chỉ kiểm tra khi có báo cáo cấp phát
+
+
+def _site(stat: tracemalloc.StatisticDiff) -> str:
+    frame = stat.traceback[0]
+    try:
+        filename = os.path.relpath(frame.filename)
+    except ValueError:
+        filename = frame.filename
+    return f"{filename}:{frame.lineno}  {stat.size_diff / 1024:+.1f} KB  ({stat.count_diff:+d} block)"
+
+
+def allocation_report(fn: BenchFn, runs: int = STEADY_RUNS, top: int = 10) -> Tuple[float, float, List[str]]:
+    """
+    (peak_mb của lần chạy đầu, growth_kb mỗi lần chạy sau, top dòng code giữ lại nhiều nhất).
+    Lần đầu nạp cache / import nên không tính vào growth; các lần sau phải quay về cùng mức
+    bộ nhớ nếu vòng lặp không tích rác (so hai snapshot sau gc.collect()).
+    """
+    gc.collect()
+    tracemalloc.start(TRACE_FRAMES)
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        for _ in range(runs):
+            fn()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    # Lọc sau khi dừng trace: cache pattern của filter không bị tính là phần giữ lại
+    diff = after.filter_traces(_TRACE_FILTERS).compare_to(before.filter_traces(_TRACE_FILTERS), "lineno")
+    growth = sum(stat.size_diff for stat in diff) / max(1, runs)
+    sites = [_site(stat) for stat in diff[:top] if stat.size_diff > 0]
+    return round(peak / 2 ** 20, 2), round(growth / 1024, 2), sites
+
+
+def measure(name: str, fn: BenchFn, repeat: int = 3, warmup: int = 1,
+            memory: bool = True, allocations: int = 0) -> BenchResult:
+    for _ in range(warmup):
+        fn()
+
+    times, items = [], 0
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        items = fn()
+        times.append(time.perf_counter() - t0)
+
+    peak, growth, sites = 0.0, None, []
+    if allocations:
+        peak, growth, sites = allocation_report(fn, top=allocations)
+    elif memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        finally:
+            tracemalloc.stop()
+
+    median = statistics.median(times)
+    return BenchResult(
+        name=name,
+        runs=repeat,
+        items=items,
+        median_s=round(median, 4),
+        best_s=round(min(times), 4),
+        items_per_s=round(items / median, 2) if median else 0.0,
+        latency_ms=round(median * 1000 / items, 3) if items else 0.0,
+        peak_mb=peak,
+        growth_kb=growth,
+        top_allocations=sites,
+    )
+
+
+def check(result: BenchResult, threshold: Optional[Threshold] = None,
+          baseline: Optional[Dict[str, Any]] = None, tolerance: float = 0.25) -> List[str]:
+    """
+    Danh sách vi phạm (rỗng = đạt): so với ngưỡng tuyệt đối và, nếu có,
+    với kết quả baseline của cùng benchmark (chậm hơn / tốn bộ nhớ hơn quá tolerance).
+    """
+    if result.skipped:
+        return []
+    failures = []
+    if threshold is not None:
+        if threshold.min_items is not None and result.items < threshold.min_items:
+            failures.append(f"items {result.items} < {threshold.min_items}")
+        if threshold.max_median_s is not None and result.median_s > threshold.max_median_s:
+            failures.append(f"median {result.median_s}s > {threshold.max_median_s}s")
+        if threshold.min_items_per_s is not None and result.items_per_s < threshold.min_items_per_s:
+            failures.append(f"{result.items_per_s} item/s < {threshold.min_items_per_s} item/s")
+        if threshold.max_peak_mb is not None and result.peak_mb > threshold.max_peak_mb:
+            failures.append(f"peak {result.peak_mb}MB > {threshold.max_peak_mb}MB")
+        if (threshold.max_growth_kb is not None and result.growth_kb is not None
+                and result.growth_kb > threshold.max_growth_kb):
+            failures.append(f"giữ lại {result.growth_kb}KB/lần chạy > {threshold.max_growth_kb}KB")
+    if baseline and not baseline.get("skipped"):
+        limit = 1 + tolerance
+        if baseline.get("median_s") and result.median_s > baseline["median_s"] * limit:
+            failures.append(f"median {result.median_s}s chậm hơn baseline {baseline['median_s']}s quá {tolerance:.0%}")
+        if baseline.get("peak_mb") and result.peak_mb > baseline["peak_mb"] * limit:
+            failures.append(f"peak {result.peak_mb}MB vượt baseline {baseline['peak_mb']}MB quá {tolerance:.0%}")
+    result.failures = failures
+    return failures
+
+
+def format_table(results: List[BenchResult]) -> str:
+    header = f"{'benchmark':<22}{'items':>8}{'median s':>11}{'best s':>10}{'item/s':>11}{'ms/item':>10}{'peak MB':>10}  status"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        if r.skipped:
+            lines.append(f"{r.name:<22}{'':>60}  SKIP ({r.skipped})")
+            continue
+        status = "FAIL: " + "; ".join(r.failures) if r.failures else "ok"
+        lines.append(f"{r.name:<22}{r.items:>8}{r.median_s:>11.4f}{r.best_s:>10.4f}"
+                     f"{r.items_per_s:>11.1f}{r.latency_ms:>10.3f}{r.peak_mb:>10.2f}  {status}")
+    return "\n".join(lines)
+
+
+def format_allocations(results: List[BenchResult]) -> str:
+    """Báo cáo cấp phát: bộ nhớ giữ lại mỗi lần chạy và các dòng code giữ lại nhiều nhất."""
+    lines = []
+    for r in results:
+        if r.growth_kb is None:
+            continue
+        lines.append(f"{r.name}: giữ lại {r.growth_kb:+.2f} KB/lần chạy (peak {r.peak_mb} MB)")
+        lines.extend(f"    {site}" for site in r.top_allocations)
+    return "\n".join(lines)
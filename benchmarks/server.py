@@ -0,0 +1,182 @@
+"""
+Server HTTP cục bộ đóng vai TikTok / Creative Center cho benchmark offline.
+
+    with StandInServer() as server:
+        server.url("/api/comment/list/")
+
+Route:
+    /api/comment/list/, /api/comment/list/reply/   trang JSON comment / reply
+    /cc/<kind>  và  /cc/<kind>/list?page=N          trang Creative Center + XHR View More
+    /@<user>    và  /api/post/item_list/?cursor=N   trang cá nhân + API item_list
+    /vtt/<name>.vtt                                  phụ đề WEBVTT
+
+StandInProxy đóng vai HTTP proxy (forward, URL tuyệt đối) trước StandInServer,
+có thể giả lập IP bị chặn (429) để thử pool proxy.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .fixtures import CommentFixture, CreativeCenterFixture, ProfileFixture, make_vtt
+
+Reply = Tuple[int, str, bytes]  # (status, content-type, body)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"  # keep-alive như server thật
+    disable_nagle_algorithm = True  # header và body ghi riêng: tránh trễ 40ms do delayed ACK
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        stand_in = self.server.stand_in
+        stand_in.hit(parts.path)
+        if stand_in.latency:
+            time.sleep(stand_in.latency)
+        try:
+            status, content_type, body = stand_in.route(parts.path, query)
+        except (KeyError, ValueError) as e:
+            status, content_type, body = 400, "text/plain; charset=utf-8", str(e).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: "_Background"
+
+
+class _Background:
+    """Server HTTP trên 127.0.0.1 (cổng ngẫu nhiên) chạy trong thread nền; lớp con cài route()."""
+    latency: float = 0.0
+
+    def __init__(self) -> None:
+        self.hits: Dict[str, int] = {}
+        self._hits_lock = threading.Lock()
+        self._httpd: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def route(self, path: str, query: Dict[str, str]) -> Reply:
+        raise NotImplementedError
+
+    # ---------- vòng đời ----------
+    def start(self):
+        self._httpd = _Server(("127.0.0.1", 0), _Handler)
+        self._httpd.stand_in = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        if self._httpd is None:
+            raise RuntimeError(f"{type(self).__name__} chưa start()")
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def hit(self, path: str) -> None:
+        with self._hits_lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+
+
+class StandInServer(_Background):
+    """
+    Phục vụ fixture sinh sẵn trên 127.0.0.1 (cổng ngẫu nhiên) trong một thread nền.
+    latency: độ trễ giả lập (giây) thêm vào mỗi response.
+    """
+
+    def __init__(self, comments: Optional[CommentFixture] = None,
+                 creative_center: Optional[Dict[str, CreativeCenterFixture]] = None,
+                 profile: Optional[ProfileFixture] = None,
+                 vtt_cues: int = 2000, latency: float = 0.0) -> None:
+        super().__init__()
+        self.comments = comments or CommentFixture()
+        self.creative_center = creative_center or {
+            kind: CreativeCenterFixture(kind) for kind in ("videos", "audio", "hashtag")
+        }
+        self.profile = profile or ProfileFixture()
+        self.vtt_cues = vtt_cues
+        self.latency = latency
+
+    # ---------- routing ----------
+    def route(self, path: str, query: Dict[str, str]) -> Reply:
+        if path == "/api/comment/list/":
+            return _json(self.comments.comment_page(int(query.get("cursor", 0)), int(query.get("count", 50))))
+        if path == "/api/comment/list/reply/":
+            return _json(self.comments.reply_page(query["comment_id"], int(query.get("cursor", 0)),
+                                                  int(query.get("count", 50))))
+        if path == "/api/post/item_list/":
+            return _json(self.profile.item_list(int(query.get("cursor", 0))))
+        if path.startswith("/cc/"):
+            kind, _, rest = path[len("/cc/"):].partition("/")
+            fixture = self.creative_center.get(kind)
+            if fixture is not None:
+                if rest == "list":
+                    return _json(fixture.page(int(query.get("page", 0))))
+                if not rest:
+                    return _html(fixture.html(f"/cc/{kind}/list"))
+        if path == f"/@{self.profile.username}":
+            return _html(self.profile.html("/api/post/item_list/"))
+        if path.startswith("/vtt/") and path.endswith(".vtt"):
+            return 200, "text/vtt; charset=utf-8", make_vtt(self.vtt_cues).encode("utf-8")
+        return 404, "text/plain; charset=utf-8", b"not found"
+
+
+class StandInProxy(_Background):
+    """
+    HTTP proxy giả trước upstream (StandInServer): trả lời thẳng từ fixture của upstream
+    thay vì mở kết nối mới. blocked=True giả lập IP ra bị TikTok chặn (mọi request -> 429).
+    """
+
+    def __init__(self, upstream: StandInServer, blocked: bool = False, latency: float = 0.0) -> None:
+        super().__init__()
+        self.upstream = upstream
+        self.blocked = blocked
+        self.latency = latency
+
+    @property
+    def proxy_url(self) -> str:
+        return self.base_url
+
+    @property
+    def requests(self) -> int:
+        with self._hits_lock:
+            return sum(self.hits.values())
+
+    def route(self, path: str, query: Dict[str, str]) -> Reply:
+        if self.blocked:
+            return 429, "text/plain; charset=utf-8", b"too many requests"
+        return self.upstream.route(path, query)
+
+
+def _json(data: Any) -> Reply:
+    return 200, "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _html(text: str) -> Reply:
+    return 200, "text/html; charset=utf-8", text.encode("utf-8")
@@ -0,0 +1,246 @@
+"""
+Bộ benchmark offline: chạy crawler / bước phân tích trên fixture phát từ
+StandInServer (127.0.0.1), đo thời gian, throughput, bộ nhớ đỉnh và so với ngưỡng.
+
+    python -m benchmarks.suite                          # tất cả, kiểm tra THRESHOLDS
+    python -m benchmarks.suite --only comments,groups --repeat 5
+    python -m benchmarks.suite --save bench.json        # lưu kết quả làm baseline
+    python -m benchmarks.suite --baseline bench.json    # báo hồi quy > 25% so với baseline
+    python -m benchmarks.suite --allocations 10         # + bộ nhớ giữ lại mỗi lần chạy, top 10 dòng cấp phát
+
+Benchmark thiếu dependency (vd. chưa cài playwright / crawlee) được đánh dấu SKIP.
+Thoát với mã 1 nếu có benchmark vượt ngưỡng (dùng được trong CI).
+"""
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from .fixtures import CommentFixture, CreativeCenterFixture, ProfileFixture
+from .harness import BenchFn, BenchResult, Threshold, check, format_allocations, format_table, measure
+from .server import StandInProxy, StandInServer
+
+# ===== Kích thước fixture =====
+COMMENTS = 1000          # comment gốc (khoảng 10% có reply)
+TREND_ITEMS = 200        # item mỗi bảng xếp hạng Creative Center
+TREND_LIMIT = 100        # limit truyền cho crawler trend (5 lần View More)
+PROFILE_POSTS = 120
+PROFILE_LIMIT = 60       # 1 lần gọi item_list sau lô đầu
+VTT_CUES = 20000
+GROUP_DOCS = 300
+
+
+class Benchmark(NamedTuple):
+    # setup(server) -> hàm đo (trả về số item); ImportError => SKIP
+    setup: Callable[[StandInServer], BenchFn]
+    threshold: Threshold
+    browser: bool = False  # crawler trình duyệt: chạy 1 lần, không warmup / tracemalloc (trừ --allocations)
+
+
+# ---------- Benchmarks ----------
+def _comments(server: StandInServer) -> BenchFn:
+    from net.rate_limit import RateLimiter
+    from tiktok.tiktok_comment_scrapper.tiktokcomment import TiktokComment
+
+    class StandInComment(TiktokComment):
+        API_URL = server.url("/api")
+
+    # Limiter không chặn: đo code parse / phân trang, không đo token bucket
+    limiter = RateLimiter(rate=1e6, max_rate=1e6, burst=1e6)
+
+    def run() -> int:
+        data = StandInComment(limiter=limiter).get_all_comments(server.comments.aweme_id)
+        return sum(1 + len(c.replies) for c in data.comments)
+    return run
+
+
+def _comments_proxied(server: StandInServer) -> BenchFn:
+    from net.proxy_pool import ProxyPool
+    from net.rate_limit import RateLimiter
+    from tiktok.tiktok_comment_scrapper.tiktokcomment import TiktokComment
+
+    class StandInComment(TiktokComment):
+        API_URL = server.url("/api")
+
+    # Một proxy bị chặn (429) cạnh một proxy tốt: pool phải cách ly proxy xấu và crawl vẫn đủ
+    # (thread daemon, sống đến hết process như server)
+    good = StandInProxy(server).start()
+    blocked = StandInProxy(server, blocked=True).start()
+    limiter = RateLimiter(rate=1e6, max_rate=1e6, burst=1e6)
+
+    def run() -> int:
+        pool = ProxyPool([blocked.proxy_url, good.proxy_url], quarantine_failures=1)
+        data = StandInComment(limiter=limiter, proxies=pool).get_all_comments(server.comments.aweme_id)
+        return sum(1 + len(c.replies) for c in data.comments)
+    return run
+
+
+def _trend_videos(server: StandInServer) -> BenchFn:
+    from tiktok_trend.playwright_tiktok_ads import crawl_tiktok_trend_videos
+
+    url = server.url("/cc/videos")
+    return lambda: len(asyncio.run(
+        crawl_tiktok_trend_videos(url=url, limit=TREND_LIMIT, period="7", resume=False)
+    ))
+
+
+def _trend_audio(server: StandInServer) -> BenchFn:
+    from tiktok_trend.playwright_tiktok_audio import crawl_tiktok_trend_audio
+
+    url = server.url("/cc/audio")
+    return lambda: len(asyncio.run(crawl_tiktok_trend_audio(url=url, limit=TREND_LIMIT, period="7")))
+
+
+def _trend_hashtags(server: StandInServer) -> BenchFn:
+    from tiktok_trend.playwright_tiktok_hashtag import crawl_tiktok_hashtag
+
+    url = server.url("/cc/hashtag")
+    return lambda: len(crawl_tiktok_hashtag(url, limit=TREND_LIMIT))
+
+
+def _user_posts(server: StandInServer) -> BenchFn:
+    from tiktok.get_list_videos import get_posts_on_tiktok_users
+
+    url = server.url(f"/@{server.profile.username}")
+    return lambda: len(asyncio.run(
+        get_posts_on_tiktok_users(url, "firefox", PROFILE_LIMIT, resume=False)
+    ))
+
+
+def _vtt_to_text(server: StandInServer) -> BenchFn:
+    from utils.get_transcripts import vtt_to_text
+
+    # Tải VTT từ stand-in server một lần; chỉ đo phần parse
+    tmpdir = tempfile.mkdtemp(prefix="bench-vtt-")
+    path = Path(tmpdir) / "sub.vi.vtt"
+    with urllib.request.urlopen(server.url("/vtt/sub.vi.vtt")) as resp:
+        path.write_bytes(resp.read())
+
+    def run() -> int:
+        vtt_to_text(path)
+        return server.vtt_cues
+    return run
+
+
+def _groups(server: StandInServer) -> BenchFn:
+    import pandas as pd
+
+    from analysis_tiktok_trend.groups_pruned import compute_groups_sync
+    from .bench_normalize import make_corpus
+
+    docs = make_corpus(GROUP_DOCS)
+    df = pd.DataFrame({"text": docs}, index=[f"video_{i}" for i in range(len(docs))])
+
+    def run() -> int:
+        compute_groups_sync(df, 2, 6, 2)
+        return len(docs)
+    return run
+
+
+def _startup(server: StandInServer) -> BenchFn:
+    from .bench_startup import import_once
+
+    def run() -> int:
+        _, eager = import_once()
+        if eager:
+            raise RuntimeError(f"'import main' kéo theo module nặng: {', '.join(eager)}")
+        return 1
+    return run
+
+
+# Ngưỡng tuyệt đối rộng (máy CI chậm hơn máy dev); hồi quy nhỏ bắt bằng --baseline
+BENCHMARKS: Dict[str, Benchmark] = {
+    "comments": Benchmark(_comments, Threshold(min_items=COMMENTS, min_items_per_s=500, max_peak_mb=200,
+                                                     max_growth_kb=64)),
+    "comments_proxied": Benchmark(_comments_proxied, Threshold(min_items=COMMENTS, min_items_per_s=300,
+                                                               max_peak_mb=200, max_growth_kb=64)),
+    "trend_videos": Benchmark(_trend_videos, Threshold(min_items=TREND_LIMIT, max_median_s=120,
+                                                       max_growth_kb=256), browser=True),
+    "trend_audio": Benchmark(_trend_audio, Threshold(min_items=TREND_LIMIT, max_median_s=120,
+                                                     max_growth_kb=256), browser=True),
+    "trend_hashtags": Benchmark(_trend_hashtags, Threshold(min_items=TREND_LIMIT, max_median_s=120,
+                                                           max_growth_kb=256), browser=True),
+    "user_posts": Benchmark(_user_posts, Threshold(min_items=PROFILE_LIMIT, max_median_s=120,
+                                                   max_growth_kb=256), browser=True),
+    "vtt_to_text": Benchmark(_vtt_to_text, Threshold(min_items_per_s=100_000, max_peak_mb=50, max_growth_kb=16)),
+    "groups": Benchmark(_groups, Threshold(max_median_s=15, max_peak_mb=512, max_growth_kb=64)),
+    # cả khởi động interpreter + 'import main' (cold start của instance)
+    "startup": Benchmark(_startup, Threshold(max_median_s=2.0)),
+}
+
+
+def make_server(latency: float = 0.0) -> StandInServer:
+    return StandInServer(
+        comments=CommentFixture(n_comments=COMMENTS),
+        creative_center={kind: CreativeCenterFixture(kind, TREND_ITEMS)
+                         for kind in ("videos", "audio", "hashtag")},
+        profile=ProfileFixture(n_posts=PROFILE_POSTS),
+        vtt_cues=VTT_CUES,
+        latency=latency,
+    )
+
+
+def run_suite(names: Optional[List[str]] = None, repeat: int = 3, latency: float = 0.0,
+              baseline: Optional[Dict[str, Any]] = None, tolerance: float = 0.25,
+              allocations: int = 0) -> List[BenchResult]:
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Không có benchmark: {', '.join(sorted(unknown))}")
+
+    results = []
+    with make_server(latency) as server:
+        for name in names:
+            bench = BENCHMARKS[name]
+            try:
+                fn = bench.setup(server)
+            except ImportError as e:
+                results.append(BenchResult(name=name, skipped=f"thiếu dependency: {e.name or e}"))
+                continue
+            try:
+                if bench.browser:
+                    result = measure(name, fn, repeat=1, warmup=0, memory=False, allocations=allocations)
+                else:
+                    result = measure(name, fn, repeat=repeat, allocations=allocations)
+            except Exception as e:
+                results.append(BenchResult(name=name, failures=[f"lỗi: {e}"]))
+                continue
+            check(result, bench.threshold, (baseline or {}).get(name), tolerance)
+            results.append(result)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help="danh sách benchmark, phân cách bằng dấu phẩy")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="độ trễ giả lập mỗi response (giây)")
+    parser.add_argument("--baseline", type=Path, help="file JSON kết quả lần trước (từ --save)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="mức chậm hơn baseline cho phép (0.25 = 25%%)")
+    parser.add_argument("--save", type=Path, help="ghi kết quả ra file JSON")
+    parser.add_argument("--allocations", type=int, default=0, metavar="N",
+                        help="báo cáo tracemalloc: bộ nhớ giữ lại mỗi lần chạy và N dòng cấp phát nhiều nhất")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        baseline = {r["name"]: r for r in json.loads(args.baseline.read_text(encoding="utf-8"))}
+    names = [n.strip() for n in args.only.split(",")] if args.only else None
+
+    results = run_suite(names, args.repeat, args.latency, baseline, args.tolerance, args.allocations)
+    print(format_table(results))
+    if args.allocations:
+        print()
+        print(format_allocations(results))
+    if args.save:
+        args.save.write_text(json.dumps([r.as_dict() for r in results], indent=2, ensure_ascii=False),
+                             encoding="utf-8")
+    return 1 if any(r.failures for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+from .store import (
+    JobStore, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, FINISHED,
+)
+from .queue import JobContext, JobQueue
+from .handlers import register_default_handlers, get_job_queue
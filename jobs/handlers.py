@@ -0,0 +1,124 @@
+"""
+Các loại job chạy nền. Crawler được import trong handler để API khởi động
+không phụ thuộc Playwright/crawlee nếu không dùng tới job đó.
+"""
+import asyncio
+import threading
+from typing import Any, List, Optional
+
+from .queue import JobContext, JobQueue
+from .store import JobStore
+from observability.metrics import register_pool
+
+
+def register_default_handlers(queue: JobQueue) -> JobQueue:
+
+    @queue.register("trend_videos")
+    async def trend_videos(ctx: JobContext, limit: int = 500, period: str = "7",
+                           persist: bool = False) -> List[dict]:
+        from tiktok_trend.playwright_tiktok_ads import crawl_tiktok_trend_videos
+        from persistence import save_trend_videos
+
+        await ctx.report(force=True, stage="crawling", collected=0, limit=int(limit))
+        # Item đã có ranking và period
+        result = await crawl_tiktok_trend_videos(limit=int(limit), period=period,
+                                                 on_progress=ctx.reporter(), deadline=ctx.deadline)
+        if persist:
+            await ctx.report(force=True, stage="persisting")
+            await asyncio.to_thread(save_trend_videos, result, period)
+        return result
+
+    @queue.register("trend_audio")
+    async def trend_audio(ctx: JobContext, limit: int = 100, period: str = "7",
+                          persist: bool = False) -> List[dict]:
+        from tiktok_trend.playwright_tiktok_audio import crawl_tiktok_trend_audio
+        from persistence import save_trend_audio
+
+        await ctx.report(force=True, stage="crawling", collected=0, limit=int(limit))
+        # Item đã có ranking và period
+        result = await crawl_tiktok_trend_audio(limit=int(limit), period=period,
+                                                on_progress=ctx.reporter(), deadline=ctx.deadline)
+        if persist:
+            await ctx.report(force=True, stage="persisting")
+            await asyncio.to_thread(save_trend_audio, result, period)
+        return result
+
+    @queue.register("trend_hashtags")
+    async def trend_hashtags(ctx: JobContext, limit: int = 1000,
+                             url: Optional[str] = None) -> List[dict]:
+        from tiktok_trend.playwright_tiktok_hashtag import TIKTOK_URL, crawl_tiktok_hashtag
+
+        await ctx.report(force=True, stage="crawling", limit=int(limit))
+        return await asyncio.to_thread(crawl_tiktok_hashtag, url or TIKTOK_URL, int(limit),
+                                       deadline=ctx.deadline)
+
+    @queue.register("comments")
+    async def comments(ctx: JobContext, ids: List[str]) -> dict:
+        from tiktok import get_comments
+
+        out = {}
+        for done, aweme_id in enumerate(ids):
+            await ctx.report(force=True, stage="crawling", done=done, total=len(ids))
+            out[str(aweme_id)] = await asyncio.to_thread(get_comments, str(aweme_id), ctx.deadline)
+        await ctx.report(force=True, stage="done", done=len(ids), total=len(ids))
+        return out
+
+    @queue.register("transcripts")
+    async def transcripts(ctx: JobContext, urls: List[str]) -> dict:
+        from utils.get_transcripts import download_transcript
+
+        out, errors = {}, {}
+        for done, url in enumerate(urls):
+            await ctx.report(stage="downloading", done=done, total=len(urls), failed=len(errors))
+            try:
+                out[url] = await download_transcript(url, deadline=ctx.deadline)
+            except Exception as e:
+                errors[url] = str(e)
+        await ctx.report(force=True, stage="done", done=len(urls), total=len(urls), failed=len(errors))
+        if urls and not out:
+            raise RuntimeError(f"Không lấy được transcript nào: {errors}")
+        return {"transcripts": out, "errors": errors}
+
+    @queue.register("user_page")
+    async def user_page(ctx: JobContext, url: str, browser_type: str = "firefox",
+                        max_items: int = 10) -> List[dict]:
+        from tiktok.user_page import crawl_user_page
+
+        await ctx.report(force=True, stage="crawling", max_items=int(max_items))
+        return await crawl_user_page(url, browser_type, int(max_items), ctx.deadline)
+
+    @queue.register("prunned_groups")
+    async def prunned_groups(ctx: JobContext, ids: List[Any], transcripts: List[str],
+                             nmin: int = 2, nmax: int = 100, min_id_count: int = 2,
+                             nfc: bool = False, strip_diacritics: bool = False,
+                             top_k: Optional[int] = None) -> List[dict]:
+        from analysis_tiktok_trend.groups_pruned import group_ngrams_from_lists
+
+        await ctx.report(force=True, stage="grouping", documents=len(ids))
+        return await group_ngrams_from_lists(ids, transcripts, nmin, nmax, min_id_count,
+                                             nfc=nfc, strip_diacritics=strip_diacritics, top_k=top_k)
+
+    @queue.register("trend_pipeline")
+    async def trend_pipeline(ctx: JobContext, **params: Any) -> dict:
+        from pipeline import PipelineOptions, run_trend_pipeline
+
+        # Tiến độ theo stage: crawling -> fetching -> grouping -> done
+        def on_progress(progress: dict) -> None:
+            asyncio.ensure_future(ctx.report(force=progress["stage"] == "done", **progress))
+        return await run_trend_pipeline(PipelineOptions(**params), on_progress, ctx.deadline)
+
+    return queue
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """JobQueue dùng chung (JOBS_DB_PATH, JOB_WORKERS) với các handler mặc định."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = register_default_handlers(JobQueue(JobStore()))
+            register_pool("job_workers", lambda: (len(_queue._running), _queue.workers))
+        return _queue
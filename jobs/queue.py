@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from net.deadline import Deadline
+from .store import CANCELLED, QUEUED, JobStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class JobContext:
+    """Truyền vào handler: báo tiến độ (ghi xuống store) và kiểm tra huỷ."""
+
+    def __init__(self, store: JobStore, job: Dict[str, Any]) -> None:
+        self.store = store
+        self.job_id: str = job["id"]
+        self.attempt: int = job["attempts"]
+        self.progress: Dict[str, Any] = dict(job.get("progress") or {})
+        self.cancelled = False
+        # Truyền cho crawler (deadline=ctx.deadline): job bị huỷ thì crawler chạy trong thread cũng dừng
+        self.deadline = Deadline()
+        self._last_write = 0.0
+
+    async def report(self, force: bool = False, **fields: Any) -> None:
+        """Cập nhật tiến độ; ghi đĩa tối đa mỗi giây một lần trừ khi force."""
+        self.progress.update(fields)
+        now = time.monotonic()
+        if force or now - self._last_write >= 1.0:
+            self._last_write = now
+            await self._heartbeat(self.progress)
+
+    def reporter(self) -> Callable[..., None]:
+        """Callback đồng bộ cho crawler (gọi trong event loop): on_progress(collected, limit)."""
+        def on_progress(collected: int, limit: Optional[int] = None) -> None:
+            asyncio.ensure_future(self.report(collected=collected, limit=limit))
+        return on_progress
+
+    async def _heartbeat(self, progress: Optional[Dict[str, Any]] = None) -> None:
+        status = await asyncio.to_thread(self.store.heartbeat, self.job_id, progress)
+        if status == CANCELLED:
+            self.cancelled = True
+
+
+class JobQueue:
+    """
+    Pool worker asyncio có giới hạn chạy job từ JobStore theo priority.
+    Handler đăng ký theo kind: async def handler(ctx: JobContext, **params) -> kết quả JSON được.
+    """
+
+    def __init__(self, store: JobStore, workers: int = DEFAULT_WORKERS) -> None:
+        self.store = store
+        self.workers = max(1, int(workers))
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    # ---------- Registry ----------
+    def register(self, kind: str) -> Callable[[Handler], Handler]:
+        def decorator(fn: Handler) -> Handler:
+            self._handlers[kind] = fn
+            return fn
+        return decorator
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    # ---------- API ----------
+    def submit(self, kind: str, params: Dict[str, Any], priority: int = 0,
+               max_attempts: int = 1) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"kind phải là một trong {self.kinds}")
+        job_id = self.store.submit(kind, params, priority=priority, max_attempts=max_attempts)
+        self.notify()
+        return job_id
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def cancel(self, job_id: str) -> bool:
+        ok = await asyncio.to_thread(self.store.cancel, job_id)
+        task = self._running.get(job_id)
+        if ok and task is not None:
+            task.cancel()
+        return ok
+
+    # ---------- Lifecycle ----------
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        requeued = await asyncio.to_thread(self.store.requeue_stale)
+        if requeued:
+            logger.info("Requeued %d stale job(s)", requeued)
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+                       for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------- Worker loop ----------
+    async def _worker(self, index: int) -> None:
+        last_requeue = time.monotonic()
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.worker_id, self.kinds)
+            if job is None:
+                if time.monotonic() - last_requeue >= self.store.lease_seconds:
+                    last_requeue = time.monotonic()
+                    if await asyncio.to_thread(self.store.requeue_stale):
+                        continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        ctx = JobContext(self.store, job)
+        handler = self._handlers[job["kind"]]
+        task = asyncio.create_task(handler(ctx, **job["params"]))
+        self._running[ctx.job_id] = task
+        beat = asyncio.create_task(self._heartbeat_loop(ctx, task))
+        try:
+            result = await task
+            await asyncio.to_thread(self.store.complete, ctx.job_id, result)
+            logger.info("Job %s (%s) succeeded", ctx.job_id, job["kind"])
+        except asyncio.CancelledError:
+            ctx.deadline.cancel()
+            if asyncio.current_task().cancelling():
+                # worker đang dừng: trả job về hàng đợi để chạy lại sau restart
+                await asyncio.shield(asyncio.to_thread(self.store.release, ctx.job_id))
+                raise
+            logger.info("Job %s (%s) cancelled", ctx.job_id, job["kind"])
+        except Exception as e:
+            status = await asyncio.to_thread(
+                self.store.fail, ctx.job_id, f"{e}\n{traceback.format_exc(limit=5)}"
+            )
+            logger.warning("Job %s (%s) failed (attempt %d): %s -> %s",
+                           ctx.job_id, job["kind"], ctx.attempt, e, status)
+            if status == QUEUED:
+                self.notify()
+        finally:
+            beat.cancel()
+            self._running.pop(ctx.job_id, None)
+
+    async def _heartbeat_loop(self, ctx: JobContext, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await ctx._heartbeat()
+            if ctx.cancelled:
+                task.cancel()
+                return
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# ===== Constants =====
+DEFAULT_JOBS_PATH = os.getenv("JOBS_DB_PATH", "storage/jobs.sqlite3")
+# Job 'running' không có heartbeat sau khoảng này coi như worker đã chết -> trả lại hàng đợi
+DEFAULT_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "120"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (priority DESC, created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_status_time ON jobs (status, created_at);
+"""
+
+_SUMMARY_COLUMNS = ("id", "kind", "params", "priority", "status", "progress", "error",
+                    "attempts", "max_attempts", "worker", "created_at", "started_at",
+                    "heartbeat_at", "finished_at")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _row_to_job(row: sqlite3.Row, raw_result: bool = False) -> Dict[str, Any]:
+    job = dict(row)
+    for key in ("params", "progress") if raw_result else ("params", "progress", "result"):
+        if job.get(key) is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+
+class JobStore:
+    """
+    Hàng đợi job bền vững trên SQLite: job, tiến độ và kết quả nằm trên đĩa
+    nên vẫn còn sau khi restart. Lấy job bằng một UPDATE nguyên tử nên nhiều
+    worker (kể cả nhiều process) dùng chung một file được.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOBS_PATH,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---------- Submit / query ----------
+    def submit(self, kind: str, params: Dict[str, Any], priority: int = 0,
+               max_attempts: int = 1) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, priority, status, attempts, max_attempts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+                (job_id, kind, _dumps(params), int(priority), QUEUED, max(1, int(max_attempts)), time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str, with_result: bool = False,
+            raw_result: bool = False) -> Optional[Dict[str, Any]]:
+        # raw_result: giữ result là chuỗi JSON như trong DB (API ghép thẳng vào response)
+        cols = ", ".join(_SUMMARY_COLUMNS + (("result",) if with_result or raw_result else ()))
+        with self._lock:
+            row = self._conn.execute(f"SELECT {cols} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row, raw_result) if row is not None else None
+
+    def list(self, status: Optional[str] = None, kind: Optional[str] = None,
+             limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        sql = f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    # ---------- Worker side ----------
+    def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Lấy job 'queued' có priority cao nhất (cũ nhất trước) và chuyển sang 'running'."""
+        now = time.time()
+        kind_filter, params = "", []
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params = list(kinds)
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                UPDATE jobs
+                SET status = ?, worker = ?, attempts = attempts + 1,
+                    started_at = ?, heartbeat_at = ?, error = NULL
+                WHERE id = (
+                    SELECT id FROM jobs WHERE status = ?{kind_filter}
+                    ORDER BY priority DESC, created_at LIMIT 1
+                )
+                RETURNING {', '.join(_SUMMARY_COLUMNS)}
+                """,
+                [RUNNING, worker, now, now, QUEUED, *params],
+            ).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def heartbeat(self, job_id: str, progress: Optional[Dict[str, Any]] = None) -> str:
+        """Gia hạn lease (và cập nhật tiến độ). Trả về status hiện tại để worker biết job bị huỷ."""
+        with self._lock:
+            if progress is None:
+                self._conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                    (time.time(), job_id, RUNNING),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET heartbeat_at = ?, progress = ? WHERE id = ? AND status = ?",
+                    (time.time(), _dumps(progress), job_id, RUNNING),
+                )
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row is not None else CANCELLED
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (SUCCEEDED, _dumps(result), time.time(), job_id, RUNNING),
+            )
+
+    def fail(self, job_id: str, error: str) -> str:
+        """Ghi lỗi; còn lượt thử thì trả lại hàng đợi. Trả về status mới."""
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE jobs
+                SET error = ?,
+                    status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+                    finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END
+                WHERE id = ? AND status = ?
+                """,
+                (error, QUEUED, FAILED, time.time(), job_id, RUNNING),
+            )
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row is not None else FAILED
+
+    def release(self, job_id: str) -> None:
+        """Trả job đang chạy về hàng đợi khi worker dừng có chủ đích (không tính lượt thử)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, attempts = MAX(attempts - 1, 0) "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, job_id, RUNNING),
+            )
+
+    # ---------- Control ----------
+    def cancel(self, job_id: str) -> bool:
+        """Huỷ job chưa xong; job đang chạy sẽ bị dừng ở lần heartbeat kế tiếp."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? "
+                f"AND status NOT IN ({', '.join('?' * len(FINISHED))})",
+                (CANCELLED, time.time(), job_id, *FINISHED),
+            )
+        return cur.rowcount > 0
+
+    def retry(self, job_id: str) -> bool:
+        """Đưa job đã thất bại/huỷ về hàng đợi, cấp thêm một lượt thử."""
+        with self._lock:
+            cur = self._conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, max_attempts = MAX(max_attempts, attempts + 1),
+                    error = NULL, finished_at = NULL
+                WHERE id = ? AND status IN (?, ?)
+                """,
+                (QUEUED, job_id, FAILED, CANCELLED),
+            )
+        return cur.rowcount > 0
+
+    def requeue_stale(self) -> int:
+        """
+        Job 'running' đã hết lease (worker chết / process restart): lượt chạy dở đã được
+        tính vào attempts lúc claim, còn lượt thử thì trả về hàng đợi, hết lượt thì 'failed'
+        (job làm sập worker không lặp mãi). Trả về số job được trả về hàng đợi.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts < max_attempts",
+                    (QUEUED, RUNNING, now - self.lease_seconds),
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ?",
+                    (FAILED, "Worker mất lease (không heartbeat) ở lượt thử cuối", now,
+                     RUNNING, now - self.lease_seconds),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cur.rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Xoá job đã kết thúc cũ hơn older_than_seconds."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, cutoff),
+            )
+        return cur.rowcount
@@ -1,11 +1,13 @@
 import asyncio
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from typing import Annotated, List, Any
+from typing import Annotated, List, Any, Optional
 import re
 import json
 import os
 import sys
+from datetime import datetime
+from api.responses import NDJSON_MEDIA_TYPE, FastJSONResponse, dumps, json_with_raw, ndjson_batches
 
 
 #Tạo FastAPI app
@@ -22,12 +24,127 @@ app = FastAPI(
     **Lưu ý:** Chỉ dành cho mục đích nghiên cứu.
     """,
     version="1.0.0",
+    # orjson (nếu có), không escape tiếng Việt; endpoint trả thẳng FastJSONResponse để bỏ qua jsonable_encoder
+    default_response_class=FastJSONResponse,
     contact={
         "name": "RIMINE",
         "email": "minh0974680144@gmail.com",
     },
 )
 
+"""
+Metrics Prometheus: thời gian xử lý theo endpoint + /metrics
+"""
+import time
+from fastapi import Request, Response
+from starlette.routing import Match
+from observability.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_PROGRESS, render_metrics
+
+def _route_template(request: Request) -> str:
+    # Dùng path template (vd. /jobs/{job_id}) làm label để không bùng nổ số series
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def prometheus_middleware(request: Request, call_next):
+    route = _route_template(request)
+    if route == "/metrics":
+        return await call_next(request)
+    in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method, route)
+    in_progress.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_progress.dec()
+        HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+"""
+Profiling theo yêu cầu: gửi header X-Profile: 1 để profile các hot path trong request,
+tên artifact (speedscope JSON) trả về ở header X-Profile-Artifacts
+"""
+from fastapi.responses import FileResponse
+from observability.profiling import PROFILE_HEADER, start_session, end_session, list_artifacts, artifact_path
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    if request.headers.get(PROFILE_HEADER, "").lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+    session, token = start_session()
+    try:
+        response = await call_next(request)
+    finally:
+        end_session(token)
+    response.headers["X-Profile-Id"] = session.id
+    response.headers["X-Profile-Artifacts"] = ",".join(session.artifacts)
+    return response
+
+@app.get("/profiles")
+async def get_profiles(limit: int = 100):
+    return {"artifacts": list_artifacts(limit)}
+
+@app.get("/profiles/{name}")
+async def get_profile(name: str):
+    path = artifact_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    return FileResponse(path, media_type="application/json" if name.endswith(".json") else "application/octet-stream",
+                        filename=name)
+
+"""
+Cache kết quả dùng chung giữa các worker uvicorn + single-flight: request trùng key
+(kể cả ở worker khác) chờ một lần crawl thay vì mở thêm trình duyệt
+"""
+async def _single_flight(kind: str, key: str, compute) -> Response:
+    from persistence.shared_cache import CACHE_TTLS, Uncached, get_shared_cache
+    # compute() trả về JSON đã encode: lần trúng cache gửi thẳng bytes, không encode lại
+    body = await get_shared_cache().get_or_compute(f"{kind}:{key}", compute, CACHE_TTLS[kind], cache=kind)
+    headers = {PARTIAL_HEADER: "1"} if isinstance(body, Uncached) else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+"""
+Deadline theo request (header X-Deadline, tối đa REQUEST_DEADLINE giây) truyền xuống crawler:
+hết giờ thì crawler dừng ở vòng kế và trả kết quả dở (header X-Partial-Result, không cache);
+client ngắt kết nối thì huỷ crawl (đóng trình duyệt, kill subprocess) và trả browser slot ngay
+"""
+from net.deadline import DEADLINE_HEADER, ClientDisconnected, Deadline, run_with_deadline
+PARTIAL_HEADER = "X-Partial-Result"
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # Body đã đọc xong nên message kế tiếp chỉ có thể là http.disconnect; chờ hẳn receive()
+    # vì request.is_disconnected() không thấy disconnect qua các middleware http ở trên
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def _run_request(request: Request, work) -> Response:
+    # work(deadline) -> Response
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    try:
+        return await run_with_deadline(work(deadline), deadline, _wait_for_disconnect(request))
+    except ClientDisconnected:
+        # 499 (quy ước nginx): client đã đi, không ai đọc body
+        return Response(status_code=499)
+
+def _encode(result, deadline: Deadline) -> bytes:
+    from persistence.shared_cache import Uncached
+    body = dumps(result)
+    return Uncached(body) if deadline.done() else body
+
+def _json_response(result, deadline: Deadline) -> Response:
+    return FastJSONResponse(result, headers={PARTIAL_HEADER: "1"} if deadline.done() else None)
+
 env = os.environ.copy()
 
 # Đảm bảo UTF-8 cho subprocess
@@ -45,49 +162,14 @@ class TikTokUserPageCrawler(BaseModel):
     max_items: Annotated[int, Field(default=10, ge=1, le=200, description="Số lượng video tối đa cần crawl (1–200)")]
 
 @app.post("/tiktok/get_video_links_on_user_page", tags=["TikTok Crawler"], summary="Lấy danh sách video trên trang cá nhân")
-async def get_video_links_on_user_page(body: TikTokUserPageCrawler):
+async def get_video_links_on_user_page(body: TikTokUserPageCrawler, request: Request):
+    from tiktok.user_page import crawl_user_page
+    async def work(deadline: Deadline) -> Response:
+        async def compute() -> bytes:
+            return _encode(await crawl_user_page(body.url, body.browser_type, body.max_items, deadline), deadline)
+        return await _single_flight("user_page", f"{body.url}:{body.browser_type}:{body.max_items}", compute)
     try:
-        browser_type = body.browser_type.strip().lower()
-        clean_url = body.url.strip()
-        max_items = str(body.max_items).strip()
-        script_path = 'tiktok.get_list_videos'
-        cmd = [sys.executable, "-m" ,script_path, browser_type, max_items, clean_url]
-        
-        # Gọi subprocess
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            env=env,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout_b, stderr_b = await proc.communicate()
-        out = stdout_b.decode("utf-8", "ignore")
-        err = stderr_b.decode("utf-8", "ignore")
-            
-        try:
-            # Lấy phần output sau chữ "Result"
-            result_start = out.find("Result:\n ")
-            if result_start == -1:
-                raise ValueError("Không tìm thấy đoạn 'Result' trong stdout")
-
-            json_part = out[result_start:]
-            # Tìm JSON mảng đầu tiên bắt đầu bằng [ và kết thúc bằng ]
-            json_match = re.search(r"\[\s*{[\s\S]*?}\s*\]", json_part)
-            
-            if not json_match:
-                raise ValueError("Không tìm thấy JSON hợp lệ trong stdout")
-
-            json_text = json_match.group(0).replace("\n", "")
-            result_json = json.loads(json_text)
-
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Lỗi parse JSON từ output: {e}\n\n--- STDOUT ---\n{proc.stdout}"
-            )
-        
-        return result_json
+        return await _run_request(request, work)
 
     except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
@@ -97,104 +179,407 @@ async def get_video_links_on_user_page(body: TikTokUserPageCrawler):
 """
 Thu thập comments từ người dùng
 """
-from tiktok import get_comments
 class TikTokCrawlComments(BaseModel):
     id: Annotated[str, Field(description="ID của bài đăng trên tiktok", examples=['7516102298347506952'])]
     
 @app.post("/tiktok/get_comments", tags=['TikTok Crawler'], summary="Lấy danh sách comments của 1 video")
-async def get_comments_of_video(body: TikTokCrawlComments):
+async def get_comments_of_video(body: TikTokCrawlComments, request: Request):
+    from tiktok import fetch_comments
     id = str(body.id)
+    async def work(deadline: Deadline) -> Response:
+        async def compute() -> bytes:
+            # Chạy trong thread: huỷ task không dừng được thread, deadline.cancel() thì có
+            return _encode(await asyncio.to_thread(fetch_comments, id, deadline), deadline)
+        return await _single_flight("comments", id, compute)
     try:
-        comments = get_comments(id)
-        return comments
+        return await _run_request(request, work)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy bình luận: {e}")
     
 """
 Thu thập bài viết từ trang tiktok trend
 """
-from tiktok_trend.playwright_tiktok_ads import crawl_tiktok_trend_videos
 class TikTokTrendCrawlPost(BaseModel):
     limit: Annotated[str, Field(description="Số lượng tối đa cần thu thập (max là 500)", examples=[500], default=500)]
     period: Annotated[str, Field(description="Period trong trang TikTokTrend", default="7", example=[7, 30, 120])]
+    persist: Annotated[bool, Field(default=False, description="Lưu snapshot xếp hạng vào Postgres")]
+    resume: Annotated[bool, Field(default=True, description="Tiếp tục từ checkpoint nếu lần crawl trước bị dừng giữa chừng")]
     
 @app.post("/tiktoktrend/crawl_post", tags=['TikTokTrend Crawler'], summary="Thu thập danh sách bài viết trên trang TikTokTrend")
-async def crawl_posts_from_tiktoktrend(body: TikTokTrendCrawlPost):
+async def crawl_posts_from_tiktoktrend(body: TikTokTrendCrawlPost, request: Request):
+    from tiktok_trend.playwright_tiktok_ads import crawl_tiktok_trend_videos
+    from persistence import save_trend_videos
     limit = int(body.limit)
     period = body.period
+    async def work(deadline: Deadline) -> Response:
+        # Item đã có ranking (thứ tự trên bảng xếp hạng) và period
+        async def crawl() -> list:
+            return await crawl_tiktok_trend_videos(limit=limit, period=period, resume=body.resume,
+                                                   deadline=deadline)
+        async def compute() -> bytes:
+            return _encode(await crawl(), deadline)
+        if not body.persist:
+            # resume=False đòi crawl mới: không dùng chung kết quả với request resume
+            return await _single_flight("trend", f"videos:{period}:{limit}:{int(body.resume)}", compute)
+        result = await crawl()
+        await asyncio.to_thread(save_trend_videos, result, period)
+        return _json_response(result, deadline)
     try:
-        result = await crawl_tiktok_trend_videos(limit=limit, period=period)
-        for idx, r in enumerate(result, start=1):
-            r['ranking'] = idx
+        return await _run_request(request, work)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
-        
-    return result
     
 
 """
 Thu thập danh sách link nhạc từ TikTokTrend
 """
-from tiktok_trend.playwright_tiktok_audio import crawl_tiktok_trend_audio
 class TikTokTrendCrawlAudio(BaseModel):
     limit: Annotated[str, Field(description="Số lượng tối đa cần thu thập (max là 100)", examples=[100], default=100)]
     period: Annotated[str, Field(description="Period trong trang TikTokTrend", default="7", example=[7, 30, 120])]
+    persist: Annotated[bool, Field(default=False, description="Lưu snapshot xếp hạng vào Postgres")]
 
 @app.post("/tiktoktrend/crawl_audio", tags=['TikTokTrend Crawler'], summary="Thu thập danh sách audio trên trang TikTokTrend")
-async def crawl_audios_from_tiktoktrend(body: TikTokTrendCrawlAudio):
+async def crawl_audios_from_tiktoktrend(body: TikTokTrendCrawlAudio, request: Request):
+    from tiktok_trend.playwright_tiktok_audio import crawl_tiktok_trend_audio
+    from persistence import save_trend_audio
     limit = int(body.limit)
     period = body.period
     
     # cmd = [sys.executable, "-m", "tiktok_trend.playwright_tiktok_audio", limit, period]
+    async def work(deadline: Deadline) -> Response:
+        # Item đã có ranking (thứ tự trên bảng xếp hạng) và period
+        async def crawl() -> list:
+            return await crawl_tiktok_trend_audio(limit=limit, period=period, deadline=deadline)
+        async def compute() -> bytes:
+            return _encode(await crawl(), deadline)
+        if not body.persist:
+            return await _single_flight("trend", f"audio:{period}:{limit}", compute)
+        result = await crawl()
+        await asyncio.to_thread(save_trend_audio, result, period)
+        return _json_response(result, deadline)
     try:
-        result = await crawl_tiktok_trend_audio(limit=limit, period=period)
-        for idx, r in enumerate(result, start=1):
-            r['period'] = period
-            r['ranking'] = idx
-            
+        return await _run_request(request, work)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+"""
+Pipeline xu hướng trong một request: bảng xếp hạng video -> transcript + comment từng video
+(song song, chồng lên crawl) -> gom nhóm n-gram transcript
+"""
+from pipeline import COMMENT_WORKERS, QUEUE_SIZE, TRANSCRIPT_WORKERS
+# top_k dùng chung cho các API gom nhóm n-gram (xem top_k_groups)
+TopKGroups = Annotated[Optional[int], Field(
+    default=None, ge=1, examples=[50],
+    description="Chỉ lấy top_k nhóm phổ biến nhất. Xấp xỉ: gram hiếm hơn ngưỡng top_k không "
+                "tham gia cắt tỉa, nên có thể có nhóm mà kết quả không đặt top_k đã loại "
+                "(chồng id với nhóm dài hơn)",
+)]
+
+class TikTokTrendPipeline(BaseModel):
+    limit: Annotated[int, Field(default=50, ge=1, le=500, description="Số video trên bảng xếp hạng")]
+    period: Annotated[str, Field(description="Period trong trang TikTokTrend", default="7", example=[7, 30, 120])]
+    transcripts: Annotated[bool, Field(default=True, description="Tải transcript của từng video")]
+    comments: Annotated[bool, Field(default=True, description="Lấy comment của từng video")]
+    group: Annotated[bool, Field(default=True, description="Gom nhóm n-gram trên các transcript")]
+    transcript_workers: Annotated[int, Field(default=TRANSCRIPT_WORKERS, ge=1, le=32, description="Số transcript tải song song")]
+    comment_workers: Annotated[int, Field(default=COMMENT_WORKERS, ge=1, le=32, description="Số video lấy comment song song")]
+    queue_size: Annotated[int, Field(default=QUEUE_SIZE, ge=1, description="Số video tối đa chờ ở mỗi stage")]
+    nmin: Annotated[int, Field(default=2, description="Độ dài đoạn nhỏ nhất được gom nhóm")]
+    nmax: Annotated[int, Field(default=100, description="Độ dài đoạn lớn nhất được gom nhóm")]
+    min_id_count: Annotated[int, Field(default=2, description="Số id nhỏ nhất trong một nhóm")]
+    top_k: TopKGroups
+    nfc: Annotated[bool, Field(default=False, description="Chuẩn hoá Unicode NFC trước khi làm sạch")]
+    strip_diacritics: Annotated[bool, Field(default=False, description="Bỏ dấu tiếng Việt khi so khớp")]
+
+@app.post("/tiktoktrend/pipeline", tags=['TikTokTrend Crawler'], summary="Bảng xếp hạng video kèm transcript, comment và nhóm n-gram")
+async def run_tiktoktrend_pipeline(body: TikTokTrendPipeline, request: Request):
+    from pipeline import PipelineOptions, run_trend_pipeline
+    options = PipelineOptions(**body.model_dump())
+    async def work(deadline: Deadline) -> Response:
+        return _json_response(await run_trend_pipeline(options, deadline=deadline), deadline)
+    try:
+        return await _run_request(request, work)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+"""
+Stream bảng xếp hạng TikTokTrend (NDJSON, mỗi dòng một item đã có ranking): lô mới được gửi
+ngay sau mỗi lượt 'View More', client xử lý tiếp (transcript, comment) trong lúc crawl chạy
+và đóng kết nối khi đã đủ -> crawl dừng, trình duyệt đóng, browser slot được trả ngay
+"""
+from fastapi.responses import StreamingResponse
+
+@app.post("/tiktoktrend/stream_post", tags=['TikTokTrend Crawler'], summary="Stream danh sách bài viết trên trang TikTokTrend (NDJSON)")
+async def stream_posts_from_tiktoktrend(body: TikTokTrendCrawlPost, request: Request):
+    from tiktok_trend.playwright_tiktok_ads import stream_tiktok_trend_videos
+    from persistence import save_trend_videos
+    period = body.period
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    batches = stream_tiktok_trend_videos(limit=int(body.limit), period=period, resume=body.resume,
+                                         deadline=deadline)
+    async def persist(result: list) -> None:
+        await asyncio.to_thread(save_trend_videos, result, period)
+    return StreamingResponse(ndjson_batches(batches, persist if body.persist else None),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+@app.post("/tiktoktrend/stream_audio", tags=['TikTokTrend Crawler'], summary="Stream danh sách audio trên trang TikTokTrend (NDJSON)")
+async def stream_audios_from_tiktoktrend(body: TikTokTrendCrawlAudio, request: Request):
+    from tiktok_trend.playwright_tiktok_audio import stream_tiktok_trend_audio
+    from persistence import save_trend_audio
+    period = body.period
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    batches = stream_tiktok_trend_audio(limit=int(body.limit), period=period, deadline=deadline)
+    async def persist(result: list) -> None:
+        await asyncio.to_thread(save_trend_audio, result, period)
+    return StreamingResponse(ndjson_batches(batches, persist if body.persist else None),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+class TikTokTrendRankHistory(BaseModel):
+    kind: Annotated[str, Field(description="Loại xếp hạng", examples=["hashtags", "videos", "audio"])]
+    key: Annotated[dict, Field(description="Khoá của item trong bảng lịch sử", examples=[{"hashtag": "xuhuong"}, {"period": "7", "video_id": "7516102298347506952"}])]
+    since: Annotated[Optional[datetime], Field(default=None, description="Chỉ lấy snapshot từ thời điểm này")]
+
+@app.post("/tiktoktrend/rank_history", tags=['TikTokTrend Crawler'], summary="Lịch sử xếp hạng của một hashtag/video/audio")
+async def get_rank_history(body: TikTokTrendRankHistory):
+    from persistence import TABLES, rank_history
+    spec = TABLES.get(body.kind)
+    if spec is None:
+        raise HTTPException(status_code=400, detail=f"kind phải là một trong {list(TABLES)}")
+    missing = [c for c in spec.key if c not in body.key]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Thiếu khoá: {missing}")
+    try:
+        return await asyncio.to_thread(rank_history, spec, body.key, body.since)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
-    
-    return result
         
 """
 Lấy transcripts của video tiktok
 """
-from utils.get_transcripts import download_transcript
 class GetTranscriptsTikTok(BaseModel):
     url: Annotated[str, Field(default="https://www.tiktok.com/@cotuyenhoala/video/7527196260919512328", description="Lấy transcripts của một video tiktok", examples=["https://www.tiktok.com/@cotuyenhoala/video/7527196260919512328"])]
     
 @app.post("/utils/get_transcripts", tags=['utils'])
-async def get_transcripts(body: GetTranscriptsTikTok):
+async def get_transcripts(body: GetTranscriptsTikTok, request: Request):
+    from utils.get_transcripts import download_transcript
     url = body.url
+    async def work(deadline: Deadline) -> Response:
+        async def compute() -> bytes:
+            return dumps(await download_transcript(url, deadline=deadline))
+        return await _single_flight("transcripts", url, compute)
     try:
-        result = await download_transcript(url)
-        
-        return result
+        return await _run_request(request, work)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="⏱️ Quá thời gian xử lý")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
     
 """
 Lấy các từ giống nhau
 """
-from analysis_tiktok_trend.groups_pruned import group_ngrams_from_lists
 class GetPrunnedGroup(BaseModel):
     ids: Annotated[List[Any], Field(examples=[[1,2,3]], description="Danh sách các id")]
     transcripts: Annotated[List[str], Field(examples=[['hi','hello','goodbye']], description="Danh sách các đoạn văn")]
     nmin: Annotated[int, Field(examples=[2], default=2, description="Độ dài đoạn nhỏ nhất được gom nhóm")]
     nmax: Annotated[int, Field(examples=[100], default=100, description="Độ dài đoạn lớn nhất được gom nhóm")]
     min_id_count: Annotated[int, Field(examples=[2], default=2, description="Số id nhỏ nhất trong một nhóm")]
+    nfc: Annotated[bool, Field(default=False, description="Chuẩn hoá Unicode NFC trước khi làm sạch")]
+    strip_diacritics: Annotated[bool, Field(default=False, description="Bỏ dấu tiếng Việt khi so khớp")]
+    top_k: TopKGroups
 @app.post("/utils/get_prunned_groups", tags=['utils'])
 async def get_prunned_groups(body: GetPrunnedGroup):
+    from analysis_tiktok_trend.groups_pruned import group_ngrams_from_lists
     ids = body.ids
     transcripts = body.transcripts
     nmin = body.nmin
     nmax = body.nmax
     min_id_count = body.min_id_count
     try:
-        result = await group_ngrams_from_lists(ids,transcripts, nmin, nmax, min_id_count)
-        return result
+        result = await group_ngrams_from_lists(ids,transcripts, nmin, nmax, min_id_count,
+                                               nfc=body.nfc, strip_diacritics=body.strip_diacritics,
+                                               top_k=body.top_k)
+        return FastJSONResponse(result)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
     
+"""
+Gom cụm transcript / comment gần trùng nhau (MinHash + LSH)
+"""
+class GetNearDuplicateClusters(BaseModel):
+    ids: Annotated[List[Any], Field(examples=[[1,2,3]], description="Danh sách các id")]
+    texts: Annotated[List[str], Field(examples=[['hi there','hi there!','goodbye']], description="Danh sách transcript hoặc comment")]
+    threshold: Annotated[float, Field(default=0.8, gt=0, le=1, description="Ngưỡng Jaccard ước lượng để coi là gần trùng")]
+    shingle_size: Annotated[int, Field(default=3, ge=1, description="Số từ trong một shingle")]
+    num_perm: Annotated[int, Field(default=128, ge=16, le=512, description="Số hàm băm MinHash")]
+    nfc: Annotated[bool, Field(default=False, description="Chuẩn hoá Unicode NFC trước khi làm sạch")]
+    strip_diacritics: Annotated[bool, Field(default=False, description="Bỏ dấu tiếng Việt khi so khớp")]
+
+@app.post("/utils/get_near_duplicate_clusters", tags=['utils'], summary="Gom cụm nội dung gần trùng nhau")
+async def get_near_duplicate_clusters(body: GetNearDuplicateClusters):
+    from analysis_tiktok_trend.near_duplicates import cluster_near_duplicates
+    try:
+        return FastJSONResponse(await cluster_near_duplicates(
+            body.ids, body.texts, threshold=body.threshold, shingle_size=body.shingle_size,
+            num_perm=body.num_perm, nfc=body.nfc, strip_diacritics=body.strip_diacritics
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+"""
+Chỉ mục n-gram bền vững (thêm/xoá transcript theo id, truy vấn nhóm tăng dần)
+"""
+class NgramIndexAdd(BaseModel):
+    ids: Annotated[List[Any], Field(examples=[[1,2,3]], description="Danh sách các id (id đã có sẽ bị thay thế)")]
+    transcripts: Annotated[List[str], Field(examples=[['hi','hello','goodbye']], description="Danh sách các đoạn văn")]
+
+class NgramIndexRemove(BaseModel):
+    ids: Annotated[List[Any], Field(examples=[[1,2]], description="Danh sách các id cần xoá khỏi index")]
+
+class NgramIndexQuery(BaseModel):
+    nmin: Annotated[Optional[int], Field(default=None, description="Độ dài đoạn nhỏ nhất (mặc định theo index)")]
+    nmax: Annotated[Optional[int], Field(default=None, description="Độ dài đoạn lớn nhất (mặc định theo index)")]
+    min_id_count: Annotated[int, Field(examples=[2], default=2, description="Số id nhỏ nhất trong một nhóm")]
+    top_k: TopKGroups
+
+@app.post("/utils/ngram_index/add", tags=['utils'], summary="Thêm transcript vào chỉ mục n-gram")
+async def ngram_index_add(body: NgramIndexAdd):
+    from analysis_tiktok_trend.ngram_index import add_transcripts
+    try:
+        added = await add_transcripts(body.ids, body.transcripts)
+        return {"added": added}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+@app.post("/utils/ngram_index/remove", tags=['utils'], summary="Xoá transcript khỏi chỉ mục n-gram")
+async def ngram_index_remove(body: NgramIndexRemove):
+    from analysis_tiktok_trend.ngram_index import remove_transcripts
+    try:
+        removed = await remove_transcripts(body.ids)
+        return {"removed": removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+@app.post("/utils/ngram_index/get_prunned_groups", tags=['utils'], summary="Lấy nhóm n-gram từ chỉ mục")
+async def ngram_index_groups(body: NgramIndexQuery):
+    from analysis_tiktok_trend.ngram_index import group_ngrams_from_index
+    try:
+        return FastJSONResponse(await group_ngrams_from_index(body.nmin, body.nmax, body.min_id_count, body.top_k))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
+
+@app.get("/utils/ngram_index/stats", tags=['utils'], summary="Thống kê chỉ mục n-gram")
+async def ngram_index_stats():
+    from analysis_tiktok_trend.ngram_index import get_ngram_index
+    try:
+        return get_ngram_index().stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi: {e}")
-    
\ No newline at end of file
+
+"""
+Hàng đợi job nền bền vững (crawl dài: trả job id ngay, xem tiến độ / kết quả sau)
+"""
+from jobs import get_job_queue, FINISHED
+class JobSubmit(BaseModel):
+    kind: Annotated[str, Field(description="Loại job", examples=["trend_videos", "trend_audio", "trend_hashtags", "comments", "transcripts", "user_page", "prunned_groups", "trend_pipeline"])]
+    params: Annotated[dict, Field(default_factory=dict, description="Tham số của job (giống body của endpoint tương ứng)", examples=[{"limit": 500, "period": "7"}, {"ids": ["7516102298347506952"]}])]
+    priority: Annotated[int, Field(default=0, description="Priority cao chạy trước")]
+    max_attempts: Annotated[int, Field(default=1, ge=1, le=10, description="Số lần thử tối đa khi job lỗi")]
+
+@app.on_event("startup")
+async def start_job_queue():
+    await get_job_queue().start()
+
+"""
+Nạp trước module nặng (Playwright, pandas...) trong nền sau khi server sẵn sàng
+"""
+from api.warmup import STARTUP_WARMUP, warm_up
+_warmup_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_warmup():
+    global _warmup_task
+    if STARTUP_WARMUP:
+        _warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await get_job_queue().stop()
+
+@app.on_event("shutdown")
+async def stop_worker_resources():
+    from analysis_tiktok_trend.cpu_pool import shutdown_cpu_pool
+    from observability.metrics import mark_process_dead
+    shutdown_cpu_pool()
+    mark_process_dead()
+
+@app.post("/jobs", tags=['jobs'], summary="Gửi job chạy nền")
+async def submit_job(body: JobSubmit):
+    try:
+        job_id = await asyncio.to_thread(get_job_queue().submit, body.kind, body.params,
+                                         body.priority, body.max_attempts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi: {e}")
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/jobs", tags=['jobs'], summary="Danh sách job")
+async def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    return await asyncio.to_thread(get_job_queue().store.list, status, kind, limit)
+
+@app.get("/jobs/{job_id}", tags=['jobs'], summary="Trạng thái và tiến độ của job")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return job
+
+@app.get("/jobs/{job_id}/result", tags=['jobs'], summary="Kết quả của job")
+async def get_job_result(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().store.get, job_id, raw_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    if job["status"] not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job chưa xong (status={job['status']})")
+    # result đã là JSON trong SQLite: ghép thẳng, không parse rồi encode lại
+    body = json_with_raw({"id": job_id, "status": job["status"], "error": job["error"]}, "result", job["result"])
+    return Response(content=body, media_type="application/json")
+
+@app.post("/jobs/{job_id}/cancel", tags=['jobs'], summary="Huỷ job")
+async def cancel_job(job_id: str):
+    if not await get_job_queue().cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job không tồn tại hoặc đã kết thúc")
+    return {"id": job_id, "status": "cancelled"}
+
+@app.post("/jobs/{job_id}/retry", tags=['jobs'], summary="Chạy lại job lỗi / đã huỷ")
+async def retry_job(job_id: str):
+    queue = get_job_queue()
+    if not await asyncio.to_thread(queue.store.retry, job_id):
+        raise HTTPException(status_code=409, detail="Chỉ chạy lại được job failed / cancelled")
+    queue.notify()
+    return {"id": job_id, "status": "queued"}
+
+"""
+Trạng thái rate limiter theo host (tốc độ hiện tại, circuit breaker, số lần bị chặn / retry)
+"""
+from net.rate_limit import get_rate_limiter
+from net.proxy_pool import get_proxy_pool
+@app.get("/utils/rate_limits", tags=['utils'], summary="Trạng thái rate limiter theo host")
+async def rate_limit_stats():
+    return get_rate_limiter().snapshot()
+
+
+@app.get("/utils/proxies", tags=['utils'], summary="Trạng thái pool proxy (điểm, latency, cách ly)")
+async def proxy_stats():
+    return get_proxy_pool().snapshot()
@@ -0,0 +1,10 @@
+from .rate_limit import (
+    OK, THROTTLED, ERROR, Throttled, TransientError, CircuitOpen,
+    RetryPolicy, HostLimiter, BatchBackoff, RateLimiter, get_rate_limiter, host_of, parse_retry_after,
+)
+from .http_client import get_http_client, close_http_client, transport_errors
+from .browser_slots import BROWSER_SLOTS, BrowserSlots, get_browser_slots, uses_browser_slot
+from .cookies import CookieJar, DomainFilter, load_cookie_jar, get_cookie_jar
+from .browser_memory import DOM_PRUNE, BROWSER_RSS_LIMIT_MB, BrowserMemory, browser_rss_bytes
+from .proxy_pool import Proxy, ProxyLease, ProxyPool, get_proxy_pool
+from .deadline import REQUEST_DEADLINE, DEADLINE_HEADER, Deadline, DeadlineExceeded, ClientDisconnected, run_with_deadline
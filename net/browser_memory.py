@@ -0,0 +1,159 @@
+"""
+Giới hạn bộ nhớ của crawl dài trên trình duyệt: gọi gc.collect() trong Python không giải
+phóng gì ở process trình duyệt, nơi DOM (mỗi blockquote embed, mỗi ô lưới video) phình
+theo từng lượt 'View More' / scroll. Ở đây:
+  - prune: làm rỗng node đã trích xong (giữ thẻ + thuộc tính + chiều cao, bỏ toàn bộ con)
+    để số phần tử theo selector và bố cục trang không đổi, nhưng cây DOM không lớn dần;
+  - đo RSS các process con của worker (Playwright driver + trình duyệt) cho metrics và
+    dừng crawl (trả phần đã có, như hết deadline) khi vượt BROWSER_RSS_LIMIT_MB.
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from observability.metrics import CRAWLER_BROWSER_PEAK_RSS
+
+# ===== Constants =====
+# Làm rỗng node đã trích xong trong các crawl 'View More' / scroll (0 = tắt)
+DOM_PRUNE = os.getenv("CRAWL_DOM_PRUNE", "1").lower() not in ("0", "false", "no")
+# RSS tối đa (MB) của các trình duyệt trong worker; vượt thì crawl dừng và trả phần đã có (0 = không giới hạn)
+BROWSER_RSS_LIMIT_MB = float(os.getenv("BROWSER_RSS_LIMIT_MB", "0"))
+PRUNED_ATTR = "data-pruned"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Làm rỗng các phần tử khớp selector có khoá (thuộc tính attr của chính nó hoặc của con đầu tiên
+# khớp keySelector, mặc định [attr]) nằm trong keys. keySelector phải chọn đúng phần tử mà bước
+# trích dùng làm khoá. Đọc hết chiều cao trước rồi mới sửa DOM: chỉ một lần tính layout.
+PRUNE_JS = """
+([selector, keySelector, attr, keys]) => {
+    const harvested = new Set(keys);
+    const nodes = [];
+    for (const el of document.querySelectorAll(`${selector}:not([%(attr)s])`)) {
+        const src = el.matches(keySelector) ? el : el.querySelector(keySelector);
+        if (src && harvested.has(src.getAttribute(attr))) nodes.push(el);
+    }
+    const heights = nodes.map(el => el.offsetHeight);
+    nodes.forEach((el, i) => {
+        el.replaceChildren();
+        el.style.height = `${heights[i]}px`;
+        el.setAttribute("%(attr)s", "");
+    });
+    return nodes.length;
+}
+""" % {"attr": PRUNED_ATTR}
+
+
+# ---------- RSS ----------
+def _process_table() -> Tuple[Dict[int, List[int]], Dict[int, int]]:
+    """(ppid -> [pid]) và RSS (byte) từng process, đọc từ /proc/<pid>/stat."""
+    children: Dict[int, List[int]] = {}
+    rss: Dict[int, int] = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue  # process vừa thoát
+        # Tên process (trường 2) có thể chứa ')' hay khoảng trắng: tách sau dấu ')' cuối
+        fields = stat[stat.rindex(b")") + 2:].split()
+        pid = int(entry.name)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss[pid] = int(fields[21]) * _PAGE_SIZE
+    return children, rss
+
+
+def browser_rss_bytes(pid: Optional[int] = None) -> int:
+    """
+    Tổng RSS (byte) các process con cháu của pid (mặc định worker hiện tại): Playwright
+    driver, trình duyệt, subprocess crawlee. Xấp xỉ: trang nhớ dùng chung giữa các process
+    của trình duyệt bị cộng nhiều lần. 0 nếu không có /proc (không phải Linux).
+    """
+    if not os.path.isdir("/proc"):
+        return 0
+    children, rss = _process_table()
+    total, stack = 0, list(children.get(os.getpid() if pid is None else pid, ()))
+    while stack:
+        child = stack.pop()
+        total += rss.get(child, 0)
+        stack.extend(children.get(child, ()))
+    return total
+
+
+# ---------- Per-crawl guard ----------
+class BrowserMemory:
+    """
+    Theo dõi bộ nhớ trình duyệt trong một lần crawl: prune node đã trích, lấy mẫu RSS
+    mỗi vòng (ghi peak vào histogram khi close) và báo exceeded() khi vượt giới hạn.
+    Giới hạn tính trên mọi trình duyệt của worker (BROWSER_SLOTS crawl chạy cùng lúc):
+    container bị OOM theo tổng, không theo từng trang.
+    """
+
+    def __init__(self, crawler: str, limit_mb: float = BROWSER_RSS_LIMIT_MB, prune: bool = DOM_PRUNE) -> None:
+        self.crawler = crawler
+        self.limit = int(limit_mb * 1024 * 1024)
+        self.prune_enabled = prune
+        self.rss = 0
+        self.peak = 0
+        self.pruned = 0
+        self._closed = False
+
+    @staticmethod
+    def _args(selector: str, attr: str, keys: Iterable[Any], key_selector: Optional[str]) -> list:
+        return [selector, key_selector or f"[{attr}]", attr, [str(k) for k in keys]]
+
+    async def prune_async(self, page: Any, selector: str, attr: str, keys: Iterable[Any],
+                          key_selector: Optional[str] = None) -> int:
+        """
+        Làm rỗng phần tử selector đã trích (khoá attr thuộc keys, đọc từ con khớp key_selector);
+        lỗi prune không làm hỏng crawl.
+        """
+        if not self.prune_enabled:
+            return 0
+        try:
+            n = await page.evaluate(PRUNE_JS, self._args(selector, attr, keys, key_selector))
+        except Exception:
+            return 0
+        self.pruned += n
+        return n
+
+    def prune(self, page: Any, selector: str, attr: str, keys: Iterable[Any],
+              key_selector: Optional[str] = None) -> int:
+        if not self.prune_enabled:
+            return 0
+        try:
+            n = page.evaluate(PRUNE_JS, self._args(selector, attr, keys, key_selector))
+        except Exception:
+            return 0
+        self.pruned += n
+        return n
+
+    def sample(self) -> int:
+        self.rss = browser_rss_bytes()
+        self.peak = max(self.peak, self.rss)
+        return self.rss
+
+    def exceeded(self) -> bool:
+        """Lấy mẫu RSS; True nếu vượt giới hạn (crawler nên dừng và trả phần đã có)."""
+        self.sample()
+        return bool(self.limit) and self.rss > self.limit
+
+    @property
+    def rss_mb(self) -> float:
+        return self.rss / (1024 * 1024)
+
+    @property
+    def limit_mb(self) -> float:
+        return self.limit / (1024 * 1024)
+
+    def close(self) -> None:
+        """Gọi trước khi đóng trình duyệt: lấy mẫu lần cuối rồi ghi peak vào histogram."""
+        if not self._closed:
+            self._closed = True
+            try:
+                self.sample()
+            except Exception:
+                pass
+            if self.peak:
+                CRAWLER_BROWSER_PEAK_RSS.labels(self.crawler).observe(self.peak)
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import inspect
+import functools
+import threading
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from observability.metrics import register_pool
+
+# ===== Constants =====
+# Số trình duyệt (crawl Playwright / crawlee) được chạy đồng thời trong một worker uvicorn
+BROWSER_SLOTS = int(os.getenv("BROWSER_SLOTS", "2"))
+
+
+def _wake(fut: "asyncio.Future[None]") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class BrowserSlots:
+    """
+    Giới hạn số crawl dùng trình duyệt chạy cùng lúc trong process.
+    Dùng chung cho crawler async (event loop) và crawler sync chạy trong thread
+    (vd. crawl_tiktok_hashtag), nên đếm bằng threading.Condition thay vì asyncio.Semaphore.
+    """
+
+    def __init__(self, size: int = BROWSER_SLOTS) -> None:
+        if size < 1:
+            raise ValueError("BROWSER_SLOTS phải >= 1.")
+        self.size = size
+        self.in_use = 0
+        self._cond = threading.Condition()
+        # waiter async: (loop, future) được đánh thức khi có slot trả về
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = []
+
+    def _try_take(self) -> bool:
+        if self.in_use < self.size:
+            self.in_use += 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while not self._try_take():
+                self._cond.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_take():
+                    return
+                fut = loop.create_future()
+                self._waiters.append((loop, fut))
+            try:
+                await fut
+            finally:
+                with self._cond:
+                    if (loop, fut) in self._waiters:
+                        self._waiters.remove((loop, fut))
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+            # Đánh thức mọi waiter async; waiter không giành được slot sẽ chờ tiếp
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[None]:
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Tuple[float, float]:
+        return self.in_use, self.size
+
+
+_default_slots: Optional[BrowserSlots] = None
+_default_lock = threading.Lock()
+
+
+def get_browser_slots() -> BrowserSlots:
+    """BrowserSlots dùng chung trong process theo env BROWSER_SLOTS."""
+    global _default_slots
+    with _default_lock:
+        if _default_slots is None:
+            _default_slots = BrowserSlots()
+            register_pool("browser_slots", _default_slots.snapshot)
+        return _default_slots
+
+
+def uses_browser_slot(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator cho hàm crawl (sync, async hoặc async generator): giữ một browser slot
+    trong lúc chạy; với generator là tới khi hết lô hoặc bên gọi aclose().
+    """
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def agen_wrapper(*args: Any, **kwargs: Any) -> Any:
+            async with get_browser_slots().slot_async():
+                async with aclosing(fn(*args, **kwargs)) as batches:
+                    async for batch in batches:
+                        yield batch
+        return agen_wrapper
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            async with get_browser_slots().slot_async():
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with get_browser_slots().slot():
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,209 @@
+import os
+import json
+import math
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# ===== Constants =====
+# Cookie export từ trình duyệt thật (định dạng Chrome/extension), dùng chung cho HTTP client và Playwright
+COOKIES_FILE = os.getenv("TIKTOK_COOKIES_FILE", "")
+COOKIE_DOMAINS = ("tiktok.com",)
+
+SAMESITE_MAP = {
+    "lax": "Lax",
+    "strict": "Strict",
+    "no_restriction": "None",
+}
+
+CookieKey = Tuple[str, str, str]  # (domain, path, name)
+
+
+# ---------- Helpers ----------
+def _norm_domain(domain: str) -> str:
+    return domain.lstrip(".").lower()
+
+
+class DomainFilter:
+    """
+    Tập domain (đã chuẩn hoá một lần) để lọc cookie: khớp chính xác hoặc subdomain.
+    Tra bằng các hậu tố nhãn của domain cookie nên chi phí không phụ thuộc số domain lọc.
+    """
+
+    def __init__(self, domains: Iterable[str]) -> None:
+        self.domains = frozenset(_norm_domain(d) for d in domains)
+
+    def __call__(self, domain: str) -> bool:
+        d = _norm_domain(domain)
+        while True:
+            if d in self.domains:
+                return True
+            dot = d.find(".")
+            if dot < 0:
+                return False
+            d = d[dot + 1:]
+
+
+def _from_export(c: Dict[str, Any]) -> Dict[str, Any]:
+    """Một cookie export (Chrome/extension) -> định dạng context.add_cookies của Playwright."""
+    ck = {
+        "name": c.get("name"),
+        "value": c.get("value", ""),
+        "domain": c.get("domain", ""),
+        "path": c.get("path", "/") or "/",
+        "secure": bool(c.get("secure", False)),
+        "httpOnly": bool(c.get("httpOnly", False)),
+    }
+    # map sameSite
+    ss_raw = c.get("sameSite")
+    ss = SAMESITE_MAP.get(ss_raw.lower()) if isinstance(ss_raw, str) else None
+    if ss:
+        ck["sameSite"] = ss
+    # map expires: Chrome export có thể là float; Playwright cần int
+    if not c.get("session", False):
+        exp = c.get("expirationDate", c.get("expires"))
+        if isinstance(exp, (int, float)) and exp >= 0:
+            ck["expires"] = int(math.floor(exp))
+    return ck
+
+
+def _path_matches(cookie_path: str, path: str) -> bool:
+    return path == cookie_path or path.startswith(cookie_path if cookie_path.endswith("/") else cookie_path + "/")
+
+
+# ---------- Cookie jar ----------
+class CookieJar:
+    """
+    Cookies ở định dạng Playwright, đánh chỉ mục theo (domain, path, name):
+    cookie trùng khoá thay cookie cũ (cookie đến sau thắng, như export của trình duyệt).
+    Dùng cho cả Playwright (add_to_context) lẫn HTTP client (header Cookie theo URL).
+    Jar lấy từ load_cookie_jar được cache dùng chung: coi như chỉ đọc.
+    """
+
+    def __init__(self, cookies: Iterable[Dict[str, Any]] = ()) -> None:
+        self._cookies: Dict[CookieKey, Dict[str, Any]] = {}
+        # (scheme, host, path) -> (header, hết hạn lúc)
+        self._headers: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        for c in cookies:
+            self.add(c)
+
+    @classmethod
+    def from_export(cls, data: Iterable[Dict[str, Any]],
+                    for_domains: Optional[Iterable[str]] = None) -> "CookieJar":
+        keep = DomainFilter(for_domains) if for_domains else None
+        jar = cls()
+        for c in data:
+            if keep is None or keep(c.get("domain", "")):
+                jar.add(_from_export(c))
+        return jar
+
+    def add(self, cookie: Dict[str, Any]) -> None:
+        key = (cookie["domain"], cookie["path"], cookie["name"])
+        with self._lock:
+            # pop trước để cookie thay thế nằm cuối, giữ thứ tự như export
+            self._cookies.pop(key, None)
+            self._cookies[key] = cookie
+            self._headers.clear()
+
+    def __len__(self) -> int:
+        return len(self._cookies)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._cookies.values()))
+
+    def filter(self, domains: Iterable[str]) -> "CookieJar":
+        keep = DomainFilter(domains)
+        return CookieJar(c for c in self if keep(c["domain"]))
+
+    # ----- Playwright -----
+    def playwright_cookies(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Cookie chưa hết hạn, đưa thẳng vào context.add_cookies / storage_state."""
+        now = time.time() if now is None else now
+        return [c for c in self if c.get("expires", -1) < 0 or c["expires"] > now]
+
+    async def add_to_context_async(self, context: Any) -> None:
+        cookies = self.playwright_cookies()
+        if cookies:
+            await context.add_cookies(cookies)
+
+    def add_to_context(self, context: Any) -> None:
+        cookies = self.playwright_cookies()
+        if cookies:
+            context.add_cookies(cookies)
+
+    # ----- HTTP client -----
+    def header_for(self, url: str) -> str:
+        """Giá trị header Cookie cho url (khớp domain, path, secure, còn hạn); cache theo host + path."""
+        parts = urlsplit(url)
+        host, path = (parts.hostname or "").lower(), parts.path or "/"
+        key = (parts.scheme, host, path)
+        now = time.time()
+        with self._lock:
+            cached = self._headers.get(key)
+            if cached is not None and cached[1] > now:
+                return cached[0]
+            cookies = list(self._cookies.values())
+
+        pairs, expires_at = [], math.inf
+        for c in cookies:
+            dom = _norm_domain(c["domain"])
+            if not (host == dom or host.endswith("." + dom)):
+                continue
+            if c.get("secure") and parts.scheme != "https":
+                continue
+            if not _path_matches(c["path"], path):
+                continue
+            exp = c.get("expires", -1)
+            if exp >= 0:
+                if exp <= now:
+                    continue
+                expires_at = min(expires_at, exp)
+            pairs.append(f"{c['name']}={c['value']}")
+        header = "; ".join(pairs)
+        with self._lock:
+            self._headers[key] = (header, expires_at)
+        return header
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """{'Cookie': ...} cho client.get(url, headers=...); rỗng nếu không có cookie khớp."""
+        header = self.header_for(url)
+        return {"Cookie": header} if header else {}
+
+
+# ---------- File cache ----------
+# (đường dẫn, domain lọc) -> ((mtime_ns, size), jar)
+_file_cache: Dict[Tuple[str, Optional[frozenset]], Tuple[Tuple[int, int], CookieJar]] = {}
+_file_lock = threading.Lock()
+
+
+def load_cookie_jar(json_path: Any, for_domains: Optional[Iterable[str]] = None) -> CookieJar:
+    """
+    CookieJar từ file export, chỉ parse lại khi file đổi (mtime / kích thước):
+    các context Playwright và client HTTP dùng chung một lần parse.
+    """
+    path = str(Path(json_path).resolve())
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (path, DomainFilter(for_domains).domains if for_domains else None)
+    with _file_lock:
+        cached = _file_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    jar = CookieJar.from_export(data, for_domains)
+    with _file_lock:
+        _file_cache[key] = (stamp, jar)
+    return jar
+
+
+def get_cookie_jar() -> Optional[CookieJar]:
+    """Jar từ TIKTOK_COOKIES_FILE (lọc theo COOKIE_DOMAINS); None nếu không cấu hình / không đọc được."""
+    if not COOKIES_FILE:
+        return None
+    try:
+        return load_cookie_jar(COOKIES_FILE, COOKIE_DOMAINS)
+    except (OSError, ValueError):
+        return None
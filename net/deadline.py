@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+# ===== Constants =====
+# Thời gian tối đa (giây) cho một request crawl nếu client không gửi header; 0 = không giới hạn
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "900"))
+DEADLINE_HEADER = "X-Deadline"
+# Hết deadline: chờ thêm khoảng này để crawler dừng ở vòng kế và trả kết quả dở, quá nữa thì huỷ hẳn
+DEADLINE_GRACE = float(os.getenv("DEADLINE_GRACE", "15"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Crawl bị dừng vì hết deadline hoặc bị huỷ (client ngắt kết nối)."""
+
+
+class ClientDisconnected(Exception):
+    """Client ngắt kết nối trước khi có kết quả; công việc của request đã bị huỷ."""
+
+
+class Deadline:
+    """
+    Mốc kết thúc (time.monotonic) của một request, truyền xuyên qua crawler.
+    Crawler kiểm tra done() giữa các vòng để dừng và trả phần đã thu thập;
+    cancel() đặt từ event loop được thấy ngay ở crawler chạy trong thread.
+    seconds None / <= 0: không giới hạn thời gian (vẫn huỷ được).
+    """
+
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.at: Optional[float] = time.monotonic() + seconds if seconds and seconds > 0 else None
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: float = REQUEST_DEADLINE) -> "Deadline":
+        """Deadline từ header X-Deadline (giây), không vượt default; thiếu / sai định dạng thì dùng default."""
+        try:
+            seconds = float(value) if value else default
+        except ValueError:
+            seconds = default
+        if default > 0 and (seconds <= 0 or seconds > default):
+            seconds = default
+        return cls(seconds)
+
+    def remaining(self) -> Optional[float]:
+        """Số giây còn lại (âm nếu đã quá); None nếu không giới hạn."""
+        return None if self.at is None else self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def done(self) -> bool:
+        """True nếu crawler nên dừng (hết giờ hoặc bị huỷ)."""
+        return self.cancelled or self.expired()
+
+    def check(self) -> None:
+        """Raise DeadlineExceeded nếu done(): dùng ở chỗ không trả được kết quả dở."""
+        if self.cancelled:
+            raise DeadlineExceeded("Request đã bị huỷ")
+        if self.expired():
+            raise DeadlineExceeded("Hết thời gian xử lý")
+
+    def timeout(self, seconds: Optional[float] = None) -> Optional[float]:
+        """Timeout (giây) không vượt quá thời gian còn lại; None = không giới hạn."""
+        remaining = self.remaining()
+        if remaining is None:
+            return seconds
+        remaining = max(0.0, remaining)
+        return remaining if seconds is None else min(seconds, remaining)
+
+    def timeout_ms(self, ms: float) -> float:
+        """Timeout Playwright (ms) cắt theo deadline; tối thiểu 1ms vì 0 nghĩa là chờ mãi."""
+        return max(1.0, self.timeout(ms / 1000) * 1000)
+
+
+async def run_with_deadline(work: Awaitable[Any], deadline: Deadline,
+                            disconnected: Optional[Awaitable[Any]] = None,
+                            grace: float = DEADLINE_GRACE) -> Any:
+    """
+    Chạy work trong task riêng, trả kết quả của nó. disconnected xong trước (client ngắt
+    kết nối) -> deadline.cancel() cho crawler chạy trong thread, huỷ task (đóng trình duyệt,
+    kill subprocess) rồi raise ClientDisconnected. Quá deadline + grace mà crawler chưa tự
+    dừng -> huỷ task, raise DeadlineExceeded. Task luôn kết thúc trước khi hàm trả về.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(disconnected) if disconnected is not None else None
+    try:
+        remaining = deadline.remaining()
+        done, _ = await asyncio.wait({task} if watcher is None else {task, watcher},
+                                     timeout=None if remaining is None else max(0.0, remaining + grace),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        deadline.cancel()
+        if watcher is not None and watcher in done:
+            raise ClientDisconnected()
+        raise DeadlineExceeded("Hết thời gian xử lý")
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if not task.done():
+            task.cancel()
+            # Chờ crawler dọn dẹp xong (đóng context, trả browser slot) rồi mới trả lời
+            await asyncio.wait({task})
+        if not task.cancelled():
+            task.exception()  # đã xử lý ở trên: không cảnh báo "never retrieved"
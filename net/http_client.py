@@ -0,0 +1,148 @@
+import os
+import atexit
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple, Type
+
+from observability.metrics import register_pool
+
+logger = logging.getLogger(__name__)
+
+# ===== Constants =====
+HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "1") == "1"
+POOL_MAX = int(os.getenv("HTTP_POOL_MAX", "20"))              # tổng số kết nối tối đa
+POOL_KEEPALIVE = int(os.getenv("HTTP_POOL_KEEPALIVE", "10"))  # số kết nối keep-alive giữ lại
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+COMPRESSION = os.getenv("HTTP_COMPRESSION", "1") == "1"
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36")
+
+
+def _accept_encoding() -> str:
+    """Chỉ quảng bá những codec giải nén được trong môi trường hiện tại."""
+    if not COMPRESSION:
+        return "identity"
+    codecs = ["gzip", "deflate"]
+    for module, name in (("brotli", "br"), ("brotlicffi", "br"), ("zstandard", "zstd")):
+        if name in codecs:
+            continue
+        try:
+            __import__(module)
+            codecs.append(name)
+        except ImportError:
+            pass
+    return ", ".join(codecs)
+
+
+def _build_httpx(proxy: Optional[str] = None) -> Any:
+    import httpx
+
+    http2 = HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.info("Thiếu gói 'h2', HTTP client dùng HTTP/1.1")
+            http2 = False
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=POOL_MAX,
+                            max_keepalive_connections=POOL_KEEPALIVE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+        timeout=TIMEOUT,
+        headers={"User-Agent": USER_AGENT, "Accept-Encoding": _accept_encoding()},
+        follow_redirects=True,
+        proxy=proxy,
+    )
+
+
+class _RequestsClient:
+    """Fallback khi không có httpx: một requests.Session dùng chung với pool cấu hình được."""
+
+    def __init__(self, proxy: Optional[str] = None) -> None:
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=POOL_KEEPALIVE, pool_maxsize=POOL_MAX)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": _accept_encoding()})
+        if proxy:
+            self.session.proxies.update({"http": proxy, "https": proxy})
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        kwargs.setdefault("timeout", TIMEOUT)
+        return self.session.get(url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def transport_errors() -> Tuple[Type[BaseException], ...]:
+    """Các lỗi tầng kết nối nên retry (dùng cho RateLimiter.call(retry_on=...))."""
+    errors: Tuple[Type[BaseException], ...] = (OSError,)
+    try:
+        import httpx
+        errors += (httpx.TransportError,)
+    except ImportError:
+        pass
+    return errors
+
+
+_client: Optional[Any] = None
+# proxy url -> client riêng (httpx gắn proxy theo client, không theo request)
+_proxy_clients: Dict[str, Any] = {}
+_client_lock = threading.Lock()
+
+
+def _build_client(proxy: Optional[str] = None) -> Any:
+    try:
+        return _build_httpx(proxy)
+    except ImportError:
+        return _RequestsClient(proxy)
+
+
+def get_http_client(proxy: Optional[str] = None) -> Any:
+    """
+    HTTP client dùng chung toàn process (keep-alive, HTTP/2 nếu có 'h2', nén):
+    mọi request tới cùng host tái sử dụng kết nối TLS. httpx.Client nếu có,
+    ngược lại requests.Session. Cả hai đều có .get(url, params=...) và .close().
+    proxy: client riêng cho từng proxy (xem net.proxy_pool), cũng giữ kết nối keep-alive.
+    """
+    global _client
+    with _client_lock:
+        if _client is None and not _proxy_clients:
+            atexit.register(close_http_client)
+        if proxy:
+            client = _proxy_clients.get(proxy)
+            if client is None:
+                client = _proxy_clients[proxy] = _build_client(proxy)
+            return client
+        if _client is None:
+            _client = _build_client()
+        return _client
+
+
+def _pool_usage() -> Optional[Tuple[int, int]]:
+    """(kết nối đang bận, POOL_MAX) của httpx client; None nếu chưa tạo / là fallback requests."""
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return None
+    return sum(1 for c in pool.connections if not c.is_idle()), POOL_MAX
+
+
+register_pool("http_client", _pool_usage)
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        for client in _proxy_clients.values():
+            client.close()
+        _proxy_clients.clear()
@@ -0,0 +1,371 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+
+# ===== Constants =====
+DEFAULT_RPS = float(os.getenv("RATE_LIMIT_RPS", "2"))
+DEFAULT_MIN_RPS = float(os.getenv("RATE_LIMIT_MIN_RPS", "0.2"))
+DEFAULT_MAX_RPS = float(os.getenv("RATE_LIMIT_MAX_RPS", "10"))
+DEFAULT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+DEFAULT_INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", "0.1"))   # +rps mỗi phản hồi tốt
+DEFAULT_DECREASE = float(os.getenv("RATE_LIMIT_DECREASE", "0.5"))   # x rps khi bị chặn
+DEFAULT_BREAKER_FAILURES = int(os.getenv("RATE_LIMIT_BREAKER_FAILURES", "8"))
+DEFAULT_BREAKER_COOLDOWN = float(os.getenv("RATE_LIMIT_BREAKER_COOLDOWN", "30"))
+
+# Kết quả một request
+OK = "ok"
+THROTTLED = "throttled"   # 429 / captcha / phản hồi rỗng -> giảm tốc (AIMD) + tính vào breaker
+ERROR = "error"           # lỗi mạng / 5xx -> chỉ tính vào breaker
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class Throttled(Exception):
+    """Phía server đang chặn / giới hạn (429, captcha, body rỗng hoặc không phải JSON)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    """Lỗi tạm thời không phải do bị chặn (5xx, mất kết nối)."""
+
+
+class CircuitOpen(Exception):
+    """Host đang bị ngắt (quá nhiều lỗi liên tiếp); thử lại sau retry_after giây."""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        super().__init__(f"Circuit open cho host '{host}', thử lại sau {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def host_of(url_or_host: str) -> str:
+    """'https://www.tiktok.com/api/...' -> 'www.tiktok.com' (chuỗi không có scheme giữ nguyên)."""
+    if "://" in url_or_host:
+        return (urlsplit(url_or_host).hostname or url_or_host).lower()
+    return url_or_host.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Header Retry-After dạng số giây (dạng ngày tháng bỏ qua)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Retry exponential backoff có jitter (full jitter), tôn trọng Retry-After."""
+    max_attempts: int = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+    base_delay: float = float(os.getenv("RETRY_BASE_DELAY", "1"))
+    max_delay: float = float(os.getenv("RETRY_MAX_DELAY", "30"))
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Thời gian chờ trước lần thử attempt + 1 (attempt tính từ 1)."""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        d = random.uniform(0, cap)
+        return max(d, retry_after) if retry_after else d
+
+
+class HostLimiter:
+    """
+    Token bucket của một host với tốc độ điều chỉnh AIMD:
+    phản hồi tốt -> rate += increase; bị chặn -> rate *= decrease (tối đa một lần
+    mỗi khoảng 1/rate để các request đang bay không giảm dồn). Kèm circuit breaker
+    closed -> open (sau N lỗi liên tiếp) -> half_open (cho một request thăm dò).
+    Request thăm dò không báo kết quả (lỗi lạ, bị huỷ, crawler dừng giữa chừng) được
+    release_probe() trả lại, hoặc hết hạn sau một cooldown để request khác thăm dò tiếp.
+    Thread-safe; dùng được cả từ code đồng bộ lẫn asyncio.
+    """
+
+    def __init__(self, host: str, rate: float = DEFAULT_RPS, min_rate: float = DEFAULT_MIN_RPS,
+                 max_rate: float = DEFAULT_MAX_RPS, burst: float = DEFAULT_BURST,
+                 increase: float = DEFAULT_INCREASE, decrease: float = DEFAULT_DECREASE,
+                 failure_threshold: int = DEFAULT_BREAKER_FAILURES,
+                 cooldown: float = DEFAULT_BREAKER_COOLDOWN) -> None:
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._cooldown = cooldown
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+        self.metrics: Dict[str, float] = {
+            "requests": 0, "ok": 0, "throttled": 0, "errors": 0,
+            "retries": 0, "rejected": 0, "circuit_opens": 0, "wait_seconds": 0.0,
+        }
+
+    # ---------- Token bucket ----------
+    def _reserve(self) -> Tuple[float, bool]:
+        """
+        Giữ một token; trả về (số giây phải chờ, có phải request thăm dò half_open không).
+        Raise CircuitOpen nếu host đang bị ngắt.
+        """
+        with self._lock:
+            now = time.monotonic()
+            probe = self._check_circuit(now)
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+            self.metrics["requests"] += 1
+            self.metrics["wait_seconds"] += wait
+            return wait, probe
+
+    def acquire(self) -> bool:
+        """Chờ tới lượt; True nếu request này là request thăm dò (phải record() hoặc release_probe())."""
+        wait, probe = self._reserve()
+        try:
+            time.sleep(wait)
+        except BaseException:
+            if probe:
+                self.release_probe()
+            raise
+        return probe
+
+    async def acquire_async(self) -> bool:
+        wait, probe = self._reserve()
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                # Bị huỷ trong lúc chờ: không giữ lượt thăm dò của host
+                if probe:
+                    self.release_probe()
+                raise
+        return probe
+
+    # ---------- Circuit breaker ----------
+    def _check_circuit(self, now: float) -> bool:
+        """Raise CircuitOpen nếu chưa được gửi; True nếu request này là request thăm dò."""
+        if self.state == OPEN:
+            remaining = self._cooldown - (now - self._opened_at)
+            if remaining > 0:
+                self.metrics["rejected"] += 1
+                raise CircuitOpen(self.host, remaining)
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == HALF_OPEN:
+            # Thăm dò quá một cooldown mà chưa báo kết quả: coi như bỏ, cho request khác thăm dò
+            if self._probe_in_flight and now - self._probe_started < self._cooldown:
+                self.metrics["rejected"] += 1
+                raise CircuitOpen(self.host, self._cooldown - (now - self._probe_started))
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Request thăm dò kết thúc mà không có kết quả (lỗi khác, bị huỷ): cho request sau thăm dò lại."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def _open(self, now: float) -> None:
+        # Mở lại ngay sau khi thăm dò thất bại thì tăng gấp đôi cooldown (tối đa 10 lần)
+        if self.state == HALF_OPEN:
+            self._cooldown = min(self._cooldown * 2, self.base_cooldown * 10)
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self.metrics["circuit_opens"] += 1
+
+    # ---------- Feedback ----------
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if outcome == OK:
+                self.metrics["ok"] += 1
+                self._failures = 0
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self._cooldown = self.base_cooldown
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                return
+
+            self.metrics["throttled" if outcome == THROTTLED else "errors"] += 1
+            if outcome == THROTTLED and now - self._last_decrease >= 1.0 / self.rate:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = min(self._tokens, 0.0)
+                self._last_decrease = now
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open(now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"host": self.host, "rate": round(self.rate, 4), "state": self.state,
+                    "consecutive_failures": self._failures, **self.metrics}
+
+
+class BatchBackoff:
+    """
+    Thay cho "dừng sau 3 lần rỗng" của crawler trình duyệt: lượt tải thêm (View More /
+    scroll) đi qua acquire() của limiter host; lô có item mới báo OK, lô rỗng chỉ chờ
+    backoff có jitter trước lần thử sau (empty() trả None khi hết lượt). Lô rỗng không
+    được báo THROTTLED: hết danh sách là kết thúc bình thường, không phải bị chặn, và
+    không được làm giảm tốc / ngắt breaker của host cho các crawl khác.
+    acquire() có thể raise CircuitOpen: crawler dừng và trả phần đã có như hết deadline.
+    """
+
+    def __init__(self, limiter: HostLimiter, policy: Optional[RetryPolicy] = None) -> None:
+        self.limiter = limiter
+        self.policy = policy or RetryPolicy(
+            max_attempts=int(os.getenv("BROWSER_EMPTY_ATTEMPTS", "5")),
+            base_delay=float(os.getenv("BROWSER_EMPTY_BASE_DELAY", "1")),
+            max_delay=float(os.getenv("BROWSER_EMPTY_MAX_DELAY", "20")),
+        )
+        self.count = 0
+        self._probe = False
+
+    @property
+    def max_attempts(self) -> int:
+        return self.policy.max_attempts
+
+    def acquire(self) -> None:
+        self._probe = self.limiter.acquire()
+
+    async def acquire_async(self) -> None:
+        self._probe = await self.limiter.acquire_async()
+
+    def ok(self) -> None:
+        self.count = 0
+        self._probe = False
+        self.limiter.record(OK)
+
+    def empty(self) -> Optional[float]:
+        self.count += 1
+        # Lô rỗng không kết luận gì về host: trả lượt thăm dò half_open (nếu đang giữ)
+        if self._probe:
+            self._probe = False
+            self.limiter.release_probe()
+        if self.count >= self.policy.max_attempts:
+            return None
+        self.limiter.metrics["retries"] += 1
+        return self.policy.delay(self.count)
+
+
+class RateLimiter:
+    """Tập HostLimiter theo host + các helper gọi có retry (sync / async)."""
+
+    def __init__(self, **defaults: Any) -> None:
+        self._defaults = defaults
+        self._hosts: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, url_or_host: str) -> HostLimiter:
+        host = host_of(url_or_host)
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            with self._lock:
+                limiter = self._hosts.setdefault(host, HostLimiter(host, **self._defaults))
+        return limiter
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {host: lim.snapshot() for host, lim in list(self._hosts.items())}
+
+    def call(self, url: str, fn: Callable[[], T], policy: Optional[RetryPolicy] = None,
+             retry_on: Tuple[Type[BaseException], ...] = (OSError,)) -> T:
+        """
+        Gọi fn() qua limiter của host, retry khi Throttled / TransientError / retry_on.
+        Hết lượt thử thì raise lỗi cuối; CircuitOpen raise ngay.
+        """
+        policy = policy or RetryPolicy()
+        limiter = self.for_host(url)
+        for attempt in range(1, policy.max_attempts + 1):
+            probe = limiter.acquire()
+            try:
+                result = fn()
+            except Throttled as e:
+                limiter.record(THROTTLED)
+                if attempt == policy.max_attempts:
+                    raise
+                delay = policy.delay(attempt, e.retry_after)
+            except (TransientError, *retry_on):
+                limiter.record(ERROR)
+                if attempt == policy.max_attempts:
+                    raise
+                delay = policy.delay(attempt)
+            except BaseException:
+                # Lỗi không thuộc về host (parse, bug) hoặc bị huỷ: không kết luận gì cho breaker
+                if probe:
+                    limiter.release_probe()
+                raise
+            else:
+                limiter.record(OK)
+                return result
+            limiter.metrics["retries"] += 1
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def call_async(self, url: str, fn: Callable[[], Awaitable[T]],
+                         policy: Optional[RetryPolicy] = None,
+                         retry_on: Tuple[Type[BaseException], ...] = (OSError,)) -> T:
+        """Bản async của call(): fn là coroutine function không tham số."""
+        policy = policy or RetryPolicy()
+        limiter = self.for_host(url)
+        for attempt in range(1, policy.max_attempts + 1):
+            probe = await limiter.acquire_async()
+            try:
+                result = await fn()
+            except Throttled as e:
+                limiter.record(THROTTLED)
+                if attempt == policy.max_attempts:
+                    raise
+                delay = policy.delay(attempt, e.retry_after)
+            except (TransientError, *retry_on):
+                limiter.record(ERROR)
+                if attempt == policy.max_attempts:
+                    raise
+                delay = policy.delay(attempt)
+            except BaseException:
+                # Lỗi không thuộc về host (parse, bug) hoặc bị huỷ: không kết luận gì cho breaker
+                if probe:
+                    limiter.release_probe()
+                raise
+            else:
+                limiter.record(OK)
+                return result
+            limiter.metrics["retries"] += 1
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """RateLimiter dùng chung cho mọi crawler trong process."""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
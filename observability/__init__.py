@@ -0,0 +1,9 @@
+from .metrics import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_PROGRESS, CRAWLER_STAGE_SECONDS, CRAWLER_ITEMS,
+    CRAWLER_ITEMS_PER_SECOND, CRAWLER_RUNS, COMMENT_PAGES, COMMENT_API_REQUESTS, CACHE_REQUESTS,
+    Stopwatch, instrument_crawl, stage_timer, cache_lookup, register_pool, render_metrics, mark_process_dead,
+)
+from .profiling import (
+    PROFILE_HEADER, ProfileSession, start_session, end_session, is_enabled, profiled,
+    add_span, list_artifacts, artifact_path,
+)
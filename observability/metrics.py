@@ -0,0 +1,249 @@
+import os
+import time
+import inspect
+import functools
+import threading
+from contextlib import aclosing, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+
+from .profiling import add_span
+
+# ===== Metrics =====
+# Bucket cho thao tác trình duyệt / crawl (từ vài chục ms tới vài phút)
+_CRAWL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Thời gian xử lý request HTTP theo endpoint",
+    ["method", "route", "status"], buckets=_CRAWL_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Số request HTTP đang xử lý", ["method", "route"],
+    multiprocess_mode="livesum",
+)
+CRAWLER_STAGE_SECONDS = Histogram(
+    "crawler_stage_duration_seconds",
+    "Thời gian từng giai đoạn crawl (launch / navigation / setup / extraction / wait / fetch ...)",
+    ["crawler", "stage"], buckets=_CRAWL_BUCKETS,
+)
+CRAWLER_ITEMS = Counter(
+    "crawler_items_total", "Số item thu thập được", ["crawler"],
+)
+CRAWLER_ITEMS_PER_SECOND = Gauge(
+    "crawler_items_per_second", "Throughput (item/giây) của lần crawl gần nhất", ["crawler"],
+    multiprocess_mode="mostrecent",
+)
+CRAWLER_RUNS = Counter(
+    "crawler_runs_total", "Số lần chạy crawler theo kết quả", ["crawler", "outcome"],
+)
+COMMENT_PAGES = Histogram(
+    "comment_pages_per_crawl", "Số trang API comment (kể cả reply) của một lần crawl comment",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+COMMENT_API_REQUESTS = Counter(
+    "comment_api_requests_total", "Số request tới API comment", ["endpoint"],
+)
+CRAWLER_BROWSER_PEAK_RSS = Histogram(
+    "crawler_browser_peak_rss_bytes", "RSS lớn nhất của trình duyệt (mọi process con của worker) trong một lần crawl",
+    ["crawler"], buckets=tuple(mb * 1024 * 1024 for mb in (128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096)),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Lượt tra cache theo kết quả", ["cache", "result"],
+)
+
+
+# ---------- Helpers ----------
+@contextmanager
+def stage_timer(crawler: str, stage: str) -> Iterator[None]:
+    """Đo một giai đoạn crawl; dùng được trong cả code sync lẫn async (with thường)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        CRAWLER_STAGE_SECONDS.labels(crawler, stage).observe(end - start)
+        add_span(stage, start, end)
+
+
+class Stopwatch:
+    """
+    Đo các giai đoạn nối tiếp nhau của một lần crawl mà không phải bọc code
+    trong with: lap(stage) ghi thời gian từ lần lap trước (hoặc lúc tạo) vào stage.
+    """
+
+    def __init__(self, crawler: str) -> None:
+        self.crawler = crawler
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        CRAWLER_STAGE_SECONDS.labels(self.crawler, stage).observe(elapsed)
+        add_span(stage, self._last, now)
+        self._last = now
+        return elapsed
+
+    def reset(self) -> None:
+        """Bỏ qua khoảng thời gian từ lần lap trước (không ghi vào stage nào)."""
+        self._last = time.perf_counter()
+
+
+def _count(result: Any) -> int:
+    # list/dict: số phần tử; kết quả đơn (vd. một transcript): 1 nếu không rỗng
+    return len(result) if isinstance(result, (list, tuple, dict)) else int(bool(result))
+
+
+def _record_run(crawler: str, start: float, count: int, outcome: str) -> None:
+    elapsed = time.perf_counter() - start
+    if count:
+        CRAWLER_ITEMS.labels(crawler).inc(count)
+    if outcome == "ok" and elapsed > 0:
+        CRAWLER_ITEMS_PER_SECOND.labels(crawler).set(count / elapsed)
+    CRAWLER_STAGE_SECONDS.labels(crawler, "total").observe(elapsed)
+    CRAWLER_RUNS.labels(crawler, outcome).inc()
+
+
+def instrument_crawl(crawler: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator cho hàm crawl (sync, async hoặc async generator yield từng lô):
+    đếm số lần chạy theo kết quả, thời gian tổng, số item và item/giây.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def agen_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                count = 0
+                try:
+                    async with aclosing(fn(*args, **kwargs)) as batches:
+                        async for batch in batches:
+                            count += _count(batch)
+                            yield batch
+                except GeneratorExit:
+                    # Bên gọi dừng sớm (đã đủ item): vẫn là một lần chạy thành công
+                    _record_run(crawler, start, count, "ok")
+                    raise
+                except BaseException:
+                    _record_run(crawler, start, count, "error")
+                    raise
+                _record_run(crawler, start, count, "ok")
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    _record_run(crawler, start, 0, "error")
+                    raise
+                _record_run(crawler, start, _count(result), "ok")
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                _record_run(crawler, start, 0, "error")
+                raise
+            _record_run(crawler, start, _count(result), "ok")
+            return result
+        return wrapper
+    return decorator
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# ---------- Pool occupancy (đọc lúc scrape) ----------
+# name -> hàm trả về (đang dùng, dung lượng) hoặc None nếu pool chưa khởi tạo
+_pools: Dict[str, Callable[[], Optional[Tuple[float, float]]]] = {}
+_pools_lock = threading.Lock()
+
+
+def register_pool(name: str, probe: Callable[[], Optional[Tuple[float, float]]]) -> None:
+    with _pools_lock:
+        _pools[name] = probe
+
+
+class _StateCollector:
+    """Gauge tính lúc scrape: độ chiếm dụng pool, RSS trình duyệt và trạng thái rate limiter theo host."""
+
+    def collect(self):
+        in_use = GaugeMetricFamily("pool_in_use", "Số slot đang dùng của pool", labels=["pool"])
+        size = GaugeMetricFamily("pool_size", "Dung lượng tối đa của pool", labels=["pool"])
+        with _pools_lock:
+            probes = list(_pools.items())
+        for name, probe in probes:
+            try:
+                value = probe()
+            except Exception:
+                value = None
+            if value is not None:
+                in_use.add_metric([name], value[0])
+                size.add_metric([name], value[1])
+        yield in_use
+        yield size
+
+        from net.browser_memory import browser_rss_bytes
+
+        rss = GaugeMetricFamily("browser_rss_bytes", "RSS hiện tại của các process con (Playwright driver + trình duyệt) của worker")
+        try:
+            rss.add_metric([], browser_rss_bytes())
+        except Exception:
+            pass
+        yield rss
+
+        from net.rate_limit import get_rate_limiter
+
+        hosts = get_rate_limiter().snapshot()
+        rate = GaugeMetricFamily("rate_limit_rps", "Tốc độ cho phép hiện tại (AIMD) theo host", labels=["host"])
+        state = GaugeMetricFamily("rate_limit_circuit_open", "1 nếu circuit breaker của host không ở trạng thái closed", labels=["host"])
+        events: List[CounterMetricFamily] = [
+            CounterMetricFamily(f"rate_limit_{key}", f"Rate limiter: {key} theo host", labels=["host"])
+            for key in ("requests", "ok", "throttled", "errors", "retries", "rejected", "circuit_opens", "wait_seconds")
+        ]
+        for host, snap in hosts.items():
+            rate.add_metric([host], snap["rate"])
+            state.add_metric([host], 0 if snap["state"] == "closed" else 1)
+            for fam in events:
+                fam.add_metric([host], snap[fam.name[len("rate_limit_"):]])
+        yield rate
+        yield state
+        yield from events
+
+
+REGISTRY.register(_StateCollector())
+
+
+def _multiprocess_dir() -> Optional[str]:
+    # app.py đặt biến này trước khi spawn nhiều worker uvicorn
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    (body, content-type) cho endpoint /metrics. Chạy nhiều worker: counter/histogram
+    gộp từ mọi process; pool và rate limiter là trạng thái của worker nhận request scrape.
+    """
+    if not _multiprocess_dir():
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_StateCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Dọn file metric của worker sắp thoát (gauge livesum không còn tính process này)."""
+    if _multiprocess_dir():
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import uuid
+import inspect
+import cProfile
+import functools
+import threading
+import contextvars
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ===== Constants =====
+# PROFILE=1 bật profiling cho mọi lần gọi; nếu không, chỉ bật theo request có header X-Profile
+PROFILE_ALWAYS = os.getenv("PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "storage/profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+# "sampling" (mặc định, dùng được cho cả hàm async) | "cprofile" (chỉ hàm sync, ghi thêm .prof)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")
+PROFILE_HEADER = "X-Profile"
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+Frame = Tuple[str, str, int]  # (tên hàm, file, dòng đầu hàm)
+
+
+class ProfileSession:
+    """Gom các artifact profile sinh ra trong một request (hoặc một lần chạy)."""
+
+    def __init__(self, session_id: Optional[str] = None) -> None:
+        self.id = session_id or uuid.uuid4().hex[:12]
+        self.artifacts: List[str] = []
+
+
+_session: contextvars.ContextVar[Optional[ProfileSession]] = contextvars.ContextVar("profile_session", default=None)
+_record: contextvars.ContextVar[Optional["_Record"]] = contextvars.ContextVar("profile_record", default=None)
+
+
+def start_session(session_id: Optional[str] = None) -> Tuple[ProfileSession, contextvars.Token]:
+    session = ProfileSession(session_id)
+    return session, _session.set(session)
+
+
+def end_session(token: contextvars.Token) -> None:
+    _session.reset(token)
+
+
+def is_enabled() -> bool:
+    return PROFILE_ALWAYS or _session.get() is not None
+
+
+# ---------- Sampling ----------
+class _Sampler(threading.Thread):
+    """Lấy mẫu stack của một thread (sys._current_frames) mỗi interval giây."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: List[Tuple[float, Tuple[Frame, ...]]] = []
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((time.perf_counter(), tuple(stack)))
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class _Record:
+    """Một lần gọi được profile: mẫu stack + các span (Stopwatch.lap) bên trong."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = self.start
+        self.spans: List[Tuple[str, float, float]] = []
+        self.samples: List[Tuple[float, Tuple[Frame, ...]]] = []
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+
+        def frame_id(f: Frame) -> int:
+            i = index.get(f)
+            if i is None:
+                i = index[f] = len(frames)
+                frames.append({"name": f[0], "file": f[1], "line": f[2]})
+            return i
+
+        duration = self.end - self.start
+        profiles: List[Dict[str, Any]] = []
+
+        # sampled: trọng số mỗi mẫu = khoảng cách tới mẫu trước
+        samples, weights, prev = [], [], self.start
+        for at, stack in self.samples:
+            samples.append([frame_id(f) for f in stack])
+            weights.append(at - prev)
+            prev = at
+        profiles.append({
+            "type": "sampled", "name": f"{self.name} (samples)", "unit": "seconds",
+            "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+        })
+
+        # evented: span gốc = cả lần gọi, bên trong là các stage nối tiếp nhau
+        root = frame_id((self.name, "", 0))
+        events = [{"type": "O", "frame": root, "at": 0.0}]
+        for stage, s, e in sorted(self.spans, key=lambda x: x[1]):
+            fid = frame_id((stage, "", 0))
+            events.append({"type": "O", "frame": fid, "at": max(0.0, s - self.start)})
+            events.append({"type": "C", "frame": fid, "at": max(0.0, e - self.start)})
+        events.append({"type": "C", "frame": root, "at": duration})
+        profiles.append({
+            "type": "evented", "name": f"{self.name} (spans)", "unit": "seconds",
+            "startValue": 0, "endValue": duration, "events": events,
+        })
+
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "tiktok-crawler profiling",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def add_span(stage: str, start: float, end: float) -> None:
+    """Ghi một span vào lần gọi đang được profile (nếu có)."""
+    record = _record.get()
+    if record is not None:
+        record.spans.append((stage, start, end))
+
+
+def _artifact_path(name: str, suffix: str) -> Path:
+    session = _session.get()
+    sid = session.id if session is not None else "env"
+    ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{ts}-{safe}-{sid}-{uuid.uuid4().hex[:6]}{suffix}"
+
+
+def _save(record: _Record, cprof: Optional[cProfile.Profile] = None) -> None:
+    path = _artifact_path(record.name, ".speedscope.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record.to_speedscope(), f)
+    names = [path.name]
+    if cprof is not None:
+        prof_path = path.with_name(path.name.replace(".speedscope.json", ".prof"))
+        cprof.dump_stats(str(prof_path))
+        names.append(prof_path.name)
+    session = _session.get()
+    if session is not None:
+        session.artifacts.extend(names)
+
+
+def profiled(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Bọc hàm (sync hoặc async): khi profiling bật thì lấy mẫu stack của thread
+    đang chạy hàm, gom span Stopwatch bên trong và ghi artifact speedscope JSON
+    vào PROFILE_DIR. Khi tắt chỉ tốn một lần đọc ContextVar.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not is_enabled():
+                    return await fn(*args, **kwargs)
+                record = _Record(name)
+                token = _record.set(record)
+                sampler = _Sampler(threading.get_ident(), PROFILE_INTERVAL)
+                sampler.start()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    sampler.stop()
+                    record.end = time.perf_counter()
+                    record.samples = sampler.samples
+                    _record.reset(token)
+                    _save(record)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not is_enabled():
+                return fn(*args, **kwargs)
+            record = _Record(name)
+            token = _record.set(record)
+            sampler = _Sampler(threading.get_ident(), PROFILE_INTERVAL)
+            cprof = cProfile.Profile() if PROFILE_MODE == "cprofile" else None
+            sampler.start()
+            if cprof is not None:
+                cprof.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if cprof is not None:
+                    cprof.disable()
+                sampler.stop()
+                record.end = time.perf_counter()
+                record.samples = sampler.samples
+                _record.reset(token)
+                _save(record, cprof)
+        return wrapper
+    return decorator
+
+
+def list_artifacts(limit: int = 100) -> List[Dict[str, Any]]:
+    directory = Path(PROFILE_DIR)
+    if not directory.is_dir():
+        return []
+    files = sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]
+    return [{"name": p.name, "bytes": p.stat().st_size} for p in files]
+
+
+def artifact_path(name: str) -> Optional[Path]:
+    """Đường dẫn artifact theo tên (chặn path traversal); None nếu không tồn tại."""
+    if "/" in name or "\\" in name or name.startswith("."):
+        return None
+    path = Path(PROFILE_DIR) / name
+    return path if path.is_file() else None
@@ -0,0 +1,11 @@
+from .db import connection, get_pool, close_pool
+from .trend_snapshots import (
+    SnapshotTable, HASHTAGS, VIDEOS, AUDIO, TABLES,
+    write_snapshot, rank_history, normalize_hashtag,
+    save_trend_hashtags, save_trend_videos, save_trend_audio,
+)
+from .sinks import (
+    ResultSink, JsonlSink, ParquetSink, PostgresSink, sink_from_url, get_default_sink,
+)
+from .checkpoints import CheckpointStore, get_checkpoint_store
+from .shared_cache import CACHE_TTLS, SharedCache, Uncached, get_shared_cache
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from observability.metrics import cache_lookup
+
+# ===== Constants =====
+DEFAULT_CHECKPOINT_PATH = os.getenv("CRAWL_CHECKPOINT_PATH", "storage/checkpoints.sqlite3")
+# Checkpoint cũ hơn khoảng này bị bỏ qua (bảng xếp hạng đã thay đổi, resume không còn đúng)
+DEFAULT_CHECKPOINT_TTL = float(os.getenv("CRAWL_CHECKPOINT_TTL", str(6 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    key TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class CheckpointStore:
+    """
+    Lưu trạng thái crawl dở dang (id đã thu thập, số lần View More / scroll)
+    trong SQLite cục bộ để lần chạy sau tiếp tục thay vì crawl lại từ đầu.
+    Dùng được từ nhiều process (crawler trang cá nhân chạy trong subprocess).
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH,
+                 ttl_seconds: float = DEFAULT_CHECKPOINT_TTL) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """State của key, None nếu không có hoặc đã quá TTL."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, updated_at FROM checkpoints WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            cache_lookup("crawl_checkpoint", False)
+            return None
+        cache_lookup("crawl_checkpoint", True)
+        return json.loads(row[0])
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO checkpoints (key, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (key, json.dumps(state, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+    def clear_consumed(self, key: str, field: str, consumed: int) -> bool:
+        """
+        Xoá checkpoint chỉ khi state[field] không dài hơn consumed (số phần tử lần crawl này
+        đã dùng): lần crawl limit nhỏ hơn, hay chạy song song cùng key, không xoá tiến độ của
+        lần crawl lớn hơn. True nếu đã xoá (hoặc không còn checkpoint).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT state FROM checkpoints WHERE key = ?", (key,)
+                ).fetchone()
+                cleared = row is None or len(json.loads(row[0]).get(field, ())) <= consumed
+                if row is not None and cleared:
+                    self._conn.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cleared
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM checkpoints WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[CheckpointStore] = None
+_default_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """CheckpointStore dùng chung theo env CRAWL_CHECKPOINT_PATH."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = CheckpointStore()
+        return _default_store
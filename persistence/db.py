@@ -0,0 +1,62 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool
+
+from observability.metrics import register_pool
+
+# ===== Connection pool dùng chung trong process =====
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Tạo pool lười ở lần gọi đầu (đọc DATABASE_URL từ env/.env một lần)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            load_dotenv()
+            db_url = os.getenv("DATABASE_URL")
+            if not db_url:
+                raise RuntimeError("DATABASE_URL not found in environment (.env).")
+            _pool = ThreadedConnectionPool(
+                int(os.getenv("DB_POOL_MIN", "1")),
+                int(os.getenv("DB_POOL_MAX", "5")),
+                db_url,
+            )
+        return _pool
+
+
+@contextmanager
+def connection() -> Iterator[PgConnection]:
+    """Mượn một connection từ pool, commit khi thành công, rollback khi lỗi."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def _pool_usage() -> Optional[Tuple[int, int]]:
+    pool = _pool
+    return None if pool is None else (len(pool._used), pool.maxconn)
+
+
+register_pool("postgres", _pool_usage)
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
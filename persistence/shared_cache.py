@@ -0,0 +1,196 @@
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from observability.metrics import cache_lookup
+
+# ===== Constants =====
+DEFAULT_SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "storage/shared_cache.sqlite3")
+# Lease của process đang tính một key; process chết giữa chừng thì process khác chiếm lại sau khoảng này
+DEFAULT_LEASE_SECONDS = float(os.getenv("SHARED_CACHE_LEASE", "900"))
+DEFAULT_POLL_SECONDS = float(os.getenv("SHARED_CACHE_POLL", "0.5"))
+
+# TTL (giây) theo loại kết quả endpoint; 0 = không cache, không single-flight
+CACHE_TTLS: Dict[str, float] = {
+    kind: float(os.getenv(f"SHARED_CACHE_TTL_{kind.upper()}", default))
+    for kind, default in (
+        ("trend", "600"),
+        ("comments", "300"),
+        ("user_page", "300"),
+        ("transcripts", "86400"),
+    )
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inflight (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class Uncached(bytes):
+    """Kết quả trả cho các request đang chờ nhưng không ghi vào cache (vd. kết quả dở do hết deadline)."""
+
+
+class SharedCache:
+    """
+    Cache kết quả (bytes, thường là JSON đã encode) trong SQLite cục bộ, dùng chung
+    giữa các worker uvicorn trên cùng máy, kèm single-flight: mỗi key chỉ một
+    request tính (crawl) tại một thời điểm, request khác trong cùng process chờ
+    future, ở process khác chờ lease trong bảng inflight rồi đọc kết quả từ cache.
+    Lỗi không được cache: key được nhả để request sau tính lại.
+    """
+
+    def __init__(self, path: str = DEFAULT_SHARED_CACHE_PATH,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # key -> future của request đang tính trong process này
+        self._local: Dict[str, "asyncio.Future[bytes]"] = {}
+
+    # ----- sync API -----
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, time.time() + ttl),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            self._conn.execute("DELETE FROM inflight WHERE expires_at < ?", (now,))
+        return cur.rowcount
+
+    def _try_lease(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM inflight WHERE key = ? AND expires_at < ?", (key, now))
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO inflight (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self._owner, now + self.lease_seconds),
+            )
+        return cur.rowcount == 1
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, self._owner))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ----- single-flight -----
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[bytes]],
+                             ttl: float, cache: str = "shared") -> bytes:
+        """
+        Giá trị còn hạn của key, hoặc kết quả của compute() (được cache ttl giây).
+        ttl <= 0: gọi thẳng compute(), không cache / single-flight.
+        """
+        if ttl <= 0:
+            return await compute()
+        value = await asyncio.to_thread(self.get, key)
+        if value is not None:
+            cache_lookup(cache, True)
+            return value
+        cache_lookup(cache, False)
+
+        while True:
+            fut = self._local.get(key)
+            if fut is None:
+                break
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                # Request đang tính bị huỷ (client ngắt): thử lại, trừ khi chính request này bị huỷ
+                if asyncio.current_task().cancelling():
+                    raise
+
+        fut = asyncio.get_running_loop().create_future()
+        # Không ai chờ thì không cảnh báo "exception was never retrieved"
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._local[key] = fut
+        try:
+            value = await self._compute_across_processes(key, compute, ttl)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(value)
+            return value
+        finally:
+            del self._local[key]
+
+    async def _compute_across_processes(self, key: str, compute: Callable[[], Awaitable[bytes]],
+                                        ttl: float) -> bytes:
+        while True:
+            if await asyncio.to_thread(self._try_lease, key):
+                try:
+                    # Process khác có thể vừa ghi xong trước khi nhả lease
+                    value = await asyncio.to_thread(self.get, key)
+                    if value is None:
+                        value = await compute()
+                        if not isinstance(value, Uncached):
+                            await asyncio.to_thread(self.set, key, value, ttl)
+                    return value
+                finally:
+                    await asyncio.to_thread(self._release, key)
+            # Worker khác đang tính: chờ kết quả xuất hiện hoặc lease được nhả (lỗi / hết hạn)
+            await asyncio.sleep(self.poll_seconds)
+            value = await asyncio.to_thread(self.get, key)
+            if value is not None:
+                return value
+
+
+_default_cache: Optional[SharedCache] = None
+_default_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedCache:
+    """SharedCache dùng chung theo env SHARED_CACHE_PATH."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SharedCache()
+        return _default_cache
@@ -0,0 +1,236 @@
+import os
+import io
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+
+class ResultSink:
+    """
+    Sink kết quả crawl dạng stream: crawler gọi push() (không chờ I/O),
+    một thread nền gom theo (stream, captured_at) rồi ghi theo lô.
+    Lớp con chỉ cần cài _write().
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 2.0,
+                 max_queue: int = 10000) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    # ----- API cho crawler -----
+    def push(self, stream: str, records: Iterable[Dict[str, Any]],
+             captured_at: Optional[datetime] = None) -> None:
+        """
+        Đẩy một lô bản ghi. captured_at gom các lô của cùng một lần crawl
+        (mặc định: thời điểm gọi). Chỉ block khi hàng đợi đầy (backpressure).
+        """
+        if self._closed:
+            raise RuntimeError("Sink đã đóng.")
+        records = [dict(r) for r in records]
+        if records:
+            self._queue.put((stream, captured_at or datetime.now(timezone.utc), records))
+
+    def flush(self) -> None:
+        """Chờ tới khi mọi bản ghi đã push trước đó được ghi xong."""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._close_backend()
+
+    # ----- backend -----
+    def _write(self, stream: str, captured_at: datetime, records: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def _close_backend(self) -> None:
+        pass
+
+    # ----- writer thread -----
+    def _run(self) -> None:
+        buffers: Dict[Tuple[str, datetime], List[Dict[str, Any]]] = {}
+        last_flush = time.monotonic()
+
+        def drain(force: bool) -> None:
+            for key in list(buffers):
+                if force or len(buffers[key]) >= self.batch_size:
+                    records = buffers.pop(key)
+                    try:
+                        self._write(key[0], key[1], records)
+                    except Exception:
+                        logger.exception("Sink %s: ghi %d bản ghi '%s' thất bại",
+                                         type(self).__name__, len(records), key[0])
+
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                drain(force=True)
+                return
+            if isinstance(item, tuple) and item[0] is _FLUSH:
+                drain(force=True)
+                last_flush = time.monotonic()
+                item[1].set()
+                continue
+            if item is not None:
+                stream, captured_at, records = item
+                buffers.setdefault((stream, captured_at), []).extend(records)
+                drain(force=False)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                drain(force=True)
+                last_flush = time.monotonic()
+
+
+class JsonlSink(ResultSink):
+    """Mỗi stream một file <dir>/<stream>.jsonl, ghi nối (append)."""
+
+    def __init__(self, directory: str, **kwargs: Any) -> None:
+        self.directory = Path(directory)
+        self._files: Dict[str, IO[str]] = {}
+        super().__init__(**kwargs)
+
+    def _write(self, stream: str, captured_at: datetime, records: List[Dict[str, Any]]) -> None:
+        f = self._files.get(stream)
+        if f is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            f = self._files[stream] = open(self.directory / f"{stream}.jsonl", "a", encoding="utf-8")
+        ts = captured_at.isoformat()
+        buf = io.StringIO()
+        for r in records:
+            buf.write(json.dumps({"captured_at": ts, **r}, ensure_ascii=False, default=str))
+            buf.write("\n")
+        f.write(buf.getvalue())
+        f.flush()
+
+    def _close_backend(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+class ParquetSink(ResultSink):
+    """Mỗi lô một file <dir>/<stream>/part-<ts>-<seq>.parquet (cần pyarrow)."""
+
+    def __init__(self, directory: str, **kwargs: Any) -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("ParquetSink cần cài 'pyarrow'.") from e
+        self.directory = Path(directory)
+        self._seq = 0
+        super().__init__(**kwargs)
+
+    def _write(self, stream: str, captured_at: datetime, records: List[Dict[str, Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        out_dir = self.directory / stream
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        table = pa.Table.from_pylist([{"captured_at": captured_at, **r} for r in records])
+        pq.write_table(table, out_dir / f"part-{captured_at:%Y%m%dT%H%M%S}-{self._seq:06d}.parquet")
+
+
+class PostgresSink(ResultSink):
+    """
+    Stream xếp hạng (trend_videos / trend_audio / trend_hashtags) ghi vào bảng
+    lịch sử snapshot; các stream khác ghi JSONB vào crawl_results bằng COPY.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        from . import trend_snapshots
+
+        self._snapshot_writers = {
+            "trend_videos": trend_snapshots.save_trend_videos,
+            "trend_audio": trend_snapshots.save_trend_audio,
+            "trend_hashtags": trend_snapshots.save_trend_hashtags,
+        }
+        self._table_ready = False
+        super().__init__(**kwargs)
+
+    def _write(self, stream: str, captured_at: datetime, records: List[Dict[str, Any]]) -> None:
+        from .db import connection
+        from .trend_snapshots import _copy_rows
+
+        writer = self._snapshot_writers.get(stream)
+        if writer is not None:
+            writer(records, captured_at=captured_at)
+            return
+
+        created = False
+        with connection() as conn:
+            with conn.cursor() as cur:
+                if not self._table_ready:
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS crawl_results (
+                            id BIGSERIAL PRIMARY KEY,
+                            stream TEXT NOT NULL,
+                            captured_at TIMESTAMPTZ NOT NULL,
+                            payload JSONB NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS crawl_results_stream_time
+                        ON crawl_results (stream, captured_at);
+                    """)
+                    created = True
+                _copy_rows(cur, "crawl_results", ["stream", "captured_at", "payload"],
+                           ((stream, captured_at, json.dumps(r, ensure_ascii=False, default=str))
+                            for r in records))
+        # Chỉ ghi nhận sau commit: rollback làm mất cả CREATE TABLE
+        if created:
+            self._table_ready = True
+
+
+def sink_from_url(url: str, **kwargs: Any) -> ResultSink:
+    """
+    'jsonl:/data/results' | 'parquet:/data/results' | 'postgres:' (dùng DATABASE_URL).
+    """
+    scheme, _, target = url.partition(":")
+    scheme = scheme.lower()
+    if scheme == "jsonl":
+        return JsonlSink(target or "storage/results", **kwargs)
+    if scheme == "parquet":
+        return ParquetSink(target or "storage/results", **kwargs)
+    if scheme in ("postgres", "postgresql"):
+        return PostgresSink(**kwargs)
+    raise ValueError(f"Không hỗ trợ sink '{url}'.")
+
+
+_default_sink: Optional[ResultSink] = None
+_default_lock = threading.Lock()
+
+
+def get_default_sink() -> Optional[ResultSink]:
+    """Sink dùng chung theo env RESULT_SINK (None nếu không cấu hình)."""
+    global _default_sink
+    url = os.getenv("RESULT_SINK")
+    if not url:
+        return None
+    with _default_lock:
+        if _default_sink is None:
+            _default_sink = sink_from_url(url)
+            atexit.register(_default_sink.close)
+        return _default_sink
@@ -0,0 +1,223 @@
+import io
+import csv
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .db import connection
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """
+    Bảng lịch sử xếp hạng, partition theo tháng của captured_at.
+    key: các cột định danh một item trong một snapshot (PK = key + captured_at).
+    """
+    name: str
+    key: Tuple[str, ...]
+    columns: Tuple[Tuple[str, str], ...]  # (tên cột, kiểu) ngoài captured_at
+
+    @property
+    def column_names(self) -> List[str]:
+        return [c for c, _ in self.columns] + ["captured_at"]
+
+
+HASHTAGS = SnapshotTable(
+    name="tiktok_trend_hashtag_history",
+    key=("hashtag",),
+    columns=(("hashtag", "TEXT NOT NULL"), ("ranking", "INT NOT NULL")),
+)
+VIDEOS = SnapshotTable(
+    name="tiktok_trend_video_history",
+    key=("period", "video_id"),
+    columns=(("period", "TEXT NOT NULL"), ("video_id", "TEXT NOT NULL"),
+             ("ranking", "INT NOT NULL"), ("url", "TEXT")),
+)
+AUDIO = SnapshotTable(
+    name="tiktok_trend_audio_history",
+    key=("period", "audio_key"),
+    columns=(("period", "TEXT NOT NULL"), ("audio_key", "TEXT NOT NULL"),
+             ("ranking", "INT NOT NULL"), ("song_id", "TEXT"),
+             ("song_name", "TEXT"), ("audio_url", "TEXT")),
+)
+TABLES = {"hashtags": HASHTAGS, "videos": VIDEOS, "audio": AUDIO}
+
+# DDL chỉ chạy một lần mỗi process cho mỗi bảng / partition; tên chỉ được ghi nhận sau khi
+# transaction tạo ra nó commit (rollback thì DDL mất, lần ghi sau phải chạy lại)
+_ensured: Set[str] = set()
+_ensured_lock = threading.Lock()
+
+
+# ---------- Schema ----------
+def _ensure_table(cur, spec: SnapshotTable, created: List[str]) -> None:
+    if spec.name in _ensured:
+        return
+    cols = ",\n".join(f"{c} {t}" for c, t in spec.columns)
+    key = ", ".join(spec.key)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {spec.name} (
+            {cols},
+            captured_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY ({key}, captured_at)
+        ) PARTITION BY RANGE (captured_at);
+    """)
+    # PK (key, captured_at) phục vụ truy vấn "rank theo thời gian" của một item;
+    # index này phục vụ "top N tại một snapshot".
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {spec.name}_snapshot_rank
+        ON {spec.name} (captured_at, ranking);
+    """)
+    created.append(spec.name)
+
+
+def _ensure_partition(cur, spec: SnapshotTable, captured_at: datetime, created: List[str]) -> None:
+    start = captured_at.astimezone(timezone.utc).replace(day=1, hour=0, minute=0,
+                                                         second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 \
+        else start.replace(month=start.month + 1)
+    part = f"{spec.name}_y{start.year}m{start.month:02d}"
+    if part in _ensured:
+        return
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {part} PARTITION OF {spec.name}
+        FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
+    """)
+    created.append(part)
+
+
+# ---------- Write ----------
+def _copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        buf,
+    )
+
+
+def write_snapshot(spec: SnapshotTable, rows: List[Dict[str, Any]],
+                   captured_at: Optional[datetime] = None,
+                   also: Optional[Callable[[Any, datetime], None]] = None) -> int:
+    """
+    Ghi một snapshot: COPY vào bảng tạm rồi INSERT ... ON CONFLICT DO UPDATE
+    vào bảng lịch sử (không TRUNCATE, không khoá người đọc). Trả về số dòng.
+    also(cur, captured_at): ghi thêm trong cùng transaction (vd. bảng "hiện tại" cũ).
+    """
+    if not rows:
+        return 0
+    captured_at = captured_at or datetime.now(timezone.utc)
+    names = spec.column_names
+    stage = f"_stage_{spec.name}"
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in names
+                        if c not in spec.key and c != "captured_at")
+
+    created: List[str] = []
+    with connection() as conn:
+        with conn.cursor() as cur:
+            _ensure_table(cur, spec, created)
+            _ensure_partition(cur, spec, captured_at, created)
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {stage}
+                (LIKE {spec.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+            """)
+            _copy_rows(cur, stage, names,
+                       ([r.get(c) for c in names[:-1]] + [captured_at] for r in rows))
+            cur.execute(f"""
+                INSERT INTO {spec.name} ({', '.join(names)})
+                SELECT DISTINCT ON ({', '.join(spec.key)}) {', '.join(names)} FROM {stage}
+                ORDER BY {', '.join(spec.key)}, ranking
+                ON CONFLICT ({', '.join(spec.key)}, captured_at) DO UPDATE SET {updates};
+            """)
+            if also is not None:
+                also(cur, captured_at)
+    # Tới đây connection() đã commit
+    with _ensured_lock:
+        _ensured.update(created)
+    return len(rows)
+
+
+def rank_history(spec: SnapshotTable, key: Dict[str, Any],
+                 since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Quỹ đạo xếp hạng của một item theo thời gian (dùng PK, không quét toàn bảng)."""
+    where = " AND ".join(f"{c} = %s" for c in spec.key)
+    params: List[Any] = [key[c] for c in spec.key]
+    if since is not None:
+        where += " AND captured_at >= %s"
+        params.append(since)
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT captured_at, ranking FROM {spec.name} WHERE {where} ORDER BY captured_at",
+                params,
+            )
+            return [{"captured_at": ts.isoformat(), "ranking": rk} for ts, rk in cur.fetchall()]
+
+
+# ---------- Crawler result adapters ----------
+def normalize_hashtag(s: str) -> str:
+    """
+    Chuẩn hoá hashtag: bỏ '#', bỏ khoảng trắng, về chữ thường.
+    Ví dụ: "# dotrungnien" -> "dotrungnien"
+    """
+    if s is None:
+        return ""
+    s = s.strip()
+    if s.startswith("#"):
+        s = s[1:]
+    s = s.replace(" ", "")
+    return s.lower()
+
+
+def save_trend_hashtags(items: List[Dict[str, Any]],
+                        captured_at: Optional[datetime] = None,
+                        also: Optional[Callable[[Any, datetime], None]] = None) -> int:
+    """Ranking = thứ tự xuất hiện (1-based) nếu item không có sẵn 'ranking'."""
+    rows = []
+    seen = set()
+    for idx, it in enumerate(items, start=1):
+        tag = normalize_hashtag(it.get("hashtag") or it.get("hashtag_name") or "")
+        # tránh trùng trong cùng danh sách input
+        if not tag or tag in seen:
+            continue
+        seen.add(tag)
+        rows.append({"hashtag": tag, "ranking": it.get("ranking", idx)})
+    return write_snapshot(HASHTAGS, rows, captured_at, also)
+
+
+def _period_of(period: Optional[str], item: Dict[str, Any]) -> Optional[str]:
+    """Period của item (tham số ưu tiên hơn trường 'period'); None nếu không có."""
+    value = period if period is not None else item.get("period")
+    return None if value is None or value == "" else str(value)
+
+
+def save_trend_videos(items: List[Dict[str, Any]], period: Optional[str] = None,
+                      captured_at: Optional[datetime] = None) -> int:
+    """Item thiếu video_id hoặc period bị bỏ qua (period là một phần khoá của lịch sử)."""
+    rows = []
+    for idx, it in enumerate(items, start=1):
+        item_period = _period_of(period, it)
+        if not it.get("video_id") or item_period is None:
+            continue
+        rows.append({"period": item_period, "video_id": it["video_id"],
+                     "ranking": it.get("ranking", idx), "url": it.get("url")})
+    return write_snapshot(VIDEOS, rows, captured_at)
+
+
+def save_trend_audio(items: List[Dict[str, Any]], period: Optional[str] = None,
+                     captured_at: Optional[datetime] = None) -> int:
+    """Item thiếu song_id/song_name hoặc period bị bỏ qua."""
+    rows = []
+    for idx, it in enumerate(items, start=1):
+        key = it.get("song_id") or it.get("song_name")
+        item_period = _period_of(period, it)
+        if not key or item_period is None:
+            continue
+        rows.append({"period": item_period,
+                     "audio_key": key, "ranking": it.get("ranking", idx),
+                     "song_id": it.get("song_id"), "song_name": it.get("song_name"),
+                     "audio_url": it.get("audio_url")})
+    return write_snapshot(AUDIO, rows, captured_at)
@@ -0,0 +1,3 @@
+from .trend import (
+    COMMENT_WORKERS, QUEUE_SIZE, TRANSCRIPT_WORKERS, PipelineOptions, TrendPipeline, run_trend_pipeline,
+)
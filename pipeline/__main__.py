@@ -0,0 +1,60 @@
+"""
+Chạy pipeline xu hướng từ dòng lệnh (không cần API):
+
+    python -m pipeline --limit 30 --period 7 --transcript-workers 4 --comment-workers 2
+    python -m pipeline --limit 100 --no-comments --out trend.json --deadline 600
+
+Tiến độ in ra stderr, kết quả JSON ra stdout (hoặc file --out).
+"""
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from api.responses import dumps
+from net.deadline import Deadline
+from .trend import COMMENT_WORKERS, QUEUE_SIZE, TRANSCRIPT_WORKERS, PipelineOptions, run_trend_pipeline
+
+
+def _print_progress(progress: Dict[str, Any]) -> None:
+    print("[pipeline] " + " ".join(f"{k}={v}" for k, v in progress.items()), file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=50, help="số video trên bảng xếp hạng")
+    parser.add_argument("--period", default="7", help="period trong trang TikTokTrend (7, 30, 120)")
+    parser.add_argument("--transcript-workers", type=int, default=TRANSCRIPT_WORKERS)
+    parser.add_argument("--comment-workers", type=int, default=COMMENT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--no-transcripts", action="store_true")
+    parser.add_argument("--no-comments", action="store_true")
+    parser.add_argument("--no-group", action="store_true")
+    parser.add_argument("--nmin", type=int, default=2)
+    parser.add_argument("--nmax", type=int, default=100)
+    parser.add_argument("--min-id-count", type=int, default=2)
+    parser.add_argument("--top-k", type=int,
+                        help="chỉ lấy top_k nhóm phổ biến nhất (xấp xỉ: có thể khác kết quả không giới hạn)")
+    parser.add_argument("--deadline", type=float, default=0, help="giới hạn thời gian (giây), 0 = không giới hạn")
+    parser.add_argument("--out", type=Path, help="ghi kết quả ra file JSON thay vì stdout")
+    args = parser.parse_args(argv)
+
+    options = PipelineOptions(
+        limit=args.limit, period=args.period,
+        transcripts=not args.no_transcripts, comments=not args.no_comments, group=not args.no_group,
+        transcript_workers=args.transcript_workers, comment_workers=args.comment_workers,
+        queue_size=args.queue_size, nmin=args.nmin, nmax=args.nmax,
+        min_id_count=args.min_id_count, top_k=args.top_k,
+    )
+    result = asyncio.run(run_trend_pipeline(options, _print_progress, Deadline(args.deadline)))
+    body = dumps(result)
+    if args.out:
+        args.out.write_bytes(body)
+    else:
+        sys.stdout.buffer.write(body + b"\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Pipeline xu hướng chạy trong một process: bảng xếp hạng video TikTokTrend -> transcript
+và comment của từng video (song song, giới hạn số worker theo stage) -> gom nhóm n-gram
+transcript. Các stage nối bằng hàng đợi có giới hạn nên chạy chồng lên nhau: video đầu
+tiên được tải transcript / comment ngay khi lô 'View More' đầu tiên về, trong lúc crawl
+vẫn tiếp tục; hàng đợi đầy thì crawl chờ (backpressure) thay vì giữ hết trong bộ nhớ.
+"""
+import os
+import json
+import time
+import asyncio
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from api.responses import dumps
+from net.deadline import Deadline
+
+# ===== Constants =====
+TRANSCRIPT_WORKERS = int(os.getenv("PIPELINE_TRANSCRIPT_WORKERS", "4"))
+COMMENT_WORKERS = int(os.getenv("PIPELINE_COMMENT_WORKERS", "2"))
+# Số video tối đa chờ ở mỗi hàng đợi giữa crawl và stage transcript / comment
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "20"))
+
+STAGES = ("transcripts", "comments")
+# Stage -> khoá gắn kết quả vào item video
+FIELDS = {"transcripts": "transcript", "comments": "comments"}
+
+
+@dataclass
+class PipelineOptions:
+    limit: int = 50
+    period: str = "7"
+    transcripts: bool = True
+    comments: bool = True
+    group: bool = True
+    transcript_workers: int = TRANSCRIPT_WORKERS
+    comment_workers: int = COMMENT_WORKERS
+    queue_size: int = QUEUE_SIZE
+    # Tham số gom nhóm, như /utils/get_prunned_groups
+    nmin: int = 2
+    nmax: int = 100
+    min_id_count: int = 2
+    # Xấp xỉ (xem top_k_groups): có thể khác top_k nhóm đầu của kết quả không đặt top_k
+    top_k: Optional[int] = None
+    nfc: bool = False
+    strip_diacritics: bool = False
+
+
+class TrendPipeline:
+    """
+    Một lần chạy pipeline. Kết quả của run():
+        videos: item bảng xếp hạng (ranking, period) kèm 'transcript' / 'comments'
+        groups: nhóm n-gram trên các transcript lấy được
+        errors: {stage: {video_id: lỗi}}; lỗi của một video không làm dừng pipeline
+        partial: True nếu dừng vì deadline / bị huỷ
+    on_progress(progress): callback đồng bộ, gọi mỗi khi tiến độ đổi (vd. job queue, CLI).
+    Các stage (stream_videos, transcript, comments, group) ghi đè được ở lớp con.
+    """
+
+    def __init__(self, options: Optional[PipelineOptions] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 deadline: Optional[Deadline] = None) -> None:
+        self.options = options or PipelineOptions()
+        self.on_progress = on_progress
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.videos: List[Dict[str, Any]] = []
+        self.groups: List[dict] = []
+        self.errors: Dict[str, Dict[str, str]] = {stage: {} for stage in STAGES}
+        self.progress: Dict[str, Any] = {"stage": "crawling", "videos": 0,
+                                         **{stage: 0 for stage in STAGES}, "failed": 0}
+
+    # ---------- Stages ----------
+    def stream_videos(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        from tiktok_trend.playwright_tiktok_ads import stream_tiktok_trend_videos
+        return stream_tiktok_trend_videos(limit=self.options.limit, period=self.options.period,
+                                          deadline=self.deadline)
+
+    async def transcript(self, video: Dict[str, Any]) -> str:
+        from utils.get_transcripts import download_transcript
+        url = video["url"]
+        return await self._cached("transcripts", url,
+                                  lambda: download_transcript(url, deadline=self.deadline))
+
+    async def comments(self, video: Dict[str, Any]) -> Any:
+        from tiktok import fetch_comments
+        video_id = video["video_id"]
+        return await self._cached("comments", video_id,
+                                  lambda: asyncio.to_thread(fetch_comments, video_id, self.deadline))
+
+    async def group(self, ids: List[Any], transcripts: List[str]) -> List[dict]:
+        from analysis_tiktok_trend.groups_pruned import group_ngrams_from_lists
+        o = self.options
+        return await group_ngrams_from_lists(ids, transcripts, o.nmin, o.nmax, o.min_id_count,
+                                             nfc=o.nfc, strip_diacritics=o.strip_diacritics, top_k=o.top_k)
+
+    async def _cached(self, kind: str, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        # Cùng cache / single-flight với endpoint (kind:key): video đã lấy qua API hay pipeline
+        # khác (kể cả ở worker khác) không bị tải lại
+        from persistence.shared_cache import CACHE_TTLS, Uncached, get_shared_cache
+
+        async def encoded() -> bytes:
+            body = dumps(await compute())
+            return Uncached(body) if self.deadline.done() else body
+        body = await get_shared_cache().get_or_compute(f"{kind}:{key}", encoded, CACHE_TTLS[kind], cache=kind)
+        return json.loads(body)
+
+    # ---------- Orchestration ----------
+    def _report(self, **fields: Any) -> None:
+        self.progress.update(fields)
+        if self.on_progress is not None:
+            self.on_progress(dict(self.progress))
+
+    async def _produce(self, queues: List["asyncio.Queue[Optional[Dict[str, Any]]]"],
+                       workers: List[int]) -> None:
+        async with aclosing(self.stream_videos()) as batches:
+            async for batch in batches:
+                for video in batch:
+                    self.videos.append(video)
+                    for queue in queues:
+                        await queue.put(video)
+                self._report(videos=len(self.videos))
+        self._report(stage="fetching")
+        # Hết bảng xếp hạng: mỗi worker nhận một None để dừng
+        for queue, n in zip(queues, workers):
+            for _ in range(n):
+                await queue.put(None)
+
+    async def _consume(self, stage: str, queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+                       fetch: Callable[[Dict[str, Any]], Awaitable[Any]]) -> None:
+        while (video := await queue.get()) is not None:
+            if self.deadline.done():
+                continue  # rút hết hàng đợi để crawl không bị chặn, không tải thêm
+            try:
+                video[FIELDS[stage]] = await fetch(video)
+            except Exception as e:
+                self.errors[stage][str(video.get("video_id"))] = str(e)
+                self.progress["failed"] += 1
+            self._report(**{stage: self.progress[stage] + 1})
+
+    async def run(self) -> Dict[str, Any]:
+        o = self.options
+        start = time.perf_counter()
+        stages = [(stage, fetch, n) for stage, fetch, n, enabled in (
+            ("transcripts", self.transcript, o.transcript_workers, o.transcripts),
+            ("comments", self.comments, o.comment_workers, o.comments),
+        ) if enabled]
+        queues = [asyncio.Queue(maxsize=max(1, o.queue_size)) for _ in stages]
+        workers = [max(1, n) for _, _, n in stages]
+
+        self._report(stage="crawling")
+        # Lỗi ở crawl huỷ mọi worker; lỗi của từng video chỉ ghi vào errors
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._produce(queues, workers))
+                for (stage, fetch, _), queue, n in zip(stages, queues, workers):
+                    for _ in range(n):
+                        tg.create_task(self._consume(stage, queue, fetch))
+        except ExceptionGroup as eg:
+            # Worker chỉ lỗi khi crawl lỗi: trả lại lỗi gốc (API / job hiện thông báo rõ ràng)
+            raise eg.exceptions[0]
+
+        if o.group and o.transcripts and not self.deadline.cancelled:
+            docs = [(v["video_id"], v["transcript"]) for v in self.videos if v.get("transcript")]
+            if docs:
+                self._report(stage="grouping")
+                ids, texts = zip(*docs)
+                self.groups = await self.group(list(ids), list(texts))
+
+        self._report(stage="done", seconds=round(time.perf_counter() - start, 3))
+        return {
+            "videos": self.videos,
+            "groups": self.groups,
+            "errors": {stage: errs for stage, errs in self.errors.items() if errs},
+            "progress": self.progress,
+            "partial": self.deadline.done(),
+        }
+
+
+async def run_trend_pipeline(options: Optional[PipelineOptions] = None,
+                             on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                             deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    return await TrendPipeline(options, on_progress, deadline).run()
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fixtures import ProfileFixture, format_views
+from benchmarks.server import StandInServer
+from net.browser_memory import PRUNED_ATTR, BrowserMemory
+from utils import extract_video_metadata
+from utils.extract_metadata_video import USER_POST_ITEM, VIDEO_LINK, normalize_views
+
+async_api = pytest.importorskip("playwright.async_api")
+
+PAGE_SIZE = 30
+# Ô thật còn link tới tác giả đứng trước link video: khoá prune phải đọc đúng link video
+AUTHOR_LINK_JS = """
+user => document.querySelectorAll('[data-e2e="user-post-item"]').forEach(el =>
+    el.insertAdjacentHTML('afterbegin', `<a href="/@${user}">@${user}</a>`))
+"""
+
+
+def _expected(fixture: ProfileFixture, posts) -> list:
+    return [{"url": f"https://www.tiktok.com/@{fixture.username}/video/{p['id']}",
+             "views": normalize_views(format_views(p["stats"]["playCount"]))} for p in posts]
+
+
+async def _scenario(server: StandInServer, fixture: ProfileFixture) -> None:
+    async with async_api.async_playwright() as p:
+        try:
+            browser = await p.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"không chạy được chromium: {e}")
+        try:
+            page = await browser.new_page()
+            await page.goto(server.url(f"/@{fixture.username}"))
+            await page.evaluate(AUTHOR_LINK_JS, fixture.username)
+            memory = BrowserMemory("test", prune=True)
+
+            first = await extract_video_metadata(page)
+            assert first == _expected(fixture, fixture.posts[:PAGE_SIZE])
+            collected = {item["url"]: item["views"] for item in first}
+
+            # Khoá mặc định ([href] đầu tiên) là link tác giả: không khớp url đã trích
+            assert await memory.prune_async(page, USER_POST_ITEM, "href", collected) == 0
+            heights = await page.locator(USER_POST_ITEM).evaluate_all("els => els.map(el => el.offsetHeight)")
+
+            assert await memory.prune_async(page, USER_POST_ITEM, "href", collected, VIDEO_LINK) == PAGE_SIZE
+            assert await page.locator(USER_POST_ITEM).count() == PAGE_SIZE
+            assert await page.locator(f"{USER_POST_ITEM}[{PRUNED_ATTR}]").count() == PAGE_SIZE
+            assert await page.locator(f"{USER_POST_ITEM} a").count() == 0
+            assert await page.locator(USER_POST_ITEM).evaluate_all(
+                "els => els.map(el => el.offsetHeight)") == heights
+            assert await extract_video_metadata(page) == []
+
+            # Bố cục giữ nguyên: scroll vẫn kích hoạt lô tiếp theo, chỉ ô mới được trích
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await page.wait_for_function(f"document.querySelectorAll('{USER_POST_ITEM}').length > {PAGE_SIZE}")
+            second = await extract_video_metadata(page)
+            assert second == _expected(fixture, fixture.posts[PAGE_SIZE:2 * PAGE_SIZE])
+            assert await memory.prune_async(page, USER_POST_ITEM, "href", collected, VIDEO_LINK) == 0
+        finally:
+            await browser.close()
+
+
+def test_prune_and_extract_on_stand_in_profile():
+    fixture = ProfileFixture(n_posts=90, page_size=PAGE_SIZE)
+    with StandInServer(profile=fixture) as server:
+        asyncio.run(_scenario(server, fixture))
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from net import browser_slots
+from net.browser_slots import BrowserSlots, uses_browser_slot
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        BrowserSlots(0)
+
+
+def test_sync_threads_never_exceed_size():
+    slots = BrowserSlots(2)
+    peak, lock = [0], threading.Lock()
+
+    def crawl():
+        with slots.slot():
+            with lock:
+                peak[0] = max(peak[0], slots.in_use)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=crawl) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert peak[0] == 2 and slots.snapshot() == (0, 2)
+
+
+def test_async_waiters_are_woken_by_thread_release():
+    slots = BrowserSlots(1)
+
+    async def scenario():
+        slots.acquire()            # crawl sync giữ slot trong thread
+        order = []
+
+        async def crawl(name):
+            async with slots.slot_async():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(crawl(n)) for n in ("a", "b")]
+        await asyncio.sleep(0.01)
+        assert order == [] and len(slots._waiters) == 2
+
+        threading.Timer(0.01, slots.release).start()
+        await asyncio.wait_for(asyncio.gather(*tasks), 5)
+        return order
+
+    assert sorted(asyncio.run(scenario())) == ["a", "b"]
+    assert slots.in_use == 0 and slots._waiters == []
+
+
+def test_cancelled_async_waiter_leaves_no_trace():
+    slots = BrowserSlots(1)
+
+    async def scenario():
+        await slots.acquire_async()
+        waiter = asyncio.create_task(slots.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert slots._waiters == []
+        slots.release()
+
+    asyncio.run(scenario())
+    assert slots.in_use == 0
+
+
+def test_decorator_holds_slot_for_sync_async_and_generators(monkeypatch):
+    slots = BrowserSlots(1)
+    monkeypatch.setattr(browser_slots, "_default_slots", slots)
+    seen = []
+
+    @uses_browser_slot
+    def crawl_sync():
+        seen.append(slots.in_use)
+        return "sync"
+
+    @uses_browser_slot
+    async def crawl_async():
+        seen.append(slots.in_use)
+        return "async"
+
+    @uses_browser_slot
+    async def crawl_batches():
+        for i in range(3):
+            seen.append(slots.in_use)
+            yield [i]
+
+    async def scenario():
+        assert await crawl_async() == "async"
+        gen = crawl_batches()
+        assert await gen.__anext__() == [0]
+        assert slots.in_use == 1
+        await gen.aclose()         # bên gọi dừng sớm vẫn trả slot
+        assert slots.in_use == 0
+        assert [b async for b in crawl_batches()] == [[0], [1], [2]]
+
+    assert crawl_sync() == "sync"
+    asyncio.run(scenario())
+    assert seen == [1] * 6 and slots.in_use == 0
+    assert crawl_batches.__name__ == "crawl_batches"
@@ -0,0 +1,63 @@
+import pytest
+
+from persistence import checkpoints
+from persistence.checkpoints import CheckpointStore
+
+TTL = 60.0
+
+
+@pytest.fixture
+def store(monkeypatch, clock, tmp_path):
+    monkeypatch.setattr(checkpoints, "time", clock)
+    s = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), ttl_seconds=TTL)
+    yield s
+    s.close()
+
+
+def test_save_load_roundtrip(store):
+    assert store.load("k") is None
+    state = {"collected": [{"id": "1"}, {"id": "2"}], "view_more_clicks": 3}
+    store.save("k", state)
+    assert store.load("k") == state
+
+    store.save("k", {"collected": [], "view_more_clicks": 0})
+    assert store.load("k") == {"collected": [], "view_more_clicks": 0}
+
+
+def test_state_survives_reopen(store, tmp_path):
+    store.save("trend_videos:7:url", {"view_more_clicks": 2})
+    other = CheckpointStore(store.path, ttl_seconds=TTL)
+    try:
+        assert other.load("trend_videos:7:url") == {"view_more_clicks": 2}
+    finally:
+        other.close()
+
+
+def test_expired_state_is_ignored_and_purged(store, clock):
+    store.save("old", {"n": 1})
+    clock.advance(TTL / 2)
+    store.save("new", {"n": 2})
+    clock.advance(TTL / 2 + 1)
+
+    assert store.load("old") is None
+    assert store.load("new") == {"n": 2}
+    assert store.purge_expired() == 1
+    assert store.load("new") == {"n": 2}
+
+
+def test_clear(store):
+    store.save("k", {"n": 1})
+    store.clear("k")
+    assert store.load("k") is None
+    store.clear("missing")
+
+
+def test_clear_consumed_keeps_longer_checkpoint(store):
+    # Crawl limit=50 xong không được xoá checkpoint 120 video của crawl limit=500
+    store.save("k", {"collected": list(range(120))})
+    assert store.clear_consumed("k", "collected", 50) is False
+    assert len(store.load("k")["collected"]) == 120
+
+    assert store.clear_consumed("k", "collected", 120) is True
+    assert store.load("k") is None
+    assert store.clear_consumed("k", "collected", 0) is True
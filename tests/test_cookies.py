@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+from net import cookies
+from net.cookies import CookieJar, DomainFilter, get_cookie_jar, load_cookie_jar
+
+EXPORT = [
+    {"name": "sessionid", "value": "s1", "domain": ".tiktok.com", "path": "/", "secure": True,
+     "httpOnly": True, "sameSite": "no_restriction", "expirationDate": 1500.7},
+    {"name": "tt_csrf", "value": "c", "domain": "www.tiktok.com", "path": "/api",
+     "sameSite": "lax", "session": True, "expirationDate": 1200},
+    {"name": "ads", "value": "a", "domain": "ads.tiktok.com", "path": "/", "expirationDate": 1100},
+    {"name": "other", "value": "x", "domain": ".eviltiktok.com", "path": "/"},
+    {"name": "sessionid", "value": "s2", "domain": ".tiktok.com", "path": "/", "secure": True,
+     "expirationDate": 1500},
+]
+
+
+@pytest.fixture
+def clock(monkeypatch, clock):
+    monkeypatch.setattr(cookies, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def export_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(cookies, "_file_cache", {})
+    path = tmp_path / "cookies.json"
+    path.write_text(json.dumps(EXPORT), encoding="utf-8")
+    return path
+
+
+def test_domain_filter_matches_subdomains_only():
+    keep = DomainFilter([".TikTok.com", "example.org"])
+    assert keep("tiktok.com") and keep(".www.tiktok.com") and keep("ads.tiktok.com")
+    assert keep("example.org")
+    assert not keep("eviltiktok.com")
+    assert not keep("tiktok.com.evil.net")
+    assert not keep("com")
+
+
+def test_from_export_converts_and_dedupes():
+    jar = CookieJar.from_export(EXPORT, ["tiktok.com"])
+    assert [(c["name"], c["value"]) for c in jar] == [("tt_csrf", "c"), ("ads", "a"), ("sessionid", "s2")]
+    by_name = {c["name"]: c for c in jar}
+    assert by_name["sessionid"]["expires"] == 1500
+    assert by_name["tt_csrf"]["sameSite"] == "Lax" and "expires" not in by_name["tt_csrf"]
+    assert by_name["tt_csrf"]["path"] == "/api"
+
+    everything = CookieJar.from_export(EXPORT)
+    assert len(everything) == 4
+    assert {c["name"] for c in everything.filter(["eviltiktok.com"])} == {"other"}
+
+
+def test_playwright_cookies_drop_expired():
+    jar = CookieJar.from_export(EXPORT, ["tiktok.com"])
+    assert {c["name"] for c in jar.playwright_cookies(now=1000)} == {"tt_csrf", "ads", "sessionid"}
+    assert {c["name"] for c in jar.playwright_cookies(now=1100)} == {"tt_csrf", "sessionid"}
+
+
+def test_header_for_matches_domain_path_scheme_and_expiry(clock):
+    jar = CookieJar.from_export(EXPORT, ["tiktok.com"])
+    assert jar.header_for("https://www.tiktok.com/api/comment/list/") == "tt_csrf=c; sessionid=s2"
+    assert jar.header_for("https://www.tiktok.com/apiary") == "sessionid=s2"
+    assert jar.header_for("http://www.tiktok.com/api/x") == "tt_csrf=c"
+    assert jar.header_for("https://ads.tiktok.com/") == "ads=a; sessionid=s2"
+    assert jar.request_headers("https://example.com/") == {}
+
+    # Header cache hết hạn cùng cookie sớm nhất trong đó
+    clock.advance(100)
+    assert jar.header_for("https://ads.tiktok.com/") == "sessionid=s2"
+
+
+def test_header_cache_is_invalidated_by_add(clock):
+    jar = CookieJar.from_export(EXPORT, ["tiktok.com"])
+    assert jar.header_for("https://www.tiktok.com/") == "sessionid=s2"
+    jar.add({"name": "msToken", "value": "m", "domain": ".tiktok.com", "path": "/"})
+    assert jar.header_for("https://www.tiktok.com/") == "sessionid=s2; msToken=m"
+
+
+def test_load_cookie_jar_parses_once_per_file_version(export_file, monkeypatch):
+    parses = []
+    real_loads = json.loads
+    monkeypatch.setattr(cookies.json, "loads", lambda s: parses.append(1) or real_loads(s))
+
+    first = load_cookie_jar(export_file, ["tiktok.com"])
+    assert load_cookie_jar(str(export_file), [".tiktok.com"]) is first
+    assert len(parses) == 1
+
+    # Domain lọc khác -> mục cache riêng
+    assert len(load_cookie_jar(export_file)) == 4
+    assert len(parses) == 2
+
+    # Cùng kích thước, mtime đổi -> parse lại
+    st = os.stat(export_file)
+    export_file.write_text(json.dumps(EXPORT).replace('"s2"', '"s3"'), encoding="utf-8")
+    os.utime(export_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    again = load_cookie_jar(export_file, ["tiktok.com"])
+    assert again is not first
+    assert {c["name"]: c["value"] for c in again}["sessionid"] == "s3"
+    assert len(parses) == 3
+
+
+def test_get_cookie_jar_from_env(export_file, monkeypatch):
+    monkeypatch.setattr(cookies, "COOKIES_FILE", "")
+    assert get_cookie_jar() is None
+
+    monkeypatch.setattr(cookies, "COOKIES_FILE", str(export_file))
+    assert {c["domain"] for c in get_cookie_jar()} == {".tiktok.com", "www.tiktok.com", "ads.tiktok.com"}
+
+    export_file.write_text("{hỏng", encoding="utf-8")
+    os.utime(export_file, ns=(0, 1))
+    assert get_cookie_jar() is None
+    monkeypatch.setattr(cookies, "COOKIES_FILE", str(export_file.with_name("missing.json")))
+    assert get_cookie_jar() is None
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+from analysis_tiktok_trend import cpu_pool
+from analysis_tiktok_trend.cpu_pool import get_cpu_pool, run_cpu_bound, shutdown_cpu_pool
+from observability import metrics
+
+
+def test_without_pool_runs_in_thread(monkeypatch):
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 0)
+    assert get_cpu_pool() is None
+    main_thread = threading.get_ident()
+    ident = asyncio.run(run_cpu_bound(threading.get_ident))
+    assert ident != main_thread
+
+
+def test_process_pool_runs_pickled_calls(monkeypatch):
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 2)
+    monkeypatch.setattr(cpu_pool, "_pool", None)
+    monkeypatch.setattr(metrics, "_pools", {})
+
+    async def scenario():
+        return await asyncio.gather(*(run_cpu_bound(pow, i, 2) for i in range(4)))
+
+    try:
+        assert asyncio.run(scenario()) == [0, 1, 4, 9]
+        pool = get_cpu_pool()
+        assert pool is not None and get_cpu_pool() is pool
+        assert metrics._pools["cpu_pool"]() == (0, 2)
+    finally:
+        shutdown_cpu_pool()
+    assert cpu_pool._pool is None
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import pytest
+
+from net import deadline as deadline_mod
+from net.deadline import ClientDisconnected, Deadline, DeadlineExceeded, run_with_deadline
+
+
+@pytest.fixture
+def clock(monkeypatch, clock):
+    monkeypatch.setattr(deadline_mod, "time", clock)
+    return clock
+
+
+def test_deadline_expiry_and_timeouts(clock):
+    d = Deadline(10)
+    assert d.remaining() == 10 and not d.done()
+    assert d.timeout() == 10 and d.timeout(3) == 3
+    assert d.timeout_ms(30_000) == 10_000
+
+    clock.advance(10)
+    assert d.expired() and d.done()
+    assert d.timeout(3) == 0 and d.timeout_ms(5000) == 1.0
+    with pytest.raises(DeadlineExceeded):
+        d.check()
+
+
+def test_unbounded_deadline_can_still_be_cancelled(clock):
+    d = Deadline(None)
+    clock.advance(10 ** 6)
+    assert d.remaining() is None and not d.done()
+    assert d.timeout() is None and d.timeout(5) == 5
+    d.cancel()
+    assert d.cancelled and d.done()
+    with pytest.raises(DeadlineExceeded, match="huỷ"):
+        d.check()
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, 900), ("", 900), ("30", 30), ("2.5", 2.5), ("abc", 900), ("-1", 900), ("0", 900), ("5000", 900),
+])
+def test_from_header_is_capped_by_default(clock, header, expected):
+    assert Deadline.from_header(header, default=900).remaining() == expected
+
+
+def test_from_header_without_default_limit(clock):
+    assert Deadline.from_header("30", default=0).remaining() == 30
+    assert Deadline.from_header(None, default=0).remaining() is None
+
+
+# ---------- run_with_deadline ----------
+def _crawl_in_thread(d: Deadline, log: list):
+    """Crawler kiểu thread: kiểm tra done() giữa các vòng, dừng thì trả phần đã có."""
+    def crawl():
+        collected = []
+        while not d.done():
+            collected.append(len(collected))
+            time.sleep(0.01)
+        log.append("stopped")
+        return collected
+    return asyncio.to_thread(crawl)
+
+
+def test_returns_result_of_finished_work():
+    async def work():
+        return "ok"
+
+    assert asyncio.run(run_with_deadline(work(), Deadline(5))) == "ok"
+
+
+def test_crawler_stops_at_deadline_with_partial_result():
+    d = Deadline(0.1)
+    log = []
+    result = asyncio.run(run_with_deadline(_crawl_in_thread(d, log), d, grace=5))
+    assert log == ["stopped"] and len(result) > 0
+    assert not d.cancelled
+
+
+def test_client_disconnect_cancels_thread_and_task():
+    async def scenario():
+        d = Deadline(None)
+        log = []
+        gone = asyncio.Event()
+        cleaned = asyncio.Event()
+
+        async def work():
+            try:
+                return await _crawl_in_thread(d, log)
+            finally:
+                cleaned.set()
+
+        asyncio.get_running_loop().call_later(0.05, gone.set)
+        with pytest.raises(ClientDisconnected):
+            await run_with_deadline(work(), d, disconnected=gone.wait())
+        assert d.cancelled
+        assert cleaned.is_set()
+        # Thread không huỷ được bằng task.cancel(): nó tự dừng nhờ deadline.cancel()
+        for _ in range(100):
+            if log:
+                break
+            await asyncio.sleep(0.01)
+        return log
+
+    assert asyncio.run(scenario()) == ["stopped"]
+
+
+def test_stuck_work_is_cancelled_after_grace():
+    async def scenario():
+        d = Deadline(0.05)
+        cleaned = []
+
+        async def stuck():
+            try:
+                await asyncio.Event().wait()   # không kiểm tra deadline
+            finally:
+                await asyncio.sleep(0)         # dọn dẹp bất đồng bộ (đóng trình duyệt)
+                cleaned.append(True)
+
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await run_with_deadline(stuck(), d, grace=0.05)
+        assert cleaned == [True]
+        assert d.cancelled
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 2
+
+
+def test_work_error_propagates_and_watcher_is_cancelled():
+    async def scenario():
+        watcher_cancelled = asyncio.Event()
+
+        async def watch():
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                watcher_cancelled.set()
+                raise
+
+        async def broken():
+            raise KeyError("parse")
+
+        with pytest.raises(KeyError):
+            await run_with_deadline(broken(), Deadline(5), disconnected=watch())
+        await asyncio.sleep(0)
+        return watcher_cancelled.is_set()
+
+    assert asyncio.run(scenario())
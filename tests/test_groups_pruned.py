@@ -0,0 +1,74 @@
+import random
+
+import pandas as pd
+import pytest
+
+from analysis_tiktok_trend.encoding import EncodedCorpus
+from analysis_tiktok_trend.groups_pruned import compute_groups_sync, prune_groups
+
+WORDS = "xin chào các bạn hôm nay mình review son môi mới like follow kênh video".split()
+
+
+def string_groups(df_text: pd.DataFrame, nmin: int, nmax: int, min_id_count: int) -> pd.DataFrame:
+    """Cách nhóm cũ (n-gram dạng chuỗi, explode + groupby) làm mốc so sánh."""
+    rows = []
+    for id_, text in df_text['text'].items():
+        toks = text.split()
+        for n in range(nmin, nmax + 1):
+            for gram in {" ".join(toks[i:i + n]) for i in range(len(toks) - n + 1)}:
+                rows.append((id_, n, gram))
+    exploded = pd.DataFrame(rows, columns=['id', 'n', 'ngram'])
+    dups = (
+        exploded.groupby(['n', 'ngram'])['id']
+        .agg(lambda s: sorted(set(s)))
+        .reset_index()
+        .rename(columns={'id': 'ids'})
+    )
+    return prune_groups(dups, min_id_count)
+
+
+def random_corpus(seed: int, n_docs: int, vocab: int) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    words = WORDS[:vocab]
+    phrases = [[rnd.choice(words) for _ in range(rnd.randint(3, 8))] for _ in range(6)]
+    texts = []
+    for _ in range(n_docs):
+        toks = [rnd.choice(words) for _ in range(rnd.randint(0, 25))]
+        for _ in range(rnd.randint(0, 2)):
+            at = rnd.randint(0, len(toks))
+            toks[at:at] = rnd.choice(phrases)
+        texts.append(" ".join(toks))
+    return pd.DataFrame({'text': texts}, index=pd.Index([f"v{i:03d}" for i in range(n_docs)], name='id'))
+
+
+@pytest.mark.parametrize("seed,n_docs,vocab,nmin,nmax,min_id_count", [
+    (0, 30, 6, 2, 5, 2),
+    (1, 60, 15, 2, 8, 2),
+    (2, 60, 15, 3, 6, 3),
+    (3, 25, 4, 1, 4, 2),
+    (4, 40, 10, 2, 2, 4),
+])
+def test_encoded_grouping_matches_string_grouping(seed, n_docs, vocab, nmin, nmax, min_id_count):
+    df_text = random_corpus(seed, n_docs, vocab)
+    got = compute_groups_sync(df_text, nmin, nmax, min_id_count)
+    expected = string_groups(df_text, nmin, nmax, min_id_count)
+    assert len(expected) > 0
+    assert got.to_dict("records") == expected.to_dict("records")
+
+
+def test_no_shared_ngrams_gives_empty_frame():
+    df_text = pd.DataFrame({'text': ["a b c", "d e f", ""]}, index=["x", "y", "z"])
+    got = compute_groups_sync(df_text, 2, 3, 2)
+    assert got.empty and list(got.columns) == ['n', 'ids', 'id_count', 'ngram_count', 'ngrams']
+
+
+def test_ngram_table_stays_inside_documents():
+    corpus = EncodedCorpus.from_texts(["a", "b"], ["x y x y", "y z"])
+    table = corpus.ngram_table(2, 3)
+    grams = {(corpus.ids[d], n, corpus.gram_text(d, p, n))
+             for d, n, p in zip(table['doc'], table['n'], table['pos'])}
+    # "y y" (vắt qua ranh giới văn bản) không xuất hiện; "x y" chỉ một lần (distinct)
+    assert grams == {("a", 2, "x y"), ("a", 2, "y x"), ("a", 3, "x y x"), ("a", 3, "y x y"),
+                     ("b", 2, "y z")}
+    assert len(table) == len(grams)
+    assert len(corpus.ngram_table(2, 3, distinct=False)) == 6
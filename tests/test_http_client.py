@@ -0,0 +1,75 @@
+import pytest
+
+from benchmarks.fixtures import CommentFixture
+from benchmarks.server import StandInServer
+from net import http_client
+from net.cookies import CookieJar
+from net.http_client import close_http_client, get_http_client
+from net.proxy_pool import ProxyPool
+from net.rate_limit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(http_client, "_proxy_clients", {})
+    monkeypatch.setattr(http_client.atexit, "register", lambda fn: None)
+    yield
+    close_http_client()
+
+
+def test_one_client_per_process_and_per_proxy():
+    client = get_http_client()
+    assert get_http_client() is client
+    proxied = get_http_client("http://127.0.0.1:3128")
+    assert proxied is not client
+    assert get_http_client("http://127.0.0.1:3128") is proxied
+    assert get_http_client("http://127.0.0.1:3129") is not proxied
+
+    close_http_client()
+    assert http_client._client is None and http_client._proxy_clients == {}
+    assert get_http_client() is not client
+
+
+def test_accept_encoding_only_lists_available_codecs(monkeypatch):
+    monkeypatch.setattr(http_client, "COMPRESSION", False)
+    assert http_client._accept_encoding() == "identity"
+    monkeypatch.setattr(http_client, "COMPRESSION", True)
+    codecs = http_client._accept_encoding().split(", ")
+    assert codecs[:2] == ["gzip", "deflate"]
+    assert len(codecs) == len(set(codecs))
+
+
+def test_falls_back_to_requests_session(monkeypatch):
+    def no_httpx(proxy=None):
+        raise ImportError("httpx")
+
+    monkeypatch.setattr(http_client, "_build_httpx", no_httpx)
+    client = get_http_client("http://127.0.0.1:3128")
+    assert isinstance(client, http_client._RequestsClient)
+    assert client.session.proxies == {"http": "http://127.0.0.1:3128", "https": "http://127.0.0.1:3128"}
+
+
+def test_comment_crawls_reuse_one_keep_alive_connection():
+    pytest.importorskip("click")  # tiktok.tiktok_comment_scrapper import CLI khi nạp package
+    from tiktok.tiktok_comment_scrapper.tiktokcomment import TiktokComment
+
+    fixture = CommentFixture(n_comments=120, reply_ratio=0.2, max_replies=70)
+    with StandInServer(comments=fixture) as server:
+        class StandInComment(TiktokComment):
+            API_URL = server.url("/api")
+
+        limiter = RateLimiter(rate=1e6, max_rate=1e6, burst=1e6)
+        totals = []
+        for _ in range(2):
+            data = StandInComment(limiter=limiter, cookies=CookieJar(),
+                                  proxies=ProxyPool([])).get_all_comments(fixture.aweme_id)
+            totals.append(sum(1 + len(c.replies) for c in data.comments))
+
+        pool = get_http_client()._transport._pool
+        requests = sum(server.hits.values())
+
+    assert totals[0] == totals[1] > len(fixture.comments)
+    assert requests > 10
+    # Mọi request của cả hai lần crawl đi qua cùng một kết nối keep-alive
+    assert len(pool.connections) == 1
@@ -0,0 +1,152 @@
+import pytest
+
+from jobs import store as job_store
+from jobs.store import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore
+
+LEASE = 30.0
+
+
+@pytest.fixture
+def store(monkeypatch, clock, tmp_path):
+    monkeypatch.setattr(job_store, "time", clock)
+    s = JobStore(str(tmp_path / "jobs.sqlite3"), lease_seconds=LEASE)
+    yield s
+    s.close()
+
+
+def test_claim_by_priority_then_age(store, clock):
+    low = store.submit("crawl", {"n": 1})
+    clock.advance(1)
+    high = store.submit("crawl", {"n": 2}, priority=5)
+    clock.advance(1)
+    low_later = store.submit("crawl", {"n": 3})
+
+    claimed = [store.claim("w1")["id"] for _ in range(3)]
+    assert claimed == [high, low, low_later]
+    assert store.claim("w1") is None
+
+
+def test_claim_marks_running(store):
+    job_id = store.submit("crawl", {"url": "u"})
+    job = store.claim("w1")
+
+    assert job["id"] == job_id
+    assert job["status"] == RUNNING
+    assert job["worker"] == "w1"
+    assert job["attempts"] == 1
+    assert job["params"] == {"url": "u"}
+    assert store.get(job_id)["status"] == RUNNING
+
+
+def test_claim_filters_kinds(store):
+    store.submit("crawl", {})
+    grouping = store.submit("prunned_groups", {})
+
+    assert store.claim("w1", kinds=["prunned_groups"])["id"] == grouping
+    assert store.claim("w1", kinds=["prunned_groups"]) is None
+    assert store.claim("w1", kinds=["crawl", "other"])["kind"] == "crawl"
+
+
+def test_claimed_job_is_not_claimed_twice(store, tmp_path):
+    store.submit("crawl", {})
+    other = JobStore(store.path, lease_seconds=LEASE)
+    try:
+        assert store.claim("w1") is not None
+        assert other.claim("w2") is None
+    finally:
+        other.close()
+
+
+def test_heartbeat_updates_progress_and_reports_cancel(store, clock):
+    job_id = store.submit("crawl", {})
+    store.claim("w1")
+    clock.advance(5)
+
+    assert store.heartbeat(job_id, {"collected": 10}) == RUNNING
+    job = store.get(job_id)
+    assert job["progress"] == {"collected": 10}
+    assert job["heartbeat_at"] == clock.now
+
+    assert store.heartbeat(job_id) == RUNNING
+    assert store.get(job_id)["progress"] == {"collected": 10}
+
+    assert store.cancel(job_id) is True
+    assert store.heartbeat(job_id, {"collected": 20}) == CANCELLED
+    assert store.get(job_id)["progress"] == {"collected": 10}
+    assert store.heartbeat("missing") == CANCELLED
+
+
+def test_requeue_stale_only_expired_leases(store, clock):
+    stale = store.submit("crawl", {}, max_attempts=2)
+    alive = store.submit("crawl", {})
+    store.claim("w1")
+    store.claim("w2")
+
+    clock.advance(LEASE - 1)
+    store.heartbeat(alive)
+    clock.advance(2)
+
+    assert store.requeue_stale() == 1
+    job = store.get(stale)
+    assert job["status"] == QUEUED
+    assert job["worker"] is None
+    assert store.get(alive)["status"] == RUNNING
+
+    again = store.claim("w3")
+    assert again["id"] == stale
+    assert again["attempts"] == 2
+
+
+def test_fail_requeues_until_attempts_exhausted(store):
+    job_id = store.submit("crawl", {}, max_attempts=2)
+    store.claim("w1")
+    assert store.fail(job_id, "boom") == QUEUED
+    assert store.get(job_id)["error"] == "boom"
+
+    store.claim("w1")
+    assert store.fail(job_id, "boom again") == FAILED
+    assert store.get(job_id)["finished_at"] is not None
+
+    assert store.retry(job_id) is True
+    assert store.claim("w1")["attempts"] == 3
+
+
+def test_release_does_not_count_attempt(store):
+    job_id = store.submit("crawl", {})
+    store.claim("w1")
+    store.release(job_id)
+
+    job = store.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["attempts"] == 0
+
+
+def test_complete_stores_result(store, clock):
+    job_id = store.submit("crawl", {})
+    store.claim("w1")
+    store.complete(job_id, [{"id": 1}])
+
+    job = store.get(job_id, with_result=True)
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == [{"id": 1}]
+    assert store.get(job_id, raw_result=True)["result"] == '[{"id": 1}]'
+
+    clock.advance(100)
+    assert store.purge(50) == 1
+    assert store.get(job_id) is None
+
+
+def test_job_that_keeps_losing_its_worker_fails(store, clock):
+    job_id = store.submit("crawl", {}, max_attempts=2)
+    for attempt in (1, 2):
+        job = store.claim("w1")
+        assert job["id"] == job_id
+        assert job["attempts"] == attempt
+        clock.advance(LEASE + 1)
+        store.requeue_stale()
+
+    job = store.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"]
+    assert job["finished_at"] == clock.now
+    assert store.claim("w1") is None
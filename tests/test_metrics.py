@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from observability import metrics
+from observability.metrics import Stopwatch, instrument_crawl, register_pool, render_metrics, stage_timer
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_timer_and_stopwatch_observe_stages():
+    before = sample("crawler_stage_duration_seconds_count", crawler="t_stage", stage="fetch")
+    with stage_timer("t_stage", "fetch"):
+        pass
+    with pytest.raises(KeyError):
+        with stage_timer("t_stage", "fetch"):
+            raise KeyError("lỗi vẫn được đo")
+    assert sample("crawler_stage_duration_seconds_count", crawler="t_stage", stage="fetch") == before + 2
+
+    sw = Stopwatch("t_stage")
+    assert sw.lap("launch") >= 0
+    sw.reset()
+    sw.lap("navigation")
+    sw.lap("navigation")
+    assert sample("crawler_stage_duration_seconds_count", crawler="t_stage", stage="launch") == 1
+    assert sample("crawler_stage_duration_seconds_count", crawler="t_stage", stage="navigation") == 2
+
+
+def test_instrument_sync_and_async_crawls():
+    @instrument_crawl("t_sync")
+    def crawl(n):
+        if n < 0:
+            raise ValueError("n")
+        return list(range(n))
+
+    @instrument_crawl("t_async")
+    async def transcript(text):
+        return text
+
+    assert crawl(3) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        crawl(-1)
+    assert asyncio.run(transcript("xin chào")) == "xin chào"
+    asyncio.run(transcript(""))
+
+    assert sample("crawler_runs_total", crawler="t_sync", outcome="ok") == 1
+    assert sample("crawler_runs_total", crawler="t_sync", outcome="error") == 1
+    assert sample("crawler_items_total", crawler="t_sync") == 3
+    assert sample("crawler_stage_duration_seconds_count", crawler="t_sync", stage="total") == 2
+    assert sample("crawler_items_total", crawler="t_async") == 1
+    assert sample("crawler_runs_total", crawler="t_async", outcome="ok") == 2
+    assert crawl.__name__ == "crawl"
+
+
+def test_instrument_async_generator_counts_batches_and_early_stop():
+    closed = []
+
+    @instrument_crawl("t_stream")
+    async def stream(fail=False):
+        try:
+            for i in range(5):
+                if fail and i == 2:
+                    raise RuntimeError("crash")
+                yield [i, i]
+        finally:
+            closed.append(True)
+
+    async def scenario():
+        assert [b async for b in stream()] == [[i, i] for i in range(5)]
+        gen = stream()
+        await gen.__anext__()
+        await gen.aclose()            # bên gọi đã đủ item
+        with pytest.raises(RuntimeError):
+            async for _ in stream(fail=True):
+                pass
+
+    asyncio.run(scenario())
+    assert closed == [True] * 3
+    assert sample("crawler_runs_total", crawler="t_stream", outcome="ok") == 2
+    assert sample("crawler_runs_total", crawler="t_stream", outcome="error") == 1
+    assert sample("crawler_items_total", crawler="t_stream") == 10 + 2 + 4
+    assert sample("crawler_items_per_second", crawler="t_stream") > 0
+
+
+def test_render_metrics_includes_pools_and_skips_broken_probes(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    monkeypatch.setattr(metrics, "_pools", {})
+    register_pool("t_pool", lambda: (2, 8))
+    register_pool("t_idle", lambda: None)
+    register_pool("t_broken", lambda: 1 / 0)
+    body, content_type = render_metrics()
+    text = body.decode()
+    assert content_type.startswith("text/plain")
+    assert 'pool_in_use{pool="t_pool"} 2.0' in text
+    assert 'pool_size{pool="t_pool"} 8.0' in text
+    assert 't_idle' not in text and 't_broken' not in text
+
+
+def test_http_middleware_labels_by_route_template():
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    route = "/utils/get_prunned_groups"
+    before = sample("http_request_duration_seconds_count", method="POST", route=route, status="200")
+    r = client.post(route, json={"ids": [1, 2], "transcripts": ["xin chào các bạn", "xin chào các bạn nhé"]})
+    assert r.status_code == 200
+    client.get("/profiles/khong-co.json")
+    client.get("/khong-co-route")
+
+    text = client.get("/metrics").text
+    assert sample("http_request_duration_seconds_count", method="POST", route=route, status="200") == before + 1
+    assert sample("http_requests_in_progress", method="POST", route=route) == 0
+    assert 'route="/profiles/{name}"' in text
+    assert 'route="unmatched"' in text
+    assert 'route="/metrics"' not in text
@@ -0,0 +1,92 @@
+import asyncio
+import dataclasses
+import json
+
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api.responses import NDJSON_MEDIA_TYPE, ndjson_batches
+
+
+@dataclasses.dataclass
+class Item:
+    video_id: str
+    ranking: int
+
+
+def _source(batches, log, fail_after=None):
+    async def gen():
+        try:
+            for i, batch in enumerate(batches):
+                if fail_after is not None and i == fail_after:
+                    raise RuntimeError("trình duyệt đóng bất ngờ")
+                yield batch
+        finally:
+            log.append("closed")
+    return gen()
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_each_batch_is_one_chunk_of_lines():
+    log, done = [], []
+
+    async def on_done(items):
+        done.append(items)
+
+    batches = [[{"title": "Việt Nam", "ranking": 1}, Item("v2", 2)], [], [{"ranking": 3}]]
+    chunks = asyncio.run(_collect(ndjson_batches(_source(batches, log), on_done)))
+
+    assert len(chunks) == 3 and chunks[1] == b""
+    assert chunks[0].count(b"\n") == 2 and chunks[0].endswith(b"\n")
+    assert "Việt Nam".encode("utf-8") in chunks[0]
+    lines = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert lines == [{"title": "Việt Nam", "ranking": 1}, {"video_id": "v2", "ranking": 2}, {"ranking": 3}]
+    assert done == [[batches[0][0], batches[0][1], batches[2][0]]]
+    assert log == ["closed"]
+
+
+def test_error_mid_stream_becomes_last_line():
+    log, done = [], []
+
+    async def on_done(items):
+        done.append(items)
+
+    chunks = asyncio.run(_collect(ndjson_batches(_source([[{"a": 1}], [{"a": 2}]], log, fail_after=1), on_done)))
+    assert [json.loads(c) for c in chunks] == [{"a": 1}, {"error": "trình duyệt đóng bất ngờ"}]
+    assert done == [] and log == ["closed"]
+
+
+def test_consumer_closing_early_closes_source():
+    log, done = [], []
+
+    async def on_done(items):
+        done.append(items)
+
+    async def scenario():
+        stream = ndjson_batches(_source([[{"a": 1}], [{"a": 2}], [{"a": 3}]], log), on_done)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == b'{"a":1}\n'
+    assert log == ["closed"] and done == []
+
+
+def test_streaming_response_framing():
+    async def endpoint(request):
+        async def batches():
+            for i in range(3):
+                yield [{"ranking": i * 2 + j, "title": f"bài {i}"} for j in range(2)]
+        return StreamingResponse(ndjson_batches(batches()), media_type=NDJSON_MEDIA_TYPE)
+
+    client = TestClient(Starlette(routes=[Route("/stream", endpoint)]))
+    with client.stream("GET", "/stream") as r:
+        assert r.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+        rows = [json.loads(line) for line in r.iter_lines() if line]
+    assert [row["ranking"] for row in rows] == list(range(6))
+    assert rows[-1]["title"] == "bài 2"
@@ -0,0 +1,105 @@
+import asyncio
+import random
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from analysis_tiktok_trend.encoding import EncodedCorpus
+from analysis_tiktok_trend.near_duplicates import (
+    cluster_near_duplicates, cluster_near_duplicates_sync, lsh_clusters,
+    min_pairwise_similarity, minhash_signatures, optimal_bands,
+)
+
+WORDS = [f"từ{i}" for i in range(400)]
+
+
+def _text(rnd: random.Random, n: int = 60) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+
+def _edit(rnd: random.Random, text: str, changes: int) -> str:
+    toks = text.split()
+    for i in rnd.sample(range(len(toks)), changes):
+        toks[i] = rnd.choice(WORDS)
+    return " ".join(toks)
+
+
+def _jaccard(a: str, b: str, k: int = 3) -> float:
+    def shingles(t):
+        toks = t.split()
+        return {tuple(toks[i:i + k]) for i in range(len(toks) - k + 1)}
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+@pytest.mark.parametrize("num_perm,threshold", [(128, 0.8), (128, 0.5), (64, 0.9)])
+def test_optimal_bands_factorizes_num_perm(num_perm, threshold):
+    bands, rows = optimal_bands(num_perm, threshold)
+    assert bands * rows == num_perm
+    assert abs((1 / bands) ** (1 / rows) - threshold) < 0.15
+
+
+def test_minhash_estimates_jaccard():
+    rnd = random.Random(0)
+    base = _text(rnd, 200)
+    texts = [base, _edit(rnd, base, 5), _edit(rnd, base, 40), _text(rnd, 200)]
+    corpus = EncodedCorpus.from_texts(range(len(texts)), texts)
+    sig = minhash_signatures(corpus, k=3, num_perm=256)
+    for j in range(1, len(texts)):
+        estimate = np.count_nonzero(sig[0] == sig[j]) / 256
+        assert estimate == pytest.approx(_jaccard(texts[0], texts[j]), abs=0.1)
+
+
+def test_clusters_near_duplicates_only():
+    rnd = random.Random(1)
+    a, b = _text(rnd), _text(rnd)
+    texts = {
+        "a1": a, "a2": _edit(rnd, a, 1), "a3": a,
+        "b1": b, "b2": _edit(rnd, b, 1),
+        "lẻ": _text(rnd),
+        "rỗng": "",
+        "rỗng2": "",
+    }
+    clusters = cluster_near_duplicates_sync(list(texts), list(texts.values()), threshold=0.7)
+    assert [c["ids"] for c in clusters] == [["a1", "a2", "a3"], ["b1", "b2"]]
+    assert [c["id_count"] for c in clusters] == [3, 2]
+
+
+def test_min_similarity_is_the_pairwise_minimum():
+    # Chuỗi a -> b -> c: mỗi bước gần trùng, hai đầu chuỗi xa nhau hơn
+    rnd = random.Random(2)
+    a = _text(rnd, 120)
+    b = _edit(rnd, a, 4)
+    c = _edit(rnd, b, 4)
+    corpus = EncodedCorpus.from_texts(["a", "b", "c"], [a, b, c])
+    sig = minhash_signatures(corpus)
+    pairs = {(i, j): np.count_nonzero(sig[i] == sig[j]) / sig.shape[1]
+             for i, j in combinations(range(3), 2)}
+    assert min_pairwise_similarity(sig, [0, 1, 2]) == min(pairs.values())
+    assert min_pairwise_similarity(sig, [1, 0]) == pairs[(0, 1)]
+
+    clusters = cluster_near_duplicates_sync(["a", "b", "c"], [a, b, c], threshold=0.5)
+    assert clusters[0]["min_similarity"] == round(min(pairs.values()), 4)
+
+
+def test_lsh_skips_empty_documents():
+    corpus = EncodedCorpus.from_texts(range(3), ["", "", "x y z"])
+    sig = minhash_signatures(corpus)
+    empty = np.diff(corpus.offsets) == 0
+    assert lsh_clusters(sig, empty, 0.8) == []
+
+
+def test_async_entrypoint_merges_duplicate_ids_and_validates():
+    rnd = random.Random(3)
+    toks = _text(rnd).split()
+    head, tail = " ".join(toks[:30]), " ".join(toks[30:])
+    # Hai đoạn của id 1 được ghép bằng dấu cách -> trùng hẳn với văn bản của "x"
+    clusters = asyncio.run(cluster_near_duplicates(
+        [1, 1, "x"], [head, tail, " ".join(toks)], threshold=0.9))
+    assert clusters == [{"ids": [1, "x"], "id_count": 2, "min_similarity": 1.0}]
+
+    with pytest.raises(ValueError):
+        asyncio.run(cluster_near_duplicates([1], ["a", "b"]))
+    with pytest.raises(ValueError):
+        asyncio.run(cluster_near_duplicates([1], ["a"], threshold=0))
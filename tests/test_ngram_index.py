@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+from analysis_tiktok_trend import ngram_index
+from analysis_tiktok_trend.groups_pruned import compute_groups_sync, id_sort_key, merge_texts_by_id
+from analysis_tiktok_trend.ngram_index import NgramIndex
+from analysis_tiktok_trend.text_normalize import normalize_text
+
+NMIN, NMAX = 2, 6
+
+TRANSCRIPTS = {
+    "v1": "Xin chào các bạn, hôm nay mình review son môi mới nhé!",
+    "v2": "xin chào các bạn hôm nay mình review kem chống nắng",
+    "v3": "Hôm nay mình review son môi mới, các bạn xem hết video nhé",
+    "v4": "Đừng quên like và follow kênh để xem video mới nhé",
+    "v5": "nhớ like và follow kênh để xem video mới nhất",
+    "v6": "Một transcript không trùng với ai cả",
+    7: "xin chào các bạn, đừng quên like và follow kênh",
+    8: "son môi mới giá rẻ, xem hết video nhé",
+}
+
+
+def expected_groups(transcripts, min_id_count=2, top_k=None):
+    """Kết quả của compute_groups_sync trên cùng dữ liệu, như group_ngrams_from_lists."""
+    merged = merge_texts_by_id(transcripts.keys(), transcripts.values())
+    keys = sorted(merged, key=id_sort_key)
+    df_text = pd.DataFrame(
+        {"text": normalize_text.normalize_many(" ".join(merged[k]) for k in keys)},
+        index=pd.Index(keys, name="id"),
+    )
+    return compute_groups_sync(df_text, NMIN, NMAX, min_id_count, top_k).to_dict("records")
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = NgramIndex(str(tmp_path / "ngram.sqlite3"), nmin=NMIN, nmax=NMAX)
+    idx.add(list(TRANSCRIPTS), list(TRANSCRIPTS.values()))
+    yield idx
+    idx.close()
+
+
+@pytest.mark.parametrize("min_id_count", [2, 3])
+def test_groups_match_compute_groups_sync(index, min_id_count):
+    got = index.groups(min_id_count=min_id_count).to_dict("records")
+    assert got == expected_groups(TRANSCRIPTS, min_id_count)
+
+
+def test_groups_with_mixed_type_ids(index):
+    groups = index.groups().to_dict("records")
+    assert [g["ids"] for g in groups] == [["v1", "v2"], ["v4", "v5"], [8, "v3"]]
+    assert groups[2]["ngrams"] == ["xem hết video nhé"]
+
+
+def test_top_k_matches_compute_groups_sync(index):
+    assert index.groups(top_k=2).to_dict("records") == expected_groups(TRANSCRIPTS, top_k=2)
+
+
+def test_remove_and_replace_match_rebuild(index):
+    index.remove(["v4", 7])
+    index.add(["v1"], ["like và follow kênh để xem video mới nhé"])
+
+    current = {k: v for k, v in TRANSCRIPTS.items() if k not in ("v4", 7)}
+    current["v1"] = "like và follow kênh để xem video mới nhé"
+    assert index.groups().to_dict("records") == expected_groups(current)
+
+
+def test_many_documents_need_chunked_lookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(ngram_index, "_IN_CHUNK", 3)
+    transcripts = {i: f"mở đầu {i // 2} giống nhau đoạn {i // 2} kết thúc" for i in range(20)}
+    idx = NgramIndex(str(tmp_path / "ngram.sqlite3"), nmin=NMIN, nmax=NMAX)
+    try:
+        idx.add(list(transcripts), list(transcripts.values()))
+        got = idx.groups().to_dict("records")
+    finally:
+        idx.close()
+    assert len(got) == 10
+    assert got == expected_groups(transcripts)
+
+
+def test_range_must_fit_index(index):
+    with pytest.raises(ValueError):
+        index.groups(nmin=1)
+    with pytest.raises(ValueError):
+        NgramIndex(index.path, nmin=NMIN, nmax=NMAX + 1)
+
+
+def test_concurrent_replace_does_not_break_render(index, monkeypatch):
+    # Một writer khác (process khác, cùng file) thay transcript giữa lúc đọc postings và đọc text
+    writer = NgramIndex(index.path)
+    prune = ngram_index.prune_groups
+
+    def prune_then_replace(dups, min_id_count):
+        writer.add(list(TRANSCRIPTS), ["khác hẳn"] * len(TRANSCRIPTS))
+        return prune(dups, min_id_count)
+
+    monkeypatch.setattr(ngram_index, "prune_groups", prune_then_replace)
+    try:
+        assert index.groups().to_dict("records") == expected_groups(TRANSCRIPTS)
+    finally:
+        writer.close()
+    monkeypatch.setattr(ngram_index, "prune_groups", prune)
+    replaced = dict.fromkeys(TRANSCRIPTS, "khác hẳn")
+    assert index.groups().to_dict("records") == expected_groups(replaced)
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from net.deadline import Deadline
+from pipeline import PipelineOptions
+from pipeline.trend import TrendPipeline
+
+
+def _videos(n):
+    return [{"video_id": f"v{i}", "url": f"https://www.tiktok.com/@a/video/{i}", "ranking": i + 1}
+            for i in range(n)]
+
+
+class FakePipeline(TrendPipeline):
+    """Pipeline với stage giả: crawl trả lô video có sẵn, transcript / comment tính tại chỗ."""
+
+    def __init__(self, videos, batch_size=2, **kwargs):
+        super().__init__(**kwargs)
+        self.source = videos
+        self.batch_size = batch_size
+        self.yielded = 0
+        self.source_closed = False
+        self.fetched = {"transcripts": [], "comments": []}
+        self.transcript_gate = None
+        self.fail = set()
+        self.crawl_error = None
+
+    async def stream_videos(self):
+        try:
+            for i in range(0, len(self.source), self.batch_size):
+                if self.deadline.done():
+                    return
+                if self.crawl_error is not None and i > 0:
+                    raise self.crawl_error
+                batch = self.source[i:i + self.batch_size]
+                self.yielded += len(batch)
+                yield batch
+                await asyncio.sleep(0)
+        finally:
+            self.source_closed = True
+
+    async def transcript(self, video):
+        self.fetched["transcripts"].append(video["video_id"])
+        if self.transcript_gate is not None:
+            await self.transcript_gate.wait()
+        if video["video_id"] in self.fail:
+            raise RuntimeError("không có phụ đề")
+        return f"xin chào các bạn video {video['video_id']} hôm nay"
+
+    async def comments(self, video):
+        self.fetched["comments"].append(video["video_id"])
+        await asyncio.sleep(0)
+        return [{"text": f"comment {video['video_id']}"}]
+
+    async def group(self, ids, transcripts):
+        return [{"ids": sorted(ids), "id_count": len(ids)}]
+
+
+def test_runs_all_stages_and_keeps_per_video_errors():
+    progress = []
+    p = FakePipeline(_videos(7), options=PipelineOptions(transcript_workers=3, comment_workers=2),
+                     on_progress=progress.append)
+    p.fail = {"v3"}
+    result = asyncio.run(p.run())
+
+    assert [v["video_id"] for v in result["videos"]] == [f"v{i}" for i in range(7)]
+    assert all(v["comments"] == [{"text": f"comment {v['video_id']}"}] for v in result["videos"])
+    assert "transcript" not in result["videos"][3]
+    assert result["videos"][0]["transcript"] == "xin chào các bạn video v0 hôm nay"
+    assert result["errors"] == {"transcripts": {"v3": "không có phụ đề"}}
+    assert result["groups"] == [{"ids": ["v0", "v1", "v2", "v4", "v5", "v6"], "id_count": 6}]
+    assert result["partial"] is False
+
+    final = result["progress"]
+    assert (final["stage"], final["videos"], final["transcripts"], final["comments"], final["failed"]) == \
+        ("done", 7, 7, 7, 1)
+    assert [s["stage"] for s in progress].index("fetching") < [s["stage"] for s in progress].index("grouping")
+    assert p.source_closed
+
+
+def test_bounded_queue_applies_backpressure_to_crawl():
+    async def scenario():
+        options = PipelineOptions(comments=False, group=False, transcript_workers=1, queue_size=2)
+        p = FakePipeline(_videos(20), batch_size=1, options=options)
+        p.transcript_gate = asyncio.Event()
+        run = asyncio.create_task(p.run())
+        for _ in range(50):
+            await asyncio.sleep(0)
+
+        # 1 video đang xử lý + 2 trong hàng đợi + 1 chờ put: crawl không chạy trước thêm
+        assert p.fetched["transcripts"] == ["v0"]
+        assert len(p.videos) == p.yielded == 4
+        assert p.progress["stage"] == "crawling"
+
+        p.transcript_gate.set()
+        result = await run
+        assert len(result["videos"]) == 20 and p.progress["transcripts"] == 20
+        return p
+
+    p = asyncio.run(scenario())
+    assert p.fetched["comments"] == []
+
+
+def test_fetching_overlaps_crawling():
+    async def scenario():
+        p = FakePipeline(_videos(10), batch_size=2, options=PipelineOptions(group=False))
+        seen_at_first_fetch = []
+        original = p.transcript
+
+        async def transcript(video):
+            if not seen_at_first_fetch:
+                seen_at_first_fetch.append(p.yielded)
+            return await original(video)
+
+        p.transcript = transcript
+        await p.run()
+        return seen_at_first_fetch[0]
+
+    assert asyncio.run(scenario()) < 10
+
+
+def test_cancel_drains_queues_and_skips_grouping():
+    async def scenario():
+        deadline = Deadline()
+        options = PipelineOptions(transcript_workers=1, comment_workers=1, queue_size=3)
+        p = FakePipeline(_videos(30), batch_size=1, options=options, deadline=deadline)
+        p.transcript_gate = asyncio.Event()
+        run = asyncio.create_task(p.run())
+        for _ in range(50):
+            await asyncio.sleep(0)
+
+        deadline.cancel()            # client ngắt kết nối
+        p.transcript_gate.set()
+        result = await asyncio.wait_for(run, 5)
+        return p, result
+
+    p, result = asyncio.run(scenario())
+    assert result["partial"] is True
+    assert result["groups"] == []
+    assert p.fetched["transcripts"] == ["v0"]
+    assert len(result["videos"]) < 30
+    assert p.source_closed
+
+
+def test_crawl_error_cancels_workers_and_is_raised():
+    async def scenario():
+        options = PipelineOptions(transcript_workers=2, comments=False)
+        p = FakePipeline(_videos(6), batch_size=2, options=options)
+        p.transcript_gate = asyncio.Event()   # worker kẹt: phải bị huỷ chứ không treo
+        p.crawl_error = ConnectionError("trình duyệt crash")
+        with pytest.raises(ConnectionError, match="crash"):
+            await asyncio.wait_for(p.run(), 5)
+        return p
+
+    p = asyncio.run(scenario())
+    assert p.source_closed
+    assert p.progress["stage"] == "crawling"
+
+
+def test_disabled_stages_are_not_run():
+    p = FakePipeline(_videos(3), options=PipelineOptions(transcripts=False, comments=False))
+    result = asyncio.run(p.run())
+    assert p.fetched == {"transcripts": [], "comments": []}
+    assert result["groups"] == [] and result["errors"] == {}
+    assert [v["video_id"] for v in result["videos"]] == ["v0", "v1", "v2"]
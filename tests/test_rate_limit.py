@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from net import rate_limit
+from net.rate_limit import (
+    CLOSED, ERROR, HALF_OPEN, OK, OPEN, THROTTLED,
+    BatchBackoff, CircuitOpen, HostLimiter, RateLimiter, RetryPolicy, TransientError,
+)
+
+COOLDOWN = 10.0
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+@pytest.fixture
+def limiter(monkeypatch, clock) -> HostLimiter:
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return HostLimiter("example.com", burst=100, failure_threshold=3, cooldown=COOLDOWN)
+
+
+@pytest.fixture
+def limiters(monkeypatch, clock) -> RateLimiter:
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return RateLimiter(burst=100, failure_threshold=3, cooldown=COOLDOWN)
+
+
+def _trip(limiter: HostLimiter) -> None:
+    for _ in range(limiter.failure_threshold):
+        limiter.acquire()
+        limiter.record(ERROR)
+
+
+def test_opens_after_consecutive_failures(limiter):
+    limiter.acquire()
+    limiter.record(ERROR)
+    limiter.acquire()
+    limiter.record(OK)  # thành công giữa chừng reset bộ đếm
+    assert limiter.state == CLOSED
+
+    _trip(limiter)
+    assert limiter.state == OPEN
+    with pytest.raises(CircuitOpen) as exc:
+        limiter.acquire()
+    assert exc.value.retry_after == pytest.approx(COOLDOWN)
+    assert limiter.metrics["rejected"] == 1
+
+
+def test_half_open_allows_single_probe(limiter, clock):
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+
+    assert limiter.acquire() is True
+    assert limiter.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        limiter.acquire()
+
+    limiter.record(OK)
+    assert limiter.state == CLOSED
+    assert limiter.acquire() is False
+
+
+def test_failed_probe_reopens_with_longer_cooldown(limiter, clock):
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+    assert limiter.acquire() is True
+    limiter.record(THROTTLED)
+
+    assert limiter.state == OPEN
+    clock.advance(COOLDOWN)
+    with pytest.raises(CircuitOpen):
+        limiter.acquire()
+    clock.advance(COOLDOWN)
+    assert limiter.acquire() is True
+
+
+def test_release_probe_lets_next_request_probe(limiter, clock):
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+    assert limiter.acquire() is True
+    limiter.release_probe()
+
+    assert limiter.state == HALF_OPEN
+    assert limiter.acquire() is True
+
+
+def test_abandoned_probe_expires_after_cooldown(limiter, clock):
+    # Crawler trình duyệt acquire() rồi dừng mà không record()/release_probe()
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+    assert limiter.acquire() is True
+
+    clock.advance(COOLDOWN / 2)
+    with pytest.raises(CircuitOpen) as exc:
+        limiter.acquire()
+    assert exc.value.retry_after == pytest.approx(COOLDOWN / 2)
+
+    clock.advance(COOLDOWN / 2)
+    assert limiter.acquire() is True
+    limiter.record(OK)
+    assert limiter.state == CLOSED
+
+
+def test_call_releases_probe_on_unrelated_error(limiters, clock):
+    limiter = limiters.for_host("https://example.com/a")
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+
+    def broken():
+        raise KeyError("parse")
+
+    with pytest.raises(KeyError):
+        limiters.call("https://example.com/b", broken, policy=NO_RETRY)
+    assert limiter.state == HALF_OPEN
+
+    assert limiters.call("https://example.com/c", lambda: "ok", policy=NO_RETRY) == "ok"
+    assert limiter.state == CLOSED
+
+
+def test_call_retries_transient_errors(limiters):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise TransientError("503")
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01)
+    assert limiters.call("https://example.com", flaky, policy=policy) == "ok"
+    limiter = limiters.for_host("example.com")
+    assert limiter.metrics["errors"] == 2
+    assert limiter.metrics["retries"] == 2
+    assert limiter.state == CLOSED
+
+
+def test_call_async_releases_probe_on_cancel(limiters, clock):
+    limiter = limiters.for_host("example.com")
+    _trip(limiter)
+    clock.advance(COOLDOWN)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(limiters.call_async("https://example.com", hang, policy=NO_RETRY))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def fine():
+            return "ok"
+
+        return await limiters.call_async("https://example.com", fine, policy=NO_RETRY)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert limiter.state == CLOSED
+
+
+def test_empty_batches_do_not_throttle_host(limiter):
+    # Hết danh sách (lô rỗng liên tiếp) là kết thúc bình thường của crawl
+    backoff = BatchBackoff(limiter, RetryPolicy(max_attempts=20, base_delay=0.01, max_delay=0.01))
+    rate = limiter.rate
+    for _ in range(limiter.failure_threshold * 3):
+        backoff.acquire()
+        assert backoff.empty() is not None
+
+    assert limiter.rate == rate
+    assert limiter.state == CLOSED
+    assert limiter.metrics["throttled"] == 0
+
+
+def test_batch_backoff_stops_after_max_attempts(limiter):
+    backoff = BatchBackoff(limiter, RetryPolicy(max_attempts=2, base_delay=0.01, max_delay=0.01))
+    assert backoff.empty() is not None
+    assert backoff.empty() is None
+    backoff.ok()
+    assert backoff.count == 0
+
+
+def test_batch_backoff_probe(limiter, clock):
+    _trip(limiter)
+    backoff = BatchBackoff(limiter)
+    with pytest.raises(CircuitOpen):
+        backoff.acquire()
+
+    clock.advance(COOLDOWN)
+    backoff.acquire()
+    backoff.empty()  # lô rỗng: trả lượt thăm dò, breaker vẫn half_open
+    assert limiter.state == HALF_OPEN
+    backoff.acquire()
+    backoff.ok()
+    assert limiter.state == CLOSED
@@ -0,0 +1,107 @@
+import dataclasses
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from api import responses
+from api.responses import FastJSONResponse, dumps, json_with_raw
+from jobs.store import JobStore
+
+
+@dataclasses.dataclass
+class Item:
+    video_id: str
+    ranking: int
+
+
+VALUE = {
+    "item": Item("v1", 1), "at": datetime(2026, 10, 19, tzinfo=timezone.utc),
+    "tags": {"a"}, "pair": (1, 2), "arr": np.arange(3), "n": np.int64(7), "f": np.float32(0.5),
+    "text": "Tiếng Việt",
+}
+EXPECTED = {
+    "item": {"video_id": "v1", "ranking": 1}, "at": "2026-10-19T00:00:00+00:00",
+    "tags": ["a"], "pair": [1, 2], "arr": [0, 1, 2], "n": 7, "f": 0.5, "text": "Tiếng Việt",
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_with_and_without_orjson(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(responses, "orjson", None)
+    out = dumps(VALUE)
+    assert b"\n" not in out and "Tiếng Việt".encode("utf-8") in out
+    assert json.loads(out) == EXPECTED
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
+
+
+def test_json_with_raw():
+    assert json.loads(json_with_raw({"a": 1}, "raw", '{"b":[1,2]}')) == {"a": 1, "raw": {"b": [1, 2]}}
+    assert json.loads(json_with_raw({}, "raw", None)) == {"raw": None}
+
+
+def test_fast_json_response_is_utf8_json():
+    r = FastJSONResponse([{"title": "Việt Nam", "ranking": np.int64(1)}], headers={"X-Partial": "1"})
+    assert r.media_type == "application/json"
+    assert r.body == '[{"title":"Việt Nam","ranking":1}]'.encode("utf-8")
+    assert r.headers["content-length"] == str(len(r.body))
+    assert r.headers["x-partial"] == "1"
+
+
+def test_comment_dataclasses_encode_like_dict():
+    pytest.importorskip("click")  # tiktok.tiktok_comment_scrapper import CLI khi nạp package
+    from tiktok.tiktok_comment_scrapper.tiktokcomment.typing import Comment, Comments
+
+    reply = Comment("2", "u2", "U 2", "trả lời", "2026-10-19T08:00:00", "a2", 0, likes=3)
+    comment = Comment("1", "u1", "U 1", "bình luận", 1_700_000_000, "a1", 1, likes=5, replies=[reply])
+    comments = Comments(caption="Video", video_url="https://www.tiktok.com/@_/video/1",
+                        comments=[comment], has_more=0)
+    assert json.loads(dumps(comments)) == comments.dict
+    assert dumps(comments) == dumps(comments.dict)
+    assert isinstance(comment.create_time, str)
+
+
+# ---------- API ----------
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    pytest.importorskip("httpx")
+    from starlette.testclient import TestClient
+    import main
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(main, "get_job_queue", lambda: SimpleNamespace(store=store))
+    yield TestClient(main.app), store
+    store.close()
+
+
+def test_grouping_endpoint_returns_compact_unescaped_json(api):
+    client, _ = api
+    r = client.post("/utils/get_prunned_groups",
+                    json={"ids": ["a", "b"], "transcripts": ["Xin chào các bạn", "xin chào các bạn nhé"]})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert "xin chào các bạn".encode("utf-8") in r.content
+    assert b": " not in r.content
+    assert r.json() == [{"n": 4, "ids": ["a", "b"], "id_count": 2, "ngram_count": 1,
+                         "ngrams": ["xin chào các bạn"]}]
+
+
+def test_job_result_is_spliced_without_reencoding(api):
+    client, store = api
+    job_id = store.submit("prunned_groups", {})
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    store.claim("w1")
+    store.complete(job_id, {"videos": [{"title": "Việt Nam", "views": 10 ** 12}]})
+    r = client.get(f"/jobs/{job_id}/result")
+    assert r.status_code == 200
+    assert r.json() == {"id": job_id, "status": "succeeded", "error": None,
+                        "result": {"videos": [{"title": "Việt Nam", "views": 10 ** 12}]}}
+    assert r.content.endswith(b'"result":' + store.get(job_id, raw_result=True)["result"].encode("utf-8") + b"}")
+    assert client.get("/jobs/khong-co/result").status_code == 404
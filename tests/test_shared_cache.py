@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from persistence import shared_cache
+from persistence.shared_cache import SharedCache, Uncached
+
+
+@pytest.fixture
+def clock(monkeypatch, clock):
+    monkeypatch.setattr(shared_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared_cache.sqlite3")
+
+
+@pytest.fixture
+def cache(path):
+    c = SharedCache(path, poll_seconds=0.01)
+    yield c
+    c.close()
+
+
+def test_get_set_expire_and_purge(path, clock):
+    c = SharedCache(path)
+    c.set("trend:a", b'{"a":1}', ttl=10)
+    c.set("trend:b", b"[]", ttl=100)
+    assert c.get("trend:a") == b'{"a":1}'
+    c.set("trend:a", b'{"a":2}', ttl=10)
+    assert c.get("trend:a") == b'{"a":2}'
+
+    clock.advance(11)
+    assert c.get("trend:a") is None
+    assert c.purge_expired() == 1
+    assert c.get("trend:b") == b"[]"
+    c.delete("trend:b")
+    assert c.get("trend:b") is None
+    c.close()
+
+
+def test_concurrent_requests_compute_once(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b'{"videos":[]}'
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("trend:k", compute, ttl=60) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [b'{"videos":[]}'] * 5
+    assert len(calls) == 1
+    # Request sau đọc từ cache
+    assert asyncio.run(cache.get_or_compute("trend:k", compute, ttl=60)) == b'{"videos":[]}'
+    assert len(calls) == 1 and cache._local == {}
+
+
+def test_errors_and_partial_results_are_not_cached(cache):
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise RuntimeError("crawl lỗi")
+
+    async def partial():
+        calls.append("partial")
+        return Uncached(b"[1]")
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_compute("k", failing, ttl=60) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        value = await cache.get_or_compute("k", partial, ttl=60)
+        assert isinstance(value, Uncached) and value == b"[1]"
+        assert await cache.get_or_compute("k", partial, ttl=60) == b"[1]"
+
+    asyncio.run(scenario())
+    assert calls == ["fail", "partial", "partial"]
+    assert cache.get("k") is None
+
+
+def test_zero_ttl_bypasses_cache(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return b"x"
+
+    async def scenario():
+        return await asyncio.gather(cache.get_or_compute("k", compute, ttl=0),
+                                    cache.get_or_compute("k", compute, ttl=0))
+
+    assert asyncio.run(scenario()) == [b"x", b"x"]
+    assert len(calls) == 2 and cache.get("k") is None
+
+
+def test_cancelled_leader_hands_over_to_waiter(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return b"ok"
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute, ttl=60))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute, ttl=60))
+        await asyncio.sleep(0.01)
+        leader.cancel()            # client của request đang tính ngắt kết nối
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(scenario()) == b"ok"
+    assert len(calls) == 2
+
+
+def test_other_worker_waits_for_lease_instead_of_recomputing(path):
+    # Hai SharedCache trên cùng file = hai worker uvicorn
+    a, b = SharedCache(path, poll_seconds=0.01), SharedCache(path, poll_seconds=0.01)
+    calls = []
+
+    async def compute_a():
+        calls.append("a")
+        await asyncio.sleep(0.1)
+        return b"from-a"
+
+    async def compute_b():
+        calls.append("b")
+        return b"from-b"
+
+    async def scenario():
+        first = asyncio.create_task(a.get_or_compute("trend:k", compute_a, ttl=60))
+        await asyncio.sleep(0.02)
+        return await asyncio.gather(first, b.get_or_compute("trend:k", compute_b, ttl=60))
+
+    try:
+        assert asyncio.run(scenario()) == [b"from-a", b"from-a"]
+        assert calls == ["a"]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_expired_lease_of_dead_worker_is_taken_over(path, clock):
+    dead, alive = SharedCache(path, lease_seconds=30), SharedCache(path, lease_seconds=30)
+    try:
+        assert dead._try_lease("k")
+        assert not alive._try_lease("k")
+        clock.advance(31)           # worker giữ lease đã chết
+        assert alive._try_lease("k")
+        alive._release("k")
+        assert dead._try_lease("k")
+    finally:
+        dead.close()
+        alive.close()
@@ -0,0 +1,240 @@
+import csv
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from persistence import db, sinks
+from persistence.sinks import JsonlSink, PostgresSink, ResultSink, get_default_sink, sink_from_url
+
+T1 = datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc)
+T2 = datetime(2026, 10, 19, 9, 0, tzinfo=timezone.utc)
+
+
+class RecordingSink(ResultSink):
+    """Sink ghi lại mỗi lần _write; fail_next làm lần ghi kế tiếp lỗi."""
+
+    def __init__(self, **kwargs) -> None:
+        self.writes = []
+        self.fail_next = False
+        self.written = threading.Event()
+        super().__init__(**kwargs)
+
+    def _write(self, stream, captured_at, records) -> None:
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("backend lỗi")
+        self.writes.append((stream, captured_at, [r["i"] for r in records]))
+        self.written.set()
+
+
+@pytest.fixture
+def sink():
+    s = RecordingSink(batch_size=3, flush_interval=60)
+    yield s
+    s.close()
+
+
+def test_flush_groups_by_stream_and_capture(sink):
+    sink.push("a", [{"i": 1}], T1)
+    sink.push("a", [{"i": 2}], T1)
+    sink.push("a", [{"i": 3}], T2)
+    sink.push("b", [{"i": 4}], T1)
+    sink.push("b", [], T1)
+    assert sink.writes == []
+
+    sink.flush()
+    assert sorted(sink.writes) == [("a", T1, [1, 2]), ("a", T2, [3]), ("b", T1, [4])]
+
+
+def test_full_batch_is_written_without_flush(sink):
+    sink.push("a", [{"i": 1}, {"i": 2}], T1)
+    sink.push("a", [{"i": 3}], T1)
+    assert sink.written.wait(5)
+    assert sink.writes == [("a", T1, [1, 2, 3])]
+
+
+def test_flush_interval_writes_partial_batch():
+    s = RecordingSink(batch_size=100, flush_interval=0.05)
+    try:
+        s.push("a", [{"i": 1}], T1)
+        assert s.written.wait(5)
+        assert s.writes == [("a", T1, [1])]
+    finally:
+        s.close()
+
+
+def test_failed_write_does_not_stop_the_writer(sink):
+    sink.fail_next = True
+    sink.push("a", [{"i": 1}], T1)
+    sink.flush()
+    sink.push("a", [{"i": 2}], T1)
+    sink.flush()
+    assert sink.writes == [("a", T1, [2])]
+
+
+def test_push_copies_records_and_close_drains():
+    s = RecordingSink(batch_size=100, flush_interval=60)
+    record = {"i": 1}
+    s.push("a", [record], T1)
+    record["i"] = 99
+    s.close()
+    assert s.writes == [("a", T1, [1])]
+    with pytest.raises(RuntimeError):
+        s.push("a", [{"i": 2}], T1)
+    s.close()
+
+
+def test_push_blocks_when_queue_is_full():
+    gate = threading.Event()
+
+    class SlowSink(RecordingSink):
+        def _write(self, stream, captured_at, records):
+            gate.wait(5)
+            super()._write(stream, captured_at, records)
+
+    s = SlowSink(batch_size=1, flush_interval=60, max_queue=1)
+    try:
+        s.push("a", [{"i": 1}], T1)   # writer lấy ra và kẹt ở _write
+        time.sleep(0.05)
+        s.push("a", [{"i": 2}], T1)   # nằm trong hàng đợi
+        blocked = threading.Thread(target=s.push, args=("a", [{"i": 3}], T1))
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()
+
+        gate.set()
+        blocked.join(5)
+        assert not blocked.is_alive()
+        s.flush()
+        assert [w[2] for w in s.writes] == [[1], [2], [3]]
+    finally:
+        gate.set()
+        s.close()
+
+
+def test_jsonl_sink_appends_per_stream(tmp_path):
+    s = JsonlSink(str(tmp_path), flush_interval=60)
+    s.push("comments", [{"id": "1", "text": "Việt Nam"}], T1)
+    s.push("comments", [{"id": "2", "when": T2}], T1)
+    s.close()
+
+    s = JsonlSink(str(tmp_path), flush_interval=60)
+    s.push("comments", [{"id": "3"}], T2)
+    s.close()
+
+    lines = (tmp_path / "comments.jsonl").read_text(encoding="utf-8").splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [r["id"] for r in rows] == ["1", "2", "3"]
+    assert rows[0] == {"captured_at": T1.isoformat(), "id": "1", "text": "Việt Nam"}
+    assert rows[1]["when"] == str(T2)
+    assert rows[2]["captured_at"] == T2.isoformat()
+
+
+# ---------- PostgresSink ----------
+class FakeDb:
+    """Stand-in cho persistence.db.connection(): fail_on làm câu SQL chứa chuỗi đó lỗi (rollback)."""
+
+    def __init__(self) -> None:
+        self.committed = []
+        self.fail_on = None
+
+    @contextmanager
+    def connection(self):
+        pending = []
+        db_ = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def execute(self, sql, params=None):
+                pending.append(" ".join(sql.split()))
+
+            def copy_expert(self, sql, buf):
+                if db_.fail_on and db_.fail_on in sql:
+                    raise RuntimeError("copy lỗi")
+                pending.append(buf.getvalue())
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+
+        yield Conn()
+        self.committed.extend(pending)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDb()
+    monkeypatch.setattr(db, "connection", fake.connection)
+    return fake
+
+
+def test_postgres_sink_creates_table_after_commit_only(fake_db):
+    s = PostgresSink(flush_interval=60)
+    try:
+        fake_db.fail_on = "COPY crawl_results"
+        s.push("comments", [{"id": "1"}], T1)
+        s.flush()
+        assert fake_db.committed == []
+        assert s._table_ready is False
+
+        fake_db.fail_on = None
+        s.push("comments", [{"id": "2"}], T1)
+        s.flush()
+        s.push("comments", [{"id": "3"}], T1)
+        s.flush()
+    finally:
+        s.close()
+
+    creates = [c for c in fake_db.committed if c.startswith("CREATE TABLE IF NOT EXISTS crawl_results")]
+    assert len(creates) == 1
+    assert s._table_ready is True
+    rows = [r for c in fake_db.committed if c.startswith("comments,") for r in csv.reader(io.StringIO(c))]
+    assert [(r[0], json.loads(r[2])["id"]) for r in rows] == [("comments", "2"), ("comments", "3")]
+
+
+def test_postgres_sink_routes_rankings_to_snapshots(fake_db):
+    s = PostgresSink(flush_interval=60)
+    seen = []
+    s._snapshot_writers["trend_hashtags"] = lambda records, captured_at: seen.append((captured_at, records))
+    try:
+        s.push("trend_hashtags", [{"hashtag": "a"}], T1)
+        s.flush()
+    finally:
+        s.close()
+    assert seen == [(T1, [{"hashtag": "a"}])]
+    assert fake_db.committed == []
+
+
+# ---------- Cấu hình ----------
+def test_sink_from_url(tmp_path):
+    s = sink_from_url(f"jsonl:{tmp_path}")
+    try:
+        assert isinstance(s, JsonlSink) and s.directory == tmp_path
+    finally:
+        s.close()
+    with pytest.raises(ValueError):
+        sink_from_url("kafka:topic")
+
+
+def test_default_sink_is_shared_and_optional(monkeypatch, tmp_path):
+    monkeypatch.setattr(sinks, "_default_sink", None)
+    monkeypatch.delenv("RESULT_SINK", raising=False)
+    assert get_default_sink() is None
+
+    monkeypatch.setenv("RESULT_SINK", f"jsonl:{tmp_path}")
+    monkeypatch.setattr(sinks.atexit, "register", lambda fn: None)
+    first = get_default_sink()
+    try:
+        assert get_default_sink() is first
+    finally:
+        first.close()
@@ -0,0 +1,47 @@
+import unicodedata
+
+import pandas as pd
+import pytest
+
+from analysis_tiktok_trend.text_normalize import TextNormalizer, normalize_text
+from benchmarks.bench_normalize import make_corpus, pandas_clean
+
+EDGE_CASES = [
+    None, float("nan"), "", "   ", 123, 4.5,
+    "Xem NGAY https://vt.tiktok.com/ZS8abc/?x=1#top hết",
+    "www.shopee.vn/sale!!!cuối", "http:/không-phải-url",
+    "snake_case__và___gạch_dưới", "#xuhuong @user_01 (sale) 100%",
+    "tab\tvà\nxuống\r\ndòng nbsp em-space　",
+    "😍😍emoji…ở giữa😍", "ĐẶC BIỆT İstanbul ǅ", "số ²³ và ½ và ٣",
+    unicodedata.normalize("NFD", "Việt Nam đẹp lắm"),
+]
+
+
+def test_matches_old_pandas_path_on_corpus():
+    docs = make_corpus(500, seed=7)
+    assert normalize_text.normalize_many(docs) == pandas_clean(pd.Series(docs)).tolist()
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_matches_old_pandas_path_on_edge_cases(text):
+    expected = pandas_clean(pd.Series([text], dtype=object)).tolist()[0]
+    assert normalize_text(text) == expected
+
+
+def test_iter_normalize_is_lazy():
+    def source():
+        yield "A_b"
+        raise AssertionError("đọc quá một dòng")
+
+    assert next(normalize_text.iter_normalize(source())) == "a b"
+
+
+def test_nfc_and_strip_diacritics():
+    nfd = unicodedata.normalize("NFD", "Việt Nam")
+    assert normalize_text(nfd) != "việt nam"
+    assert TextNormalizer(nfc=True)(nfd) == "việt nam"
+
+    strip = TextNormalizer(strip_diacritics=True)
+    assert strip("ĐƯỜNG phố Hà Nội, đẹp quá!") == "duong pho ha noi dep qua"
+    assert strip(nfd) == "viet nam"
+    assert TextNormalizer(nfc=True, strip_diacritics=True)(nfd) == "viet nam"
@@ -0,0 +1,138 @@
+import csv
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from persistence import trend_snapshots
+from persistence.trend_snapshots import (
+    HASHTAGS, save_trend_audio, save_trend_hashtags, save_trend_videos, write_snapshot,
+)
+
+CAPTURED_AT = datetime(2026, 10, 19, 8, 30, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    """Cursor psycopg2 giả: ghi lại SQL và dòng COPY; fail_on làm câu chứa chuỗi đó lỗi."""
+
+    def __init__(self, db: "FakeDb") -> None:
+        self.db = db
+
+    def __enter__(self) -> "FakeCursor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, sql, params=None) -> None:
+        if self.db.fail_on and self.db.fail_on in sql:
+            raise RuntimeError("relation does not exist")
+        self.db.pending.append(" ".join(sql.split()))
+
+    def copy_expert(self, sql, buf) -> None:
+        self.db.pending.append(" ".join(sql.split()))
+        self.db.copied.extend(csv.reader(buf))
+
+
+class FakeDb:
+    """Stand-in cho persistence.db.connection(): commit khi thành công, rollback khi lỗi."""
+
+    def __init__(self) -> None:
+        self.committed = []
+        self.pending = []
+        self.copied = []
+        self.transactions = 0
+        self.fail_on = None
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    @contextmanager
+    def connection(self):
+        self.transactions += 1
+        self.pending = []
+        try:
+            yield self
+        except Exception:
+            self.pending = []
+            raise
+        self.committed.extend(self.pending)
+
+
+@pytest.fixture
+def db(monkeypatch) -> FakeDb:
+    fake = FakeDb()
+    monkeypatch.setattr(trend_snapshots, "connection", fake.connection)
+    monkeypatch.setattr(trend_snapshots, "_ensured", set())
+    return fake
+
+
+def _creates(statements, name):
+    return [s for s in statements if s.startswith(f"CREATE TABLE IF NOT EXISTS {name}")]
+
+
+def test_write_snapshot_creates_monthly_partition_once(db):
+    rows = [{"hashtag": "a", "ranking": 1}]
+    assert write_snapshot(HASHTAGS, rows, CAPTURED_AT) == 1
+    assert write_snapshot(HASHTAGS, rows, CAPTURED_AT) == 1
+
+    part = "tiktok_trend_hashtag_history_y2026m10"
+    assert len(_creates(db.committed, HASHTAGS.name + " ")) == 1
+    assert len(_creates(db.committed, part)) == 1
+    assert "FROM ('2026-10-01T00:00:00+00:00') TO ('2026-11-01T00:00:00+00:00')" in _creates(db.committed, part)[0]
+    assert db.copied[0][:2] == ["a", "1"]
+
+
+def test_rolled_back_ddl_is_not_cached(db):
+    db.fail_on = "INSERT INTO"
+    with pytest.raises(RuntimeError):
+        write_snapshot(HASHTAGS, [{"hashtag": "a", "ranking": 1}], CAPTURED_AT)
+    assert db.committed == []
+
+    db.fail_on = None
+    write_snapshot(HASHTAGS, [{"hashtag": "a", "ranking": 1}], CAPTURED_AT)
+    assert _creates(db.committed, HASHTAGS.name + " ")
+    assert _creates(db.committed, "tiktok_trend_hashtag_history_y2026m10")
+
+
+def test_also_runs_in_the_same_transaction(db):
+    seen = []
+
+    def refresh(cur, captured_at):
+        seen.append(captured_at)
+        cur.execute("DELETE FROM tiktok_trends_hashtag;")
+
+    save_trend_hashtags([{"hashtag": "#A b"}, {"hashtag_name": "ab"}, {"hashtag": ""}],
+                        CAPTURED_AT, also=refresh)
+    assert db.transactions == 1
+    assert seen == [CAPTURED_AT]
+    assert db.committed[-1] == "DELETE FROM tiktok_trends_hashtag;"
+    # '#A b' và 'ab' chuẩn hoá về cùng hashtag: chỉ giữ lần đầu
+    assert [r[:2] for r in db.copied] == [["ab", "1"]]
+
+
+def test_empty_snapshot_does_not_touch_the_database(db):
+    assert save_trend_hashtags([{"hashtag": ""}], CAPTURED_AT) == 0
+    assert db.transactions == 0
+
+
+def test_videos_without_period_are_skipped(db):
+    items = [
+        {"video_id": "1", "period": 7},
+        {"video_id": "2"},
+        {"video_id": "3", "period": ""},
+        {"url": "no id", "period": "7"},
+    ]
+    assert save_trend_videos(items, captured_at=CAPTURED_AT) == 1
+    assert db.copied[0][:3] == ["7", "1", "1"]
+
+    db.copied.clear()
+    assert save_trend_videos(items, period="30", captured_at=CAPTURED_AT) == 3
+    assert [r[0] for r in db.copied] == ["30", "30", "30"]
+    assert "None" not in {c for r in db.copied for c in r}
+
+
+def test_audio_without_period_are_skipped(db):
+    items = [{"song_id": "s1"}, {"song_name": "bài hát", "period": "7", "ranking": 5}]
+    assert save_trend_audio(items, captured_at=CAPTURED_AT) == 1
+    assert db.copied[0][:3] == ["7", "bài hát", "5"]
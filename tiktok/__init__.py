@@ -1 +1,6 @@
-from .tiktok_comment_scrapper import get_comments
\ No newline at end of file
+# Import lười: 'import tiktok.user_page' (API) không kéo theo jmespath/loguru/click của scraper comment
+def __getattr__(name):
+    if name in ("get_comments", "fetch_comments"):
+        from . import tiktok_comment_scrapper
+        return getattr(tiktok_comment_scrapper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,6 +7,15 @@ from logging.handlers import TimedRotatingFileHandler
 from crawlee.crawlers import PlaywrightCrawler, PlaywrightCrawlingContext
 from crawlee.storage_clients import MemoryStorageClient
 from utils import extract_video_metadata
+from utils.extract_metadata_video import USER_POST_ITEM, VIDEO_LINK
+from persistence.sinks import get_default_sink
+from persistence.checkpoints import get_checkpoint_store
+from net.rate_limit import BatchBackoff, CircuitOpen, get_rate_limiter
+from net.cookies import get_cookie_jar
+from net.deadline import Deadline
+from net.browser_memory import BrowserMemory
+from observability.metrics import Stopwatch
+from tiktok.user_page import DEADLINE_ENV, PROXY_ENV, RESULT_MARKER
 
 # ========== LOGGING SETUP ==========
 def setup_logger():
@@ -34,34 +43,63 @@ def setup_logger():
     logging.info(f"Logging initialized. File: {log_file}")
     return logger
 
-logger = setup_logger()
+# Chỉ cấu hình logging khi chạy như script (subprocess của API); import module không tạo thư mục log
+logger = logging.getLogger(__name__)
 # ===================================
 
-async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items) -> dict:
-    """The crawler entry point that will be called when the HTTP endpoint is accessed."""
+async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items, sink=None,
+                                    resume=True, checkpoints=None, deadline=None) -> dict:
+    """The crawler entry point that will be called when the HTTP endpoint is accessed.
+
+    resume: tiếp tục từ checkpoint (link đã thu thập + số lần scroll) nếu lần trước
+    chết giữa chừng; checkpoint được lưu sau mỗi lần có link mới và xoá khi xong.
+    deadline: hết giờ thì ngừng scroll và trả các link đã có (mặc định theo env CRAWL_DEADLINE).
+    """
     logger.info(
         "Start crawl | url=%s | browser_type=%s | max_items=%s",
         tiktok_url, browser_type, max_items
     )
+    checkpoints = checkpoints if checkpoints is not None else (get_checkpoint_store() if resume else None)
+    checkpoint_key = f"user_posts:{tiktok_url}"
+    if deadline is None:
+        deadline = Deadline(float(os.getenv(DEADLINE_ENV) or 0))
 
     # Disable writing storage data to the file system
     storage_client = MemoryStorageClient()
 
+    context_options = {"viewport": {"width": 1280, "height": 900}}
+    # Cookie export dùng chung (TIKTOK_COOKIES_FILE), parse một lần và cache theo mtime
+    jar = get_cookie_jar()
+    if jar is not None and len(jar):
+        context_options["storage_state"] = {"cookies": jar.playwright_cookies(), "origins": []}
+
+    # Proxy do process API chọn từ pool (net.proxy_pool) và truyền qua env
+    proxy_configuration = None
+    if os.getenv(PROXY_ENV):
+        from crawlee.proxy_configuration import ProxyConfiguration
+        proxy_configuration = ProxyConfiguration(proxy_urls=[os.environ[PROXY_ENV]])
+
     crawler = PlaywrightCrawler(
         headless=True,
         max_requests_per_crawl=10,
         browser_type=browser_type,
         storage_client=storage_client,
-        browser_new_context_options={
-            "viewport": {"width": 1280, "height": 900}
-        },
+        browser_new_context_options=context_options,
+        proxy_configuration=proxy_configuration,
         # launchOptions=["--no-sandbox", "--disable-setuid-sandbox"]  # nếu cần
     )
 
+    # Dừng vì bộ nhớ trình duyệt: giữ checkpoint như khi hết deadline
+    stopped_early = False
+
     # ===== Page event taps for extra logs =====
     @crawler.router.default_handler
     async def request_handler(context: PlaywrightCrawlingContext) -> None:
+        nonlocal stopped_early
         context.log.info(f"Start profile crawl: {context.request.url}")
+        sw = Stopwatch("user_page")
+        # Làm rỗng ô lưới đã trích (ảnh bìa, preview) + theo dõi RSS trình duyệt của subprocess
+        memory = BrowserMemory("user_page")
 
         # Hook browser console logs (giúp debug selector/JS)
         def _on_console(msg):
@@ -91,6 +129,7 @@ async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items) -> dict
             await context.page.wait_for_load_state("networkidle", timeout=30000)
         except Exception:
             logger.exception("wait_for_load_state failed")
+        sw.lap("navigation")
 
         # Close modal if present
         try:
@@ -103,16 +142,35 @@ async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items) -> dict
 
         # Đợi user-post xuất hiện
         try:
-            await context.page.locator('[data-e2e="user-post-item"]').first.wait_for(timeout=5000)
+            await context.page.locator(USER_POST_ITEM).first.wait_for(timeout=5000)
         except Exception:
             logger.warning("No user-post item appeared within timeout; still continuing.")
+        sw.lap("setup")
+
+        # Nạp checkpoint (kể cả khi crawlee retry request trong cùng lần chạy)
+        state = checkpoints.load(checkpoint_key) if checkpoints is not None else None
+        collected = dict(state["collected"]) if state else {}
+        scrolls = state["scrolls"] if state else 0
+        if state:
+            logger.info("Resume from checkpoint: %d links, %d scrolls", len(collected), scrolls)
+            # Tua lại: scroll tới khi trang có đủ số bài đã thu thập (hoặc hết số lần scroll)
+            for _ in range(scrolls):
+                try:
+                    count = await context.page.locator(USER_POST_ITEM).count()
+                    if count >= len(collected):
+                        break
+                    await context.page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
+                except Exception:
+                    logger.exception("Replay scroll failed")
+                    break
+                await asyncio.sleep(1)
 
-        collected = {}
-        retries = 0
-        MAX_RETRIES = 3
-        length_collected = 0
+        # Scroll đi qua limiter của host; lượt không có bài mới -> backoff có jitter
+        host_limiter = get_rate_limiter().for_host(tiktok_url)
+        backoff = BatchBackoff(host_limiter)
+        length_collected = len(collected)
 
-        while len(collected) < limit and retries < MAX_RETRIES:
+        while len(collected) < limit:
             try:
                 links = await extract_video_metadata(context.page)
                 logger.info("extract_video_metadata returned %d items", len(links))
@@ -129,25 +187,52 @@ async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items) -> dict
                     logger.exception("Bad item structure: %s", item)
 
             context.log.info(f"Found {len(collected)} video links so far...")
+            sw.lap("extraction")
+
+            if checkpoints is not None and len(collected) > length_collected:
+                checkpoints.save(checkpoint_key, {"collected": collected, "scrolls": scrolls})
 
             if len(collected) >= limit:
                 break
+            if deadline.done():
+                logger.warning("Deadline reached: returning %d / %d links.", len(collected), limit)
+                break
+
+            # Ô đã có link không cần giữ trong DOM; RSS vượt giới hạn thì dừng như hết deadline
+            await memory.prune_async(context.page, USER_POST_ITEM, "href", collected, VIDEO_LINK)
+            if memory.exceeded():
+                logger.warning("Browser RSS %.0f MB > %.0f MB: returning %d / %d links.",
+                               memory.rss_mb, memory.limit_mb, len(collected), limit)
+                stopped_early = True
+                break
 
             # Scroll để load thêm
+            try:
+                await backoff.acquire_async()
+            except CircuitOpen as e:
+                logger.warning("%s: returning %d / %d links.", e, len(collected), limit)
+                stopped_early = True
+                break
             try:
                 await context.page.evaluate("window.scrollBy(0, window.innerHeight);")
+                scrolls += 1
             except Exception:
                 logger.exception("Scroll evaluate failed")
 
-            await asyncio.sleep(3)
+            await asyncio.sleep(deadline.timeout(3))
 
             if len(collected) > length_collected:
                 length_collected = len(collected)
-                retries = 0
+                backoff.ok()
             else:
-                retries += 1
-                logger.info("No new items; retries=%d/%d", retries, MAX_RETRIES)
-
+                delay = backoff.empty()
+                logger.info("No new items; retries=%d/%d", backoff.count, backoff.max_attempts)
+                if delay is None:
+                    break
+                await asyncio.sleep(deadline.timeout(delay))
+            sw.lap("wait")
+
+        memory.close()
         final_links = [{"url": url, "views": views} for url, views in collected.items()]
         logger.info("Collected %d items (limit=%d).", len(final_links), limit)
 
@@ -182,21 +267,19 @@ async def get_posts_on_tiktok_users(tiktok_url, browser_type, max_items) -> dict
     data = await crawler.get_data()
     items = getattr(data, "items", [])
     logger.info("Crawler finished. Dataset items=%d", len(items))
+    # Dừng vì deadline / bộ nhớ / circuit breaker: giữ checkpoint để lần sau crawl tiếp
+    if checkpoints is not None and items and not deadline.done() and not stopped_early:
+        checkpoints.clear(checkpoint_key)
 
-    # Persist last result to file for quick inspection
-    try:
-        log_dir = os.getenv("LOG_DIR", "/app/logs")
-        os.makedirs(log_dir, exist_ok=True)
-        out_json = os.path.join(log_dir, "last_results.json")
-        with open(out_json, "w", encoding="utf-8") as f:
-            json.dump(items, f, ensure_ascii=False, indent=2)
-        logger.info("Saved last_results.json to %s", out_json)
-    except Exception:
-        logger.exception("Failed to save last_results.json")
+    # Đẩy kết quả sang sink (stream 'user_posts') thay vì ghi lại last_results.json mỗi lần
+    sink = sink if sink is not None else get_default_sink()
+    if sink is not None and items:
+        sink.push("user_posts", [{"profile_url": tiktok_url, **it} for it in items])
 
-    return json.dumps(items, indent=4, ensure_ascii=False)
+    return items
 
 if __name__ == "__main__":
+    logger = setup_logger()
     # Tip: dùng argparse cho chắc; dưới đây giữ logic cũ nhưng có log bảo vệ
     try:
         tiktok_url = sys.argv[3].strip()
@@ -215,7 +298,8 @@ if __name__ == "__main__":
         result = asyncio.run(
             get_posts_on_tiktok_users(tiktok_url, web, max_items)
         )
-        print("Result:\n", result)
+        # Một dòng JSON gọn sau marker: tiến trình cha đọc thẳng, không cần regex
+        print(RESULT_MARKER + json.dumps(result, ensure_ascii=False, separators=(",", ":")), flush=True)
     except Exception:
         logger.exception("Fatal error in main")
         raise
\ No newline at end of file
@@ -1 +1 @@
-from .get_comments import get_comments
\ No newline at end of file
+from .get_comments import get_comments, fetch_comments
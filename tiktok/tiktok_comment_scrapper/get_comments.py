@@ -6,15 +6,17 @@ import json
 from loguru import logger
 # HEHE
 
+from net.deadline import Deadline
 from .tiktokcomment import TiktokComment
 from .tiktokcomment.typing import Comments
 
 __title__ = 'TikTok Comment Scrapper'
 __version__ = '2.0.0'
 __MINH__ = '1.0.0'
-def get_comments(
+def fetch_comments(
     aweme_id: str,
-): 
+    deadline: Deadline = None,
+) -> Comments: 
     if(not aweme_id):
         raise ValueError('example id : 7418294751977327878')      
     
@@ -22,11 +24,16 @@ def get_comments(
         'start scrap comments %s' % aweme_id
     )
 
-    comments: Comments = TiktokComment()(
+    return TiktokComment(deadline=deadline)(
         aweme_id=aweme_id
     )
-    
-    return comments.dict
+
+def get_comments(
+    aweme_id: str,
+    deadline: Deadline = None,
+): 
+    # Dạng dict (cho job queue / code cũ); API trả thẳng Comments qua FastJSONResponse
+    return fetch_comments(aweme_id, deadline).dict
 
 # import sys
 # if(__name__ == '__main__'):
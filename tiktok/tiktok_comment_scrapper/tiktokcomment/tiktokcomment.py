@@ -1,10 +1,20 @@
+import time
 import jmespath
 
-from typing import Any, Dict, Iterator
-from requests import Session, Response
+from typing import Any, Dict, Iterator, List
 from loguru import logger
 from typing import Optional
 from datetime import datetime
+from persistence.sinks import ResultSink, get_default_sink
+from net.rate_limit import RateLimiter, Throttled, TransientError, get_rate_limiter, parse_retry_after
+from net.http_client import get_http_client, transport_errors
+from net.cookies import CookieJar, get_cookie_jar
+from net.proxy_pool import ProxyLease, ProxyPool, get_proxy_pool
+from net.deadline import Deadline, DeadlineExceeded
+from observability.profiling import profiled
+from observability.metrics import (
+    COMMENT_API_REQUESTS, COMMENT_PAGES, CRAWLER_ITEMS, CRAWLER_RUNS, stage_timer
+)
 from ..tiktokcomment.typing import Comments, Comment
 
 class TiktokComment:
@@ -12,9 +22,123 @@ class TiktokComment:
     API_URL: str = '%s/api' % BASE_URL
 
     def __init__(
+        self: 'TiktokComment',
+        sink: Optional[ResultSink] = None,
+        limiter: Optional[RateLimiter] = None,
+        client: Optional[Any] = None,
+        cookies: Optional[CookieJar] = None,
+        proxies: Optional[ProxyPool] = None,
+        deadline: Optional[Deadline] = None
+    ) -> None:
+        # client HTTP dùng chung toàn process (keep-alive / HTTP/2): không bắt tay TLS lại mỗi lần
+        self.__client: Any = client if client is not None else get_http_client()
+        # pool proxy (PROXY_LIST); truyền client riêng thì không đi qua proxy
+        self.__proxies: Optional[ProxyPool] = None if client is not None else (
+            proxies if proxies is not None else get_proxy_pool()
+        )
+        # proxy giữ cố định cho cả phiên get_all_comments (sticky), đổi khi bị cách ly
+        self.__lease: Optional[ProxyLease] = None
+        # cookie gửi qua header từng request (không ghi vào client dùng chung); mặc định TIKTOK_COOKIES_FILE
+        self.__cookies: Optional[CookieJar] = cookies if cookies is not None else get_cookie_jar()
+        # sink nhận từng trang comment (stream 'comments'); mặc định theo RESULT_SINK
+        self.__sink: Optional[ResultSink] = sink if sink is not None else get_default_sink()
+        # limiter theo host dùng chung toàn process (token bucket + AIMD + circuit breaker)
+        self.__limiter: RateLimiter = limiter if limiter is not None else get_rate_limiter()
+        # hết giờ: dừng phân trang, trả các comment đã có; bị huỷ: dừng ở request kế tiếp
+        self.__deadline: Deadline = deadline if deadline is not None else Deadline()
+        # số trang API (comment + reply) của lần get_all_comments hiện tại
+        self.__pages: int = 0
+
+    def __proxy_lease(
+        self: 'TiktokComment'
+    ) -> Optional[ProxyLease]:
+        if self.__proxies is None or not len(self.__proxies):
+            return None
+        lease = self.__lease
+        if lease is None or not self.__proxies.is_healthy(lease.proxy):
+            if lease is not None:
+                lease.release()
+            lease = self.__lease = self.__proxies.lease()
+        return lease
+
+    def __release_proxy(
         self: 'TiktokComment'
     ) -> None:
-        self.__session: Session = Session()
+        if self.__lease is not None:
+            self.__lease.release()
+            self.__lease = None
+
+    def __fetch(
+        self: 'TiktokComment',
+        url: str,
+        params: Dict[str, Any],
+        endpoint: str
+    ) -> Dict[str, Any]:
+        lease: Optional[ProxyLease] = self.__proxy_lease()
+        client: Any = self.__client if lease is None else get_http_client(lease.url)
+        COMMENT_API_REQUESTS.labels(endpoint).inc()
+        headers: Optional[Dict[str, str]] = (
+            self.__cookies.request_headers(url) if self.__cookies is not None else None
+        )
+        start: float = time.perf_counter()
+        try:
+            with stage_timer('comments', 'fetch'):
+                response: Any = client.get(url, params=params, headers=headers)
+            if response.status_code == 429:
+                raise Throttled(
+                    'HTTP 429',
+                    retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                )
+            if response.status_code >= 500:
+                raise TransientError('HTTP %s' % response.status_code)
+            # TikTok trả body rỗng / HTML (captcha) thay vì JSON khi bị chặn
+            try:
+                data = response.json()
+            except ValueError:
+                raise Throttled(
+                    'Phản hồi không phải JSON (HTTP %s, %d bytes)' % (
+                        response.status_code, len(response.content)
+                    )
+                )
+            if not isinstance(data, dict):
+                raise Throttled('Phản hồi JSON không hợp lệ')
+        except (Throttled, *transport_errors()):
+            # Bị chặn / lỗi kết nối: tính cho proxy (IP ra); 5xx là lỗi phía TikTok
+            if lease is not None:
+                lease.fail()
+            raise
+        if lease is not None:
+            lease.ok(time.perf_counter() - start)
+        return data
+
+    def __request(
+        self: 'TiktokComment',
+        url: str,
+        params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        if self.__deadline.cancelled:
+            raise DeadlineExceeded('Request đã bị huỷ')
+        endpoint: str = 'reply' if url.endswith('/reply/') else 'list'
+        # Limiter theo (host, proxy): AIMD / circuit breaker của từng IP ra
+        lease: Optional[ProxyLease] = self.__proxy_lease()
+        key: str = url if lease is None else lease.proxy.limiter_key(url)
+
+        data: Dict[str, Any] = self.__limiter.call(
+            key, lambda: self.__fetch(url, params, endpoint), retry_on=transport_errors()
+        )
+        self.__pages += 1
+        return data
+    
+    def __push(
+        self: 'TiktokComment',
+        aweme_id: str,
+        comments: List[Comment]
+    ) -> None:
+        if self.__sink is not None and comments:
+            self.__sink.push(
+                'comments',
+                [{'aweme_id': aweme_id, **comment.dict} for comment in comments]
+            )
     
     def __parse_comment(
         self: 'TiktokComment',
@@ -57,7 +181,7 @@ class TiktokComment:
         comment_id: str
     ) -> Iterator[Comment]:
         page: int = 1
-        while True:
+        while not self.__deadline.done():
             if(
                 not (replies := self.get_replies(
                     comment_id=comment_id,
@@ -75,7 +199,7 @@ class TiktokComment:
         size: Optional[int] = 50,
         page: Optional[int] = 1
     ):
-        response: Response = self.__session.get(
+        data: Dict[str, Any] = self.__request(
             '%s/comment/list/reply/' % self.API_URL,
             params={
                 'aid': 1988,
@@ -89,19 +213,41 @@ class TiktokComment:
         return [
             self.__parse_comment(
                 comment
-            ) for comment in response.json().pop('comments')
+            ) for comment in data.get('comments') or []
         ]
     
+    @profiled('TiktokComment.get_all_comments')
     def get_all_comments(
         self: 'TiktokComment',
         aweme_id: str
+    ) -> Comments:
+        self.__pages = 0
+        try:
+            data: Comments = self.__get_all_comments(aweme_id)
+        except Exception:
+            CRAWLER_RUNS.labels('comments', 'error').inc()
+            raise
+        finally:
+            self.__release_proxy()
+        CRAWLER_RUNS.labels('comments', 'ok').inc()
+        CRAWLER_ITEMS.labels('comments').inc(len(data.comments))
+        COMMENT_PAGES.observe(self.__pages)
+        return data
+
+    def __get_all_comments(
+        self: 'TiktokComment',
+        aweme_id: str
     ) -> Comments:
         page: int = 1
         data: Comments = self.get_comments(
             aweme_id=aweme_id,
             page=page   
         )
+        self.__push(aweme_id, data.comments)
         while(True):
+            if self.__deadline.done():
+                logger.warning('Deadline reached: returning %d comments' % len(data.comments))
+                break
             page += 1
             
             comments: Comments = self.get_comments(
@@ -113,6 +259,7 @@ class TiktokComment:
             data.comments.extend(
                 comments.comments
             )
+            self.__push(aweme_id, comments.comments)
 
         return data
 
@@ -124,7 +271,7 @@ class TiktokComment:
     ) -> Comments:
         self.aweme_id: str = aweme_id
 
-        response: Response = self.__session.get(
+        response: Dict[str, Any] = self.__request(
             '%s/comment/list/' % self.API_URL,
             params={
                 'aid': 1988,
@@ -143,14 +290,14 @@ class TiktokComment:
                 has_more: has_more
             }
             """,
-            response.json()
+            response
         )
 
         return Comments(
             comments=[
                 self.__parse_comment(
                     comment
-                ) for comment in data.pop('comments')
+                ) for comment in data.pop('comments') or []
             ],
             **data,
         )
@@ -1,111 +1,57 @@
 import json
 
+from dataclasses import dataclass, field
 from datetime import datetime
 
-from typing import Optional, List, Dict, Any
+from typing import List, Dict, Any
 
+@dataclass(slots=True)
 class Comment:
-    def __init__(
-        self: 'Comment',
-        comment_id: str,
-        username: str,
-        nickname: str,
-        comment: str,
-        create_time: str,
-        avatar: str,
-        total_reply: int,
-        likes: int = 0,
-        replies: Optional[List['Comment']] = []
-    ) -> None:
-        self._comment_id: str = comment_id
-        self._username: str = username
-        self._nickname: str = nickname
-        self._comment: str = comment
-        self._create_time: str = datetime\
-            .fromtimestamp(
-                create_time
-            ).strftime("%Y-%m-%dT%H:%M:%S")
-        self._avatar: str = avatar
-        self._total_reply: int = total_reply
-        self._replies: List['Comment'] = replies
-        self._likes: int = likes
-    @property
-    def comment_id(
-        self: 'Comment'
-    ) -> str:
-        return self._comment_id
-    
-    @property
-    def username(
-        self: 'Comment'
-    ) -> str:
-        return self._username
-    
-    @property
-    def nickname(
-        self: 'Comment'
-    ) -> str:
-        return self._nickname
-    
-    @property
-    def comment(
-        self: 'Comment'
-    ) -> str:
-        return self._comment
-    
-    @property
-    def create_time(
-        self: 'Comment'
-    ) -> str:
-        return self._create_time
-    
-    @property
-    def avatar(
-        self: 'Comment'
-    ) -> str:
-        return self._avatar
-    
-    @property
-    def likes(
-        self: 'Comment'
-    ) -> int:
-        return self._likes
-    
-    @property
-    def total_reply(
-        self: 'Comment'
-    ) -> int:
-        return self._total_reply
-    
-    @property
-    def replies(
+    # dataclass + __slots__: API trả thẳng object (orjson encode bằng C),
+    # thứ tự field trùng với key của .dict
+    comment_id: str
+    username: str
+    nickname: str
+    comment: str
+    create_time: str
+    avatar: str
+    total_reply: int
+    likes: int = 0
+    replies: List['Comment'] = field(default_factory=list)
+
+    def __post_init__(
         self: 'Comment'
-    ) -> List['Comment']:
-        return self._replies
-    
+    ) -> None:
+        # API trả epoch (giây) -> chuỗi ISO theo giờ máy như trước
+        if isinstance(self.create_time, (int, float)):
+            self.create_time = datetime\
+                .fromtimestamp(
+                    self.create_time
+                ).strftime("%Y-%m-%dT%H:%M:%S")
+
     @property
     def dict(
         self: 'Comment'
     ) -> Dict[str, Any]:
         return {
-            'comment_id': self._comment_id,
-            'username': self._username,
-            'nickname': self._nickname,
-            'comment': self._comment,
-            'create_time': self._create_time,
-            'avatar': self._avatar,
-            'total_reply': self._total_reply,
-            'likes': self._likes,
-            'replies': [reply.dict for reply in self._replies]
+            'comment_id': self.comment_id,
+            'username': self.username,
+            'nickname': self.nickname,
+            'comment': self.comment,
+            'create_time': self.create_time,
+            'avatar': self.avatar,
+            'total_reply': self.total_reply,
+            'likes': self.likes,
+            'replies': [reply.dict for reply in self.replies]
         }
     
     @property
     def json(
         self: 'Comment'
     ) -> str:
-        return json.dumps(self.json)
+        return json.dumps(self.dict, ensure_ascii=False)
     
     def __str__(
         self: 'Comment'
     ) -> str:
-        return self.json
\ No newline at end of file
+        return self.json
@@ -0,0 +1,82 @@
+import os
+import sys
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from net.browser_slots import uses_browser_slot
+from net.proxy_pool import get_proxy_pool
+from net.deadline import DEADLINE_GRACE, Deadline, DeadlineExceeded
+from observability.metrics import instrument_crawl
+
+# Môi trường cho subprocess crawler (đảm bảo UTF-8)
+_ENV = os.environ.copy()
+_ENV["PYTHONIOENCODING"] = "utf-8"
+_ENV["PYTHONUTF8"] = "1"
+
+SCRIPT_MODULE = "tiktok.get_list_videos"
+# Subprocess in kết quả thành một dòng JSON gọn bắt đầu bằng marker này
+RESULT_MARKER = "@@RESULT@@ "
+# Proxy (từ pool của process API) truyền cho subprocess qua biến môi trường này
+PROXY_ENV = "CRAWL_PROXY"
+# Số giây còn lại của deadline: subprocess dừng scroll và in kết quả dở trước khi hết giờ
+DEADLINE_ENV = "CRAWL_DEADLINE"
+
+
+def parse_result_output(out: str) -> List[Dict[str, Any]]:
+    """Lấy kết quả từ dòng RESULT_MARKER (JSON một dòng) trong stdout của tiktok.get_list_videos."""
+    # Dòng cuối cùng có marker; log của crawler có thể nằm xen ở các dòng khác
+    for line in reversed(out.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise ValueError("Không tìm thấy dòng kết quả trong stdout")
+
+
+@uses_browser_slot
+@instrument_crawl("user_page")
+async def crawl_user_page(url: str, browser_type: str = "firefox",
+                          max_items: int = 10, deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """
+    Chạy crawler trang cá nhân trong subprocess riêng (crawlee/Playwright
+    không chạy chung event loop với FastAPI) rồi parse kết quả từ stdout.
+    Subprocess nhận thời gian còn lại của deadline; quá deadline + grace hoặc bị huỷ
+    (client ngắt kết nối) thì subprocess bị kill, không chạy mồ côi giữ browser slot.
+    """
+    deadline = deadline if deadline is not None else Deadline()
+    deadline.check()
+    cmd = [sys.executable, "-m", SCRIPT_MODULE,
+           browser_type.strip().lower(), str(max_items).strip(), url.strip()]
+    # Sticky theo trang cá nhân: crawl lại cùng trang đi qua cùng IP ra
+    with get_proxy_pool().lease(sticky_key=url.strip()) as lease:
+        env = _ENV if lease.url is None else {**_ENV, PROXY_ENV: lease.url}
+        remaining = deadline.remaining()
+        if remaining is not None:
+            env = {**env, DEADLINE_ENV: f"{remaining:.1f}"}
+        start = time.perf_counter()
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout_b, _ = await asyncio.wait_for(
+                proc.communicate(), None if remaining is None else remaining + DEADLINE_GRACE
+            )
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Crawler trang cá nhân quá thời gian xử lý") from None
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+        out = stdout_b.decode("utf-8", "ignore")
+        try:
+            result = parse_result_output(out)
+        except Exception as e:
+            raise ValueError(f"Lỗi parse JSON từ output: {e}\n\n--- STDOUT ---\n{out}") from e
+        if result:
+            lease.ok(time.perf_counter() - start)
+        else:
+            lease.fail()
+        return result
@@ -1,8 +1,26 @@
 from playwright.async_api import async_playwright
-import gc
+from datetime import datetime, timezone
+from contextlib import aclosing
+
+from persistence.sinks import get_default_sink
+from net.rate_limit import BatchBackoff, CircuitOpen, get_rate_limiter
+from net.browser_slots import uses_browser_slot
+from net.proxy_pool import get_proxy_pool
+from net.deadline import Deadline
+from net.browser_memory import BrowserMemory
+from observability.metrics import Stopwatch, instrument_crawl
+from observability.profiling import profiled
+from persistence.checkpoints import get_checkpoint_store
+from .storage_state import load_storage_state, prepare_region_async
 
 # ===== Constants =====
 TIKTOK_URL = "https://ads.tiktok.com/business/creativecenter/inspiration/popular/pc/vi"
+VIDEO_SELECTOR = 'blockquote[data-video-id]'
+VIEW_MORE_SELECTOR = 'div[data-testid="cc_contentArea_viewmore_btn"]'
+SCAN_WINDOW = 20  # mỗi lượt 'View More' thêm tối đa 20 video: chỉ quét lô cuối
+# Một lần evaluate cho cả lô: (tổng số phần tử, data-video-id của n phần tử cuối). Không tạo
+# ElementHandle nào nên không có gì tích lại (ở Python lẫn trình duyệt) giữa các vòng
+SCAN_VIDEOS_JS = "(els, n) => [els.length, els.slice(-n).map(el => el.getAttribute('data-video-id'))]"
 # Block resource types - giữ những cần thiết cho scraping
 BLOCKED_TYPES = {
     "image", 
@@ -70,19 +88,97 @@ async def select_dropdown_option(page, placeholder_text, value, option_selector)
         log(f"Dropdown selection failed: {e}", "ERROR")
         return False
 
+# ===== View More Helper =====
+async def click_view_more(page, known):
+    """Bấm 'View More' rồi đợi số video trên trang vượt quá known. False nếu hết nút."""
+    # Locator thay cho ElementHandle: không giữ tham chiếu tới node sau mỗi lần bấm
+    view_more = page.locator(VIEW_MORE_SELECTOR).first
+    if not await view_more.count():
+        return False
+    await view_more.scroll_into_view_if_needed()
+    await page.wait_for_timeout(500)
+    await view_more.click()
+    log("Clicked 'View More' button.")
+    try:
+        await page.wait_for_function(
+            "([selector, known]) => document.querySelectorAll(selector).length > known",
+            arg=[VIDEO_SELECTOR, known],
+            timeout=10000
+        )
+    except:
+        await page.wait_for_timeout(2000)
+    return True
+
+def _ranked(items, start, period):
+    return [{**item, "ranking": rank, "period": period} for rank, item in enumerate(items, start=start)]
+
 # ===== Main Crawler =====
-async def crawl_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7"):
+@profiled("crawl_tiktok_trend_videos")
+async def crawl_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7", sink=None, on_progress=None,
+                                    resume=True, checkpoints=None, deadline=None):
+    """Danh sách video trend (đã có ranking, period): gom mọi lô của stream_tiktok_trend_videos."""
+    result = []
+    async with aclosing(stream_tiktok_trend_videos(url, limit, period, sink, on_progress,
+                                                   resume, checkpoints, deadline)) as batches:
+        async for batch in batches:
+            result.extend(batch)
+    return result
+
+@uses_browser_slot
+@instrument_crawl("trend_videos")
+async def stream_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7", sink=None, on_progress=None,
+                                     resume=True, checkpoints=None, deadline=None):
+    # Async generator: yield từng lô video mới (đã có ranking, period) ngay khi mỗi lượt 'View More'
+    # tải xong; bên gọi dừng iterate (aclose) thì trình duyệt đóng và browser slot được trả ngay
+    # on_progress(collected, limit): callback báo tiến độ sau mỗi vòng (vd. job queue)
+    # sink: ResultSink nhận từng lô video mới (stream 'trend_videos'); mặc định theo RESULT_SINK
+    # resume: tiếp tục từ checkpoint của lần crawl dở (cùng url + period); xoá khi crawl xong,
+    #         trừ khi checkpoint giữ nhiều video hơn lần này dùng (của crawl limit lớn hơn)
+    # deadline: hết giờ / bị huỷ thì dừng ở vòng kế, trả phần đã có và giữ checkpoint
+    sink = sink if sink is not None else get_default_sink()
+    deadline = deadline if deadline is not None else Deadline()
+    deadline.check()
+    checkpoints = checkpoints if checkpoints is not None else (get_checkpoint_store() if resume else None)
+    checkpoint_key = f"trend_videos:{period}:{url}"
+    state = checkpoints.load(checkpoint_key) if checkpoints is not None else None
+
+    if state:
+        collected = state["collected"]
+        view_more_clicks = state["view_more_clicks"]
+        captured_at = datetime.fromisoformat(state["captured_at"])
+        log(f"Resume from checkpoint: {len(collected)} videos, {view_more_clicks} 'View More' clicks.")
+        # Phần đã có từ checkpoint được yield ngay, trước khi mở trình duyệt
+        if collected:
+            yield _ranked(collected[:limit], 1, period)
+        if len(collected) >= limit:
+            checkpoints.clear_consumed(checkpoint_key, "collected", limit)
+            return
+    else:
+        collected = []
+        view_more_clicks = 0
+        captured_at = datetime.now(timezone.utc)
+
+    sw = Stopwatch("trend_videos")
+    # Làm rỗng blockquote đã trích (embed rất nặng) + theo dõi RSS trình duyệt
+    memory = BrowserMemory("trend_videos")
     async with async_playwright() as p:
         browser = await p.firefox.launch(
             headless=True
         )
 
+        # Proxy cố định cho context này (PROXY_LIST); pool rỗng = kết nối trực tiếp
+        lease = get_proxy_pool().lease()
+        state = load_storage_state()
         context = await browser.new_context(
+            storage_state=state,
+            proxy=lease.playwright(),
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 720},
             bypass_csp=True,
             java_script_enabled=True
         )
+        # Mọi thao tác Playwright không chờ quá deadline
+        context.set_default_timeout(deadline.timeout_ms(30000))
 
         async def route_filter(route, request):
             url = request.url.lower()
@@ -103,42 +199,17 @@ async def crawl_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7"):
 
         await context.route("**/*", route_filter)
         page = await context.new_page()
+        sw.lap("launch")
 
         try:
             await page.goto(url)
             await page.wait_for_load_state("domcontentloaded")
             log(f"Navigated to {url}")
+            nav_seconds = sw.lap("navigation")
 
-            # Close banner if present
-            try:
-                banner = await page.wait_for_selector("#ccModuleBannerWrap div div div div", timeout=5000)
-                await banner.click()
-                await page.wait_for_timeout(1000)
-                log("Banner clicked.")
-            except:
-                log("Banner not found or clickable.")
-
-            # Set language to Vietnamese
-            await select_dropdown_option(
-                page,
-                "Nhập/chọn từ danh sách",
-                "việt nam",
-                'div.byted-select-popover-panel-inner span.byted-high-light:has-text("Việt Nam")'
-            )
-            
-            # ===== Kiểm tra đã chọn ngôn ngữ là "Việt Nam" =====
-            try:
-                lang_selector = await page.wait_for_selector(
-                    "#ccModuleBannerWrap div div div div span span span span div span:nth-child(1)",
-                    timeout=5000
-                )
-                current_lang = (await lang_selector.inner_text()).strip()
-                if current_lang != "Việt Nam":
-                    raise ValueError(f"Ngôn ngữ hiện tại là '{current_lang}', không phải 'Việt Nam'")
-                log("Đã xác nhận ngôn ngữ là 'Việt Nam'.")
-            except Exception as e:
-                log(f"Lỗi khi kiểm tra ngôn ngữ: {e}", "ERROR")
-                return []
+            # Storage state hợp lệ (cookies + localStorage đã chọn 'Việt Nam') -> bỏ qua setup
+            if not await prepare_region_async(page, context, state):
+                return
             
             
             # 1) Mở dropdown (không gán .wait_for() vào biến)
@@ -158,27 +229,48 @@ async def crawl_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7"):
                     log(f"Đã chọn khoảng thời gian '{period}'.")
             else:
                 log("Không tìm thấy nút chọn khoảng thời gian.", "ERROR")
-                return []
+                return
             
-            await page.wait_for_timeout(10000)
+            sw.lap("setup")
+            await page.wait_for_timeout(deadline.timeout_ms(10000))
 
             try:
-                await page.wait_for_selector('blockquote[data-video-id]', timeout=10000)
+                await page.wait_for_selector(VIDEO_SELECTOR, timeout=10000)
                 log("Video elements loaded.")
+                lease.ok(nav_seconds)
             except:
                 log("Video elements not found. Exiting.", "ERROR")
-                return []
+                lease.fail()
+                return
+
+            sw.lap("wait")
+
+            # Tua lại đúng số lần View More của checkpoint (chỉ bấm, không quét phần tử)
+            seen_ids = {item['video_id'] for item in collected}
+            videos = page.locator(VIDEO_SELECTOR)
+            for i in range(view_more_clicks):
+                if deadline.done():
+                    break
+                if not await click_view_more(page, await videos.count()):
+                    log(f"Replay stopped after {i} / {view_more_clicks} clicks.", "WARN")
+                    view_more_clicks = i
+                    break
+                # Video của checkpoint đã có: không giữ embed của chúng trong DOM
+                await memory.prune_async(page, VIDEO_SELECTOR, "data-video-id", seen_ids)
 
-            collected = []
-            seen_ids = set()
-            empty_attempts = 0
+            if view_more_clicks:
+                sw.lap("replay")
+            stopped_early = False
+            # View More đi qua limiter của host; lô rỗng -> backoff có jitter thay vì 3 lần cố định
+            host_limiter = get_rate_limiter().for_host(url if lease.proxy is None else lease.proxy.limiter_key(url))
+            backoff = BatchBackoff(host_limiter)
 
             while len(collected) < limit:
-                video_elements = await page.query_selector_all('blockquote[data-video-id]')
+                total, video_ids = await videos.evaluate_all(SCAN_VIDEOS_JS, SCAN_WINDOW)
                 new_found = 0
+                batch_start = len(collected)
 
-                for el in video_elements[-20:]:  # Only scan the most recent ones
-                    video_id = await el.get_attribute("data-video-id")
+                for video_id in video_ids:
                     if video_id and video_id not in seen_ids:
                         seen_ids.add(video_id)
                         collected.append({
@@ -187,42 +279,74 @@ async def crawl_tiktok_trend_videos(url=TIKTOK_URL, limit=500, period="7"):
                         })
                         new_found += 1
 
+                batch = _ranked(collected[batch_start:limit], batch_start + 1, period)
+                if sink is not None and batch:
+                    sink.push("trend_videos", batch, captured_at=captured_at)
+
+                sw.lap("extraction")
                 if new_found == 0:
-                    empty_attempts += 1
-                    log(f"No new videos found. Attempt {empty_attempts}/3")
-                    if empty_attempts >= 3:
-                        log("No new videos for 3 consecutive attempts. Stopping.")
+                    delay = backoff.empty()
+                    log(f"No new videos found. Attempt {backoff.count}/{backoff.max_attempts}")
+                    if delay is None:
+                        log(f"No new videos for {backoff.count} consecutive attempts. Stopping.")
                         break
+                    await page.wait_for_timeout(deadline.timeout_ms(delay * 1000))
                 else:
-                    empty_attempts = 0
+                    backoff.ok()
 
                 log(f"Collected {len(collected)} / {limit} videos...")
+                if on_progress is not None:
+                    on_progress(min(len(collected), limit), limit)
+
+                if checkpoints is not None and new_found:
+                    checkpoints.save(checkpoint_key, {
+                        "captured_at": captured_at.isoformat(),
+                        "collected": collected,
+                        "view_more_clicks": view_more_clicks,
+                    })
+                if batch:
+                    yield batch
 
                 if len(collected) >= limit:
                     break
-                
-                view_more = await page.query_selector('div[data-testid="cc_contentArea_viewmore_btn"]')
-                if view_more:
-                    await view_more.scroll_into_view_if_needed()
-                    await page.wait_for_timeout(500)
-                    await view_more.click()
-                    log("Clicked 'View More' button.")
-                    try:
-                        await page.wait_for_function(
-                            f'document.querySelectorAll("blockquote[data-video-id]").length > {len(seen_ids)}',
-                            timeout=10000
-                        )
-                    except:
-                        await page.wait_for_timeout(2000)
+                if deadline.done():
+                    log(f"Deadline reached: returning {len(collected)} / {limit} videos.", "WARN")
+                    break
+
+                # Video đã trích không cần trong DOM nữa; RSS vượt giới hạn thì dừng như hết deadline
+                await memory.prune_async(page, VIDEO_SELECTOR, "data-video-id", seen_ids)
+                if memory.exceeded():
+                    log(f"Browser RSS {memory.rss_mb:.0f} MB > {memory.limit_mb:.0f} MB: "
+                        f"returning {len(collected)} / {limit} videos.", "WARN")
+                    stopped_early = True
+                    break
+
+                try:
+                    await backoff.acquire_async()
+                except CircuitOpen as e:
+                    # Host đang bị ngắt: dừng như hết deadline, giữ checkpoint
+                    log(f"{e}: returning {len(collected)} / {limit} videos.", "WARN")
+                    stopped_early = True
+                    break
+                if await click_view_more(page, total):
+                    view_more_clicks += 1
                 else:
                     log("No 'View More' button found. Stopping.")
                     break
 
-                gc.collect()
+                sw.lap("wait")
 
-            return collected[:limit]
+            # Dừng vì deadline / bộ nhớ / circuit breaker: giữ checkpoint để lần sau crawl tiếp. Checkpoint
+            # dài hơn phần lần này đã thu thập (crawl limit lớn hơn cùng key) cũng được giữ
+            if checkpoints is not None and not deadline.done() and not stopped_early:
+                checkpoints.clear_consumed(checkpoint_key, "collected", len(collected))
 
+        except Exception:
+            lease.finish(failed=True)
+            raise
         finally:
+            lease.finish()
+            memory.close()
             await context.close()
             await browser.close()
             
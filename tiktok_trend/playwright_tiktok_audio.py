@@ -1,9 +1,19 @@
 from playwright.async_api import async_playwright
 import json
-import gc
 import time
 import sys
 from urllib.parse import unquote, urljoin
+from datetime import datetime, timezone
+from contextlib import aclosing
+
+from persistence.sinks import get_default_sink
+from net.rate_limit import BatchBackoff, CircuitOpen, get_rate_limiter
+from net.browser_slots import uses_browser_slot
+from net.proxy_pool import get_proxy_pool
+from net.deadline import Deadline
+from net.browser_memory import BrowserMemory
+from observability.metrics import Stopwatch, instrument_crawl
+from .storage_state import load_storage_state, prepare_region_async
 
 BASE_URL = "https://www.tiktok.com/music/"
 
@@ -31,6 +41,11 @@ def extract_song_info(audio_url):
 TIKTOK_URL = "https://ads.tiktok.com/business/creativecenter/inspiration/popular/music/pc/vi"
 BLOCKED_TYPES = {"image", "font", "stylesheet", "media"}
 BLOCKED_KEYWORDS = {"analytics", "tracking", "collect", "adsbygoogle"}
+AUDIO_SELECTOR = 'a.index-mobile_goToDetailBtnWrapper__puubr'
+VIEW_MORE_SELECTOR = '#ccContentContainer > div.BannerLayout_listWrapper__2FJA_ > div > div:nth-child(2) > div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div'
+SCAN_WINDOW = 20
+# Một lần evaluate cho cả lô: (tổng số phần tử, href của n phần tử cuối), không tạo ElementHandle
+SCAN_HREFS_JS = "(els, n) => [els.length, els.slice(-n).map(el => el.getAttribute('href'))]"
 
 # ===== Logging =====
 def log(msg, level="INFO"):
@@ -51,19 +66,53 @@ async def select_dropdown_option(page, placeholder_text, value, option_selector)
         log(f"Dropdown selection failed: {e}", "ERROR")
         return False
 
+def _ranked(items, start, period):
+    return [{**item, "ranking": rank, "period": period} for rank, item in enumerate(items, start=start)]
+
 # ===== Main Crawler =====
-async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7'):
+async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7', sink=None, on_progress=None,
+                                   deadline=None):
+    """Danh sách audio trend (đã có ranking, period): gom mọi lô của stream_tiktok_trend_audio."""
+    result = []
+    async with aclosing(stream_tiktok_trend_audio(url, limit, period, sink, on_progress, deadline)) as batches:
+        async for batch in batches:
+            result.extend(batch)
+    return result
+
+@uses_browser_slot
+@instrument_crawl("trend_audio")
+async def stream_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7', sink=None, on_progress=None,
+                                    deadline=None):
+    # Async generator: yield từng lô audio mới (đã có ranking, period) sau mỗi lượt 'View More';
+    # bên gọi dừng iterate (aclose) thì trình duyệt đóng và browser slot được trả ngay
+    # on_progress(collected, limit): callback báo tiến độ sau mỗi vòng (vd. job queue)
+    # sink: ResultSink nhận từng lô audio mới (stream 'trend_audio'); mặc định theo RESULT_SINK
+    # deadline: hết giờ / bị huỷ thì dừng ở vòng kế và trả phần đã có
+    sink = sink if sink is not None else get_default_sink()
+    deadline = deadline if deadline is not None else Deadline()
+    deadline.check()
+    captured_at = datetime.now(timezone.utc)
+    sw = Stopwatch("trend_audio")
+    # RSS trình duyệt: metrics + dừng sớm khi vượt BROWSER_RSS_LIMIT_MB
+    memory = BrowserMemory("trend_audio", prune=False)
     async with async_playwright() as p:
         browser = await p.firefox.launch(
             headless=True
         )
 
+        # Proxy cố định cho context này (PROXY_LIST); pool rỗng = kết nối trực tiếp
+        lease = get_proxy_pool().lease()
+        state = load_storage_state()
         context = await browser.new_context(
+            storage_state=state,
+            proxy=lease.playwright(),
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 720},
             bypass_csp=True,
             java_script_enabled=True
         )
+        # Mọi thao tác Playwright không chờ quá deadline
+        context.set_default_timeout(deadline.timeout_ms(30000))
 
         async def route_filter(route, request):
             if request.resource_type in BLOCKED_TYPES or any(k in request.url.lower() for k in BLOCKED_KEYWORDS):
@@ -72,42 +121,17 @@ async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7'):
 
         await context.route("**/*", route_filter)
         page = await context.new_page()
+        sw.lap("launch")
 
         try:
             await page.goto(url)
             await page.wait_for_load_state("domcontentloaded")
             log(f"Navigated to {url}")
+            nav_seconds = sw.lap("navigation")
 
-            # Close banner if present
-            try:
-                banner = await page.wait_for_selector("#ccModuleBannerWrap div div div div", timeout=5000)
-                await banner.click()
-                await page.wait_for_timeout(1000)
-                log("Banner clicked.")
-            except:
-                log("Banner not found or clickable.")
-
-            # Set language to Vietnamese
-            await select_dropdown_option(
-                page,
-                "Nhập/chọn từ danh sách",
-                "việt nam",
-                'div.byted-select-popover-panel-inner span.byted-high-light:has-text("Việt Nam")'
-            )
-            
-            # ===== Kiểm tra đã chọn ngôn ngữ là "Việt Nam" =====
-            try:
-                lang_selector = await page.wait_for_selector(
-                    "#ccModuleBannerWrap div div div div span span span span div span:nth-child(1)",
-                    timeout=5000
-                )
-                current_lang = (await lang_selector.inner_text()).strip()
-                if current_lang != "Việt Nam":
-                    raise ValueError(f"Ngôn ngữ hiện tại là '{current_lang}', không phải 'Việt Nam'")
-                log("Đã xác nhận ngôn ngữ là 'Việt Nam'.")
-            except Exception as e:
-                log(f"Lỗi khi kiểm tra ngôn ngữ: {e}", "ERROR")
-                return []
+            # Storage state hợp lệ (cookies + localStorage đã chọn 'Việt Nam') -> bỏ qua setup
+            if not await prepare_region_async(page, context, state):
+                return
 
             await page.wait_for_selector('#soundPeriodSelect > span > div > div', timeout=10000)
 
@@ -123,25 +147,34 @@ async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7'):
                     log(f"Đã chọn khoảng thời gian '{period}'.")
             else:
                 log("Không tìm thấy nút chọn khoảng thời gian.", "ERROR")
-                return []
-            
+                return
+            sw.lap("setup")
+
             try:
-                await page.wait_for_selector('a.index-mobile_goToDetailBtnWrapper__puubr', timeout=10000)
+                await page.wait_for_selector(AUDIO_SELECTOR, timeout=10000)
                 log("Video elements loaded.")
+                lease.ok(nav_seconds)
             except:
                 log("Video elements not found. Exiting.", "ERROR")
-                return []
+                lease.fail()
+                return
 
+            sw.lap("wait")
             collected = []
             seen_ids = set()
-            empty_attempts = 0
+            # View More đi qua limiter của host; lô rỗng -> backoff có jitter thay vì 3 lần cố định
+            host_limiter = get_rate_limiter().for_host(url if lease.proxy is None else lease.proxy.limiter_key(url))
+            backoff = BatchBackoff(host_limiter)
+            # Locator tạo một lần, dùng lại mọi vòng
+            audios = page.locator(AUDIO_SELECTOR)
+            view_more = page.locator(VIEW_MORE_SELECTOR).first
 
             while len(collected) < limit:
-                video_elements = await page.query_selector_all('a.index-mobile_goToDetailBtnWrapper__puubr')
+                total, hrefs = await audios.evaluate_all(SCAN_HREFS_JS, SCAN_WINDOW)
                 new_found = 0
+                batch_start = len(collected)
 
-                for el in video_elements[-20:]:  # Only scan the most recent ones
-                    audio_url = await el.get_attribute("href")
+                for audio_url in hrefs:
                     if audio_url and audio_url not in seen_ids:
                         song_name, song_id = extract_song_info(audio_url)
                         key = song_id or song_name
@@ -161,29 +194,51 @@ async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7'):
                         })
                         new_found += 1
 
+                batch = _ranked(collected[batch_start:limit], batch_start + 1, period)
+                if sink is not None and batch:
+                    sink.push("trend_audio", batch, captured_at=captured_at)
+
+                sw.lap("extraction")
                 if new_found == 0:
-                    empty_attempts += 1
-                    log(f"No new videos found. Attempt {empty_attempts}/3")
-                    if empty_attempts >= 3:
-                        log("No new videos for 3 consecutive attempts. Stopping.")
+                    delay = backoff.empty()
+                    log(f"No new videos found. Attempt {backoff.count}/{backoff.max_attempts}")
+                    if delay is None:
+                        log(f"No new videos for {backoff.count} consecutive attempts. Stopping.")
                         break
+                    await page.wait_for_timeout(deadline.timeout_ms(delay * 1000))
                 else:
-                    empty_attempts = 0
+                    backoff.ok()
 
                 log(f"Collected {len(collected)} / {limit} videos...")
+                if on_progress is not None:
+                    on_progress(min(len(collected), limit), limit)
+                if batch:
+                    yield batch
 
                 if len(collected) >= limit:
                     break
+                if deadline.done():
+                    log(f"Deadline reached: returning {len(collected)} / {limit} audio.", "WARN")
+                    break
+                if memory.exceeded():
+                    log(f"Browser RSS {memory.rss_mb:.0f} MB > {memory.limit_mb:.0f} MB: "
+                        f"returning {len(collected)} / {limit} audio.", "WARN")
+                    break
 
-                view_more = await page.query_selector('#ccContentContainer > div.BannerLayout_listWrapper__2FJA_ > div > div:nth-child(2) > div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div')
-                if view_more:
+                try:
+                    await backoff.acquire_async()
+                except CircuitOpen as e:
+                    log(f"{e}: returning {len(collected)} / {limit} audio.", "WARN")
+                    break
+                if await view_more.count():
                     await view_more.scroll_into_view_if_needed()
                     await page.wait_for_timeout(500)
                     await view_more.click()
                     log("Clicked 'View More' button.")
                     try:
                         await page.wait_for_function(
-                            f'#ccContentContainer > div.BannerLayout_listWrapper__2FJA_ > div > div:nth-child(2) > div.CommonDataList_listWrap__4ejAT.index-mobile_listWrap__INNh7.SoundList_soundListWrapper__Ab_az > div:nth-child(1) > div > div > a.length > {len(seen_ids)}',
+                            "([selector, known]) => document.querySelectorAll(selector).length > known",
+                            arg=[AUDIO_SELECTOR, total],
                             timeout=10000
                         )
                     except:
@@ -192,11 +247,14 @@ async def crawl_tiktok_trend_audio(url=TIKTOK_URL, limit=100, period='7'):
                     log("No 'View More' button found. Stopping.")
                     break
 
-                gc.collect()
-
-            return collected[:limit]
+                sw.lap("wait")
 
+        except Exception:
+            lease.finish(failed=True)
+            raise
         finally:
+            lease.finish()
+            memory.close()
             await context.close()
             await browser.close()
             
@@ -1,87 +1,21 @@
 from playwright.sync_api import sync_playwright
 import json
-import gc
 import time
 import sys
 from urllib.parse import unquote, urljoin
-import json
 import math
 from pathlib import Path
+from datetime import datetime, timezone
 
-SAMESITE_MAP = {
-    "lax": "Lax",
-    "strict": "Strict",
-    "no_restriction": "None",
-}
-
-def load_cookies_for_playwright(json_path, for_domains=None):
-    """
-    Đọc cookies từ file (định dạng Chrome/Extensions) và chuyển sang
-    định dạng mà Playwright context.add_cookies chấp nhận.
-
-    for_domains: list[str] các domain giữ lại (ví dụ ["ads.tiktok.com", ".tiktok.com"])
-                 Nếu None -> giữ tất cả.
-    """
-    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
-
-    def domain_ok(d):
-        if not for_domains:
-            return True
-        # match chính xác hoặc subdomain (xử lý cả tiền tố ".")
-        d_norm = d.lstrip(".").lower()
-        for want in for_domains:
-            w_norm = want.lstrip(".").lower()
-            if d_norm == w_norm or d_norm.endswith("." + w_norm):
-                return True
-        return False
-
-    seen = set()
-    out = []
-    for c in data:
-        dom = c.get("domain", "")
-        if not domain_ok(dom):
-            continue
-
-        name = c.get("name")
-        value = c.get("value", "")
-        path = c.get("path", "/") or "/"
-
-        # map sameSite
-        ss_raw = c.get("sameSite")
-        ss = SAMESITE_MAP.get(str(ss_raw).lower(), None) if isinstance(ss_raw, str) else None
-
-        # map expires
-        expires = None
-        if not c.get("session", False):
-            # Chrome export có thể là float; Playwright cần int
-            exp = c.get("expirationDate")
-            if isinstance(exp, (int, float)):
-                expires = int(math.floor(exp))
-
-        # Tạo tuple key để loại trùng (ưu tiên cái đến sau nếu trùng)
-        key = (dom, path, name)
-        if key in seen:
-            # đã có cookie cùng (domain, path, name) -> skip hoặc thay thế
-            # Ở đây chọn thay thế: xóa cái cũ rồi thêm cái mới
-            out = [ck for ck in out if (ck["domain"], ck["path"], ck["name"]) != key]
-        seen.add(key)
-
-        ck = {
-            "name": name,
-            "value": value,
-            "domain": dom,
-            "path": path,
-            "secure": bool(c.get("secure", False)),
-            "httpOnly": bool(c.get("httpOnly", False)),
-        }
-        if ss:
-            ck["sameSite"] = ss
-        if expires is not None:
-            ck["expires"] = expires
-
-        out.append(ck)
-
-    return out
+from persistence.sinks import get_default_sink
+from net.rate_limit import BatchBackoff, CircuitOpen, get_rate_limiter
+from net.browser_slots import uses_browser_slot
+from net.proxy_pool import get_proxy_pool
+from net.deadline import Deadline
+from net.browser_memory import BrowserMemory
+from observability.metrics import Stopwatch, instrument_crawl
+# load_cookies_for_playwright: giữ import cũ từ module này
+from .storage_state import load_cookies_for_playwright, load_storage_state, save_storage_state
 
 
 BASE_URL = "https://www.tiktok.com/music/"
@@ -91,33 +25,34 @@ BASE_URL = "https://www.tiktok.com/music/"
 TIKTOK_URL = "https://ads.tiktok.com/business/creativecenter/inspiration/popular/hashtag/pc/vi"
 BLOCKED_TYPES = {"image", "font", "stylesheet", "media"}
 BLOCKED_KEYWORDS = {"analytics", "tracking", "collect", "adsbygoogle"}
+ITEM_SELECTOR = "span.CardPc_titleText__RYOWo"
+VIEW_MORE_SELECTOR = '#ccContentContainer > div.HashtagList_listContainer__BvfHH.index-mobile_listContainer__ttJOQ > div > div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div'
+SCAN_WINDOW = 40
+# Một lần evaluate cho cả lô: (tổng số phần tử, text của n phần tử cuối), không tạo ElementHandle
+SCAN_TEXTS_JS = "(els, n) => [els.length, els.slice(-n).map(el => (el.innerText || '').trim())]"
 
 # ===== Logging =====
 def log(msg, level="INFO"):
     print(f"[{level}] {msg}")
 
-# ===== Dropdown Helper =====
-def select_dropdown_option(page, placeholder_text, value, option_selector):
-    try:
-        input_field = page.wait_for_selector(f'input[placeholder="{placeholder_text}"]', timeout=5000)
-        input_field.fill(value)
-        page.wait_for_timeout(1000)
-        dropdown_item = page.wait_for_selector(option_selector, timeout=5000)
-        dropdown_item.click()
-        page.wait_for_timeout(1000)
-        log("Dropdown option selected successfully.")
-        return True
-    except Exception as e:
-        log(f"Dropdown selection failed: {e}", "ERROR")
-        return False
-
 # # ===== Main Crawler =====
 # COOKIE_FILE = "tiktok_cookies.json"  # đường dẫn đến file JSON bạn đưa ở trên
 
 
 
 # ===== Main Crawler (đổi phần load thêm từ scroll -> click View more) =====
-def crawl_tiktok_hashtag(url, limit=1000):
+@uses_browser_slot
+@instrument_crawl("trend_hashtags")
+def crawl_tiktok_hashtag(url, limit=1000, sink=None, deadline=None):
+    # sink: ResultSink nhận từng lô hashtag mới (stream 'trend_hashtags'); mặc định theo RESULT_SINK
+    # deadline: chạy trong thread nên không huỷ được bằng asyncio; kiểm tra mỗi vòng, hết giờ trả phần đã có
+    sink = sink if sink is not None else get_default_sink()
+    deadline = deadline if deadline is not None else Deadline()
+    deadline.check()
+    captured_at = datetime.now(timezone.utc)
+    sw = Stopwatch("trend_hashtags")
+    # RSS trình duyệt: metrics + dừng sớm khi vượt BROWSER_RSS_LIMIT_MB
+    memory = BrowserMemory("trend_hashtags", prune=False)
     with sync_playwright() as p:
         browser = p.chromium.launch(
             headless=True,
@@ -130,12 +65,20 @@ def crawl_tiktok_hashtag(url, limit=1000):
             ]
         )
 
+        # Cookies + localStorage của lần crawl trước (hoặc TIKTOK_COOKIES_FILE)
+        # Proxy cố định cho context này (PROXY_LIST); pool rỗng = kết nối trực tiếp
+        lease = get_proxy_pool().lease()
+        state = load_storage_state()
         context = browser.new_context(
+            storage_state=state,
+            proxy=lease.playwright(),
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 720},
             bypass_csp=True,
             java_script_enabled=True
         )
+        # Mọi thao tác Playwright không chờ quá deadline
+        context.set_default_timeout(deadline.timeout_ms(30000))
 
 
         def route_filter(route, request):
@@ -145,11 +88,13 @@ def crawl_tiktok_hashtag(url, limit=1000):
 
         context.route("**/*", route_filter)
         page = context.new_page()
+        sw.lap("launch")
 
         try:
             page.goto(url)
             page.wait_for_load_state("domcontentloaded")
             log(f"Navigated to {url}")
+            nav_seconds = sw.lap("navigation")
 
             # page.wait_for_selector("#hashtagIndustrySelect > span > div > div > div", timeout=5000)
             # type_button = page.query_selector("#hashtagIndustrySelect > span > div > div > div")
@@ -165,26 +110,37 @@ def crawl_tiktok_hashtag(url, limit=1000):
             #     else:
             #         log("Fashion industry button not found.", "ERROR")
             #         return []
-            time.sleep(5)
-            ITEM_SELECTOR = "span.CardPc_titleText__RYOWo"
+            if state is None:
+                time.sleep(deadline.timeout(5))
 
             try:
                 page.wait_for_selector(ITEM_SELECTOR, timeout=10000)
                 log("Hashtag elements loaded.")
+                lease.ok(nav_seconds)
+                if state is None:
+                    save_storage_state(context)
             except:
                 log("Hashtag elements not found. Exiting.", "ERROR")
+                lease.fail()
                 return []
 
             page.wait_for_timeout(2000)  # cho trang ổn định
+            sw.lap("wait")
 
-            collected, seen_ids, empty_attempts = [], set(), 0
+            collected, seen_ids = [], set()
+            # View More đi qua limiter của host; lô rỗng -> backoff có jitter; hết lượt thì dừng
+            host_limiter = get_rate_limiter().for_host(url if lease.proxy is None else lease.proxy.limiter_key(url))
+            backoff = BatchBackoff(host_limiter)
+            # Locator tạo một lần, dùng lại mọi vòng
+            items = page.locator(ITEM_SELECTOR)
+            view_more = page.locator(VIEW_MORE_SELECTOR).first
 
             while len(collected) < limit:
-                # Lấy item hiện có
-                items = page.query_selector_all(ITEM_SELECTOR)
+                # Lấy item hiện có: quét lô gần nhất
+                total, hashtags = items.evaluate_all(SCAN_TEXTS_JS, SCAN_WINDOW)
                 new_found = 0
-                for el in items[-40:]:  # quét lô gần nhất
-                    hashtag = (el.inner_text() or "").strip()
+                batch_start = len(collected)
+                for hashtag in hashtags:
                     if hashtag and hashtag not in seen_ids:
                         seen_ids.add(hashtag)
                         collected.append({"hashtag": hashtag})
@@ -192,25 +148,48 @@ def crawl_tiktok_hashtag(url, limit=1000):
                         if len(collected) >= limit:
                             break
 
+                if sink is not None and new_found:
+                    sink.push("trend_hashtags", [
+                        {**item, "ranking": rank}
+                        for rank, item in enumerate(collected[batch_start:], start=batch_start + 1)
+                    ], captured_at=captured_at)
+
+                sw.lap("extraction")
                 if new_found == 0:
-                    empty_attempts += 1
-                    log(f"No new items found. Attempt {empty_attempts}/3")
+                    delay = backoff.empty()
+                    log(f"No new items found. Attempt {backoff.count}/{backoff.max_attempts}")
+                    if delay is None:
+                        log(f"No new items for {backoff.count} consecutive attempts. Stopping.")
+                        break
+                    page.wait_for_timeout(deadline.timeout_ms(delay * 1000))
                 else:
-                    empty_attempts = 0
+                    backoff.ok()
 
                 log(f"Collected {len(collected)} / {limit} hashtags...")
 
                 if len(collected) >= limit:
                     break
-                view_more = page.query_selector('#ccContentContainer > div.HashtagList_listContainer__BvfHH.index-mobile_listContainer__ttJOQ > div > div.InduceLogin_induceLogin__pN61i > div > div.ViewMoreBtn_viewMoreBtn__fOkv2 > div')
-                if view_more:
+                if deadline.done():
+                    log(f"Deadline reached: returning {len(collected)} / {limit} hashtags.", "WARN")
+                    break
+                if memory.exceeded():
+                    log(f"Browser RSS {memory.rss_mb:.0f} MB > {memory.limit_mb:.0f} MB: "
+                        f"returning {len(collected)} / {limit} hashtags.", "WARN")
+                    break
+                try:
+                    backoff.acquire()
+                except CircuitOpen as e:
+                    log(f"{e}: returning {len(collected)} / {limit} hashtags.", "WARN")
+                    break
+                if view_more.count():
                     view_more.scroll_into_view_if_needed()
                     page.wait_for_timeout(500)
                     view_more.click()
                     log("Clicked 'View More' button.")
                     try:
                         page.wait_for_function(
-                            f'span.CardPc_titleText__RYOWo.length > {len(seen_ids)}',
+                            "([selector, known]) => document.querySelectorAll(selector).length > known",
+                            arg=[ITEM_SELECTOR, total],
                             timeout=10000
                         )
                     except:
@@ -219,89 +198,59 @@ def crawl_tiktok_hashtag(url, limit=1000):
                     log("No 'View More' button found. Stopping.")
                     break
 
-                gc.collect()
+                sw.lap("wait")
 
             return collected[:limit]
 
+        except Exception:
+            lease.finish(failed=True)
+            raise
         finally:
+            lease.finish()
+            memory.close()
             context.close()
             browser.close()
 import os
 import re
 import sys
-from typing import List, Dict
-import psycopg2
-from psycopg2.extras import execute_values
-from dotenv import load_dotenv
+from typing import List, Dict, Optional
 
-def normalize_hashtag(s: str) -> str:
+from persistence import normalize_hashtag, save_trend_hashtags
+
+def _refresh_current_hashtags(cur, captured_at: datetime) -> None:
     """
-    Chuẩn hoá hashtag: bỏ '#', bỏ khoảng trắng, về chữ thường.
-    Ví dụ: "# dotrungnien" -> "dotrungnien"
+    Bảng "hiện tại" cho các truy vấn cũ: DELETE thay cho TRUNCATE, người đọc vẫn thấy
+    snapshot cũ (MVCC) cho tới khi commit.
     """
-    if s is None:
-        return ""
-    s = s.strip()
-    if s.startswith("#"):
-        s = s[1:]
-    s = s.replace(" ", "")
-    return s.lower()
-
-def save_trending_hashtags(hashtags: List[Dict[str, str]]) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tiktok_trends_hashtag (
+            id BIGSERIAL PRIMARY KEY,
+            hashtag_name TEXT NOT NULL,
+            ranking INT NOT NULL,
+            captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("DELETE FROM tiktok_trends_hashtag;")
+    cur.execute(
+        "INSERT INTO tiktok_trends_hashtag (hashtag_name, ranking, captured_at) "
+        "SELECT hashtag, ranking, captured_at AT TIME ZONE 'UTC' "
+        "FROM tiktok_trend_hashtag_history WHERE captured_at = %s",
+        (captured_at,)
+    )
+
+
+def save_trending_hashtags(hashtags: List[Dict[str, str]],
+                           captured_at: Optional[datetime] = None) -> None:
     """
-    Ghi vào bảng tiktok_trends_hashtag(hashtag_name, ranking).
-    Ranking = thứ tự xuất hiện (1-based).
+    Ghi snapshot vào bảng lịch sử tiktok_trend_hashtag_history (hashtag, ranking, captured_at)
+    bằng COPY + upsert và làm mới bảng tiktok_trends_hashtag (snapshot mới nhất) trong cùng
+    một transaction. Ranking = thứ tự xuất hiện (1-based).
     """
-    load_dotenv()  # đọc .env
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        raise RuntimeError("DATABASE_URL not found in environment (.env).")
-
-    # Chuẩn bị dữ liệu insert: (hashtag_name, ranking)
-    rows = []
-    seen = set()
-    for idx, item in enumerate(hashtags, start=1):
-        raw = item.get("hashtag") or item.get("hashtag_name") or ""
-        tag = normalize_hashtag(raw)
-        if not tag:
-            continue
-        # tránh trùng trong cùng danh sách input
-        if tag in seen:
-            continue
-        seen.add(tag)
-        rows.append((tag, idx))
-
-    if not rows:
-        print("No valid hashtags to insert.")
+    inserted = save_trend_hashtags(hashtags, captured_at, also=_refresh_current_hashtags)
+    if not inserted:
+        log("No valid hashtags to insert.", "WARN")
         return
-
-    conn = psycopg2.connect(db_url)
-    conn.autocommit = False
-    try:
-        with conn.cursor() as cur:
-            # Bảng
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS tiktok_trends_hashtag (
-                    id BIGSERIAL PRIMARY KEY,
-                    hashtag_name TEXT NOT NULL,
-                    ranking INT NOT NULL,
-                    captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # XÓA HẾT rồi chèn lại
-            cur.execute("TRUNCATE TABLE tiktok_trends_hashtag;")
-            execute_values(
-                cur,
-                "INSERT INTO tiktok_trends_hashtag (hashtag_name, ranking) VALUES %s",
-                rows
-            )
-        conn.commit()
-        print(f"Inserted {len(rows)} trending hashtags.")
-    except Exception as e:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+    log(f"Inserted {inserted} trending hashtags.")
 
 
 # ===== CLI Runner (giữ nguyên) =====
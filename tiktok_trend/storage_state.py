@@ -0,0 +1,158 @@
+"""
+Storage state (cookies + localStorage) của trình duyệt dùng lại giữa các lần crawl
+Creative Center: khi state còn hạn và trang đã ở đúng quốc gia / ngôn ngữ thì bỏ qua
+bước đóng banner + chọn "Việt Nam" (5-15 giây mỗi lần crawl).
+"""
+import os
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from net.cookies import get_cookie_jar, load_cookie_jar
+
+# ===== Constants =====
+STATE_DIR = Path(os.getenv("BROWSER_STATE_DIR", "storage/browser_state"))
+# State cũ hơn khoảng này bị bỏ, crawler chạy lại bước setup và lưu state mới
+STATE_TTL = float(os.getenv("BROWSER_STATE_TTL", str(12 * 3600)))
+CREATIVE_CENTER = "creative_center"
+
+REGION_LABEL = "Việt Nam"
+BANNER = "#ccModuleBannerWrap div div div div"
+LANGUAGE_INPUT_PLACEHOLDER = "Nhập/chọn từ danh sách"
+LANGUAGE_OPTION = 'div.byted-select-popover-panel-inner span.byted-high-light:has-text("Việt Nam")'
+LANGUAGE_CURRENT = "#ccModuleBannerWrap div div div div span span span span div span:nth-child(1)"
+# Kiểm tra nhanh trang đã đúng quốc gia chưa (ms); hết thời gian = state không còn hiệu lực
+REGION_CHECK_TIMEOUT = 3000
+
+# ===== Logging =====
+def log(msg, level="INFO"):
+    print(f"[{level}] {msg}")
+
+
+def load_cookies_for_playwright(json_path, for_domains=None):
+    """
+    Đọc cookies từ file (định dạng Chrome/Extensions) và chuyển sang
+    định dạng mà Playwright context.add_cookies chấp nhận.
+
+    for_domains: list[str] các domain giữ lại (ví dụ ["ads.tiktok.com", ".tiktok.com"])
+                 Nếu None -> giữ tất cả.
+    """
+    # CookieJar: chỉ mục dict theo (domain, path, name), file chỉ parse lại khi mtime đổi
+    return load_cookie_jar(json_path, for_domains).playwright_cookies()
+
+
+# ---------- Load / save ----------
+def state_path(key: str) -> Path:
+    return STATE_DIR / f"{key}.json"
+
+
+def load_storage_state(key: str = CREATIVE_CENTER) -> Optional[Dict[str, Any]]:
+    """
+    State đã lưu của key (dạng storage_state của Playwright) nếu còn hạn, bỏ cookie
+    đã hết hạn; không có thì dựng từ cookie export TIKTOK_COOKIES_FILE (nếu có).
+    None = chạy setup đầy đủ.
+    """
+    path = state_path(key)
+    try:
+        if time.time() - path.stat().st_mtime <= STATE_TTL:
+            state = json.loads(path.read_text(encoding="utf-8"))
+            now = time.time()
+            state["cookies"] = [c for c in state.get("cookies", [])
+                                if c.get("expires", -1) in (-1, None) or c["expires"] > now]
+            return state
+    except (OSError, ValueError):
+        pass
+    jar = get_cookie_jar()
+    if jar is not None and len(jar):
+        return {"cookies": jar.playwright_cookies(), "origins": []}
+    return None
+
+
+def _write_state(key: str, state: Dict[str, Any]) -> None:
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    path = state_path(key)
+    # Ghi file tạm rồi rename: crawler khác (cùng worker hoặc worker khác) không đọc phải file dở
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+async def save_storage_state_async(context, key: str = CREATIVE_CENTER) -> None:
+    _write_state(key, await context.storage_state())
+
+
+def save_storage_state(context, key: str = CREATIVE_CENTER) -> None:
+    _write_state(key, context.storage_state())
+
+
+def invalidate_storage_state(key: str = CREATIVE_CENTER) -> None:
+    state_path(key).unlink(missing_ok=True)
+
+
+# ---------- Region check ----------
+async def region_ready_async(page, timeout: int = REGION_CHECK_TIMEOUT) -> bool:
+    """True nếu trang đã hiển thị quốc gia 'Việt Nam' (state còn hiệu lực)."""
+    try:
+        el = await page.wait_for_selector(LANGUAGE_CURRENT, timeout=timeout)
+        return (await el.inner_text()).strip() == REGION_LABEL
+    except Exception:
+        return False
+
+
+async def setup_region_async(page) -> bool:
+    """
+    Setup đầy đủ trên trang Creative Center: đóng banner, chọn quốc gia 'Việt Nam'
+    rồi xác nhận. False nếu không chọn được (crawler dừng, trả về rỗng).
+    """
+    # Close banner if present
+    try:
+        banner = await page.wait_for_selector(BANNER, timeout=5000)
+        await banner.click()
+        await page.wait_for_timeout(1000)
+        log("Banner clicked.")
+    except:
+        log("Banner not found or clickable.")
+
+    # Set language to Vietnamese
+    try:
+        input_field = await page.wait_for_selector(f'input[placeholder="{LANGUAGE_INPUT_PLACEHOLDER}"]', timeout=5000)
+        await input_field.fill("việt nam")
+        await page.wait_for_timeout(1000)
+        dropdown_item = await page.wait_for_selector(LANGUAGE_OPTION, timeout=5000)
+        await dropdown_item.click()
+        await page.wait_for_timeout(1000)
+        log("Dropdown option selected successfully.")
+    except Exception as e:
+        log(f"Dropdown selection failed: {e}", "ERROR")
+
+    # ===== Kiểm tra đã chọn ngôn ngữ là "Việt Nam" =====
+    try:
+        lang_selector = await page.wait_for_selector(LANGUAGE_CURRENT, timeout=5000)
+        current_lang = (await lang_selector.inner_text()).strip()
+        if current_lang != REGION_LABEL:
+            raise ValueError(f"Ngôn ngữ hiện tại là '{current_lang}', không phải 'Việt Nam'")
+        log("Đã xác nhận ngôn ngữ là 'Việt Nam'.")
+        return True
+    except Exception as e:
+        log(f"Lỗi khi kiểm tra ngôn ngữ: {e}", "ERROR")
+        return False
+
+
+async def prepare_region_async(page, context, state: Optional[Dict[str, Any]],
+                               key: str = CREATIVE_CENTER) -> bool:
+    """
+    Đưa trang về quốc gia 'Việt Nam': state còn hiệu lực thì bỏ qua setup,
+    ngược lại chạy setup_region_async rồi lưu state mới cho lần crawl sau.
+    """
+    if state is not None and await region_ready_async(page):
+        log("Storage state còn hiệu lực: bỏ qua bước chọn quốc gia.")
+        return True
+    if not await setup_region_async(page):
+        invalidate_storage_state(key)
+        return False
+    try:
+        await save_storage_state_async(context, key)
+    except Exception as e:
+        log(f"Không lưu được storage state: {e}", "WARN")
+    return True
@@ -15,6 +15,20 @@ def convert_timestamp_to_vn_time(timestamp: int) -> str:
 
 import re
 
+from net.browser_memory import PRUNED_ATTR
+
+USER_POST_ITEM = '[data-e2e="user-post-item"]'
+# Link video trong ô: href của nó là khoá của ô (url trả về, và khoá prune ở tiktok.get_list_videos)
+VIDEO_LINK = 'a[href*="/video/"]'
+# Một lần evaluate cho cả lưới: [href, lượt xem] của từng ô, không tạo ElementHandle cho từng ô / con
+EXTRACT_ITEMS_JS = """
+els => els.map(el => {
+    const link = el.querySelector('%s');
+    const views = el.querySelector('[data-e2e="video-views"]');
+    return [link && link.getAttribute('href'), views && views.innerText];
+})
+""" % VIDEO_LINK
+
 def normalize_views(view_str: str) -> int:
     """
     Chuyển chuỗi lượt xem (vd: '1.2M', '15K', '732') thành số nguyên.
@@ -40,20 +54,10 @@ async def extract_video_metadata(page) -> list[dict]:
     Trích xuất danh sách video với URL và lượt xem (đã chuẩn hóa).
     Trả về dạng: [{'url': ..., 'views': int}, ...]
     """
-    results = []
-    video_items = await page.query_selector_all('[data-e2e="user-post-item"]')
-
-    for item in video_items:
-        link_el = await item.query_selector('a[href*="/video/"]')
-        href = await link_el.get_attribute('href') if link_el else None
-
-        views_el = await item.query_selector('[data-e2e="video-views"]')
-        views_text = await views_el.inner_text() if views_el else None
-
-        if href and views_text:
-            results.append({
-                'url': href,
-                'views': normalize_views(views_text)
-            })
-
-    return results
+    # Ô đã trích ở vòng trước và bị làm rỗng (net.browser_memory) không còn gì để đọc
+    rows = await page.locator(f'{USER_POST_ITEM}:not([{PRUNED_ATTR}])').evaluate_all(EXTRACT_ITEMS_JS)
+    return [
+        {'url': href, 'views': normalize_views(views_text)}
+        for href, views_text in rows
+        if href and views_text
+    ]
@@ -1,12 +1,36 @@
 # get_transcripts.py
+import asyncio
 import subprocess
 import sys
 import json
 from pathlib import Path
 import tempfile
 
-async def run(cmd):
-    return subprocess.run(cmd, check=True, capture_output=True, text=True)
+from persistence.sinks import get_default_sink
+from observability.metrics import instrument_crawl, stage_timer
+from observability.profiling import profiled
+from net.deadline import Deadline, DeadlineExceeded
+
+async def run(cmd, deadline=None):
+    # Subprocess async (không chặn event loop); hết deadline hoặc bị huỷ thì kill yt-dlp
+    deadline = deadline if deadline is not None else Deadline()
+    deadline.check()
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), deadline.timeout())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("yt-dlp quá thời gian xử lý") from None
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout.decode("utf-8", "ignore"),
+                                            stderr.decode("utf-8", "ignore"))
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout.decode("utf-8", "ignore"),
+                                       stderr.decode("utf-8", "ignore"))
 
 def vtt_to_text(vtt_path: Path) -> str:
     """Chuyển file VTT thành transcript text"""
@@ -22,7 +46,18 @@ def vtt_to_text(vtt_path: Path) -> str:
             lines.append(line)
     return " ".join(lines)
 
-async def download_transcript(url: str) -> str:
+@instrument_crawl("transcripts")
+@profiled("download_transcript")
+async def download_transcript(url: str, sink=None, deadline=None) -> str:
+    # sink nhận transcript (stream 'transcripts'); mặc định theo RESULT_SINK
+    # deadline: giới hạn tổng thời gian tải phụ đề (cả lần thử auto-sub)
+    sink = sink if sink is not None else get_default_sink()
+    transcript = await _download_transcript(url, deadline)
+    if sink is not None:
+        sink.push("transcripts", [{"url": url, "transcript": transcript}])
+    return transcript
+
+async def _download_transcript(url: str, deadline=None) -> str:
     with tempfile.TemporaryDirectory() as tmpdir:
         outtmpl = str(Path(tmpdir) / "sub.%(ext)s")
 
@@ -31,14 +66,16 @@ async def download_transcript(url: str) -> str:
                "--write-sub", "--sub-lang", "vie-VN", "--sub-format", "vtt",
                "-o", outtmpl, url]
         try:
-            await run(cmd)
+            with stage_timer("transcripts", "download"):
+                await run(cmd, deadline)
         except subprocess.CalledProcessError:
             # fallback auto-sub
             cmd = [sys.executable, "-m", "yt_dlp", "--skip-download",
                    "--write-auto-sub", "--sub-lang", "vie-VN", "--sub-format", "vtt",
                    "-o", outtmpl, url]
             try:
-                await run(cmd)
+                with stage_timer("transcripts", "download"):
+                    await run(cmd, deadline)
             except subprocess.CalledProcessError:
                 return ""
 
@@ -61,7 +98,8 @@ async def download_transcript(url: str) -> str:
             return ""
 
         print("[DEBUG] Using:", vtt_files[0])
-        return vtt_to_text(vtt_files[0])
+        with stage_timer("transcripts", "parse"):
+            return vtt_to_text(vtt_files[0])
     
 # if __name__ == "__main__":
 #     if len(sys.argv) < 2: